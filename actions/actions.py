@@ -2,12 +2,129 @@ from typing import Any, Text, Dict, List
 from rasa_sdk import Action, Tracker
 from rasa_sdk.executor import CollectingDispatcher
 from rasa_sdk.events import SlotSet, SessionStarted, ActionExecuted
-import requests
-import re
 import random
 
-# URL base de tu API Flask en Render
-API_BASE_URL = "https://api-ia-o027.onrender.com"
+from actions.bitacora import obtener_logger
+from actions.cliente_api import API_BASE_URL, ErrorConexionAPI, RespuestaAPI, obtener_cliente
+from actions.cache_predicciones import obtener_cache
+from actions.extraccion import extraer_credenciales, extraer_email, validar_email
+from actions.limitador import obtener_limitador, texto_espera
+from actions.lotes_prediccion import obtener_agrupador
+from actions.metricas import medir_accion, servir_metricas
+from actions.modelo_local import GUARDADO_PENDIENTE
+from actions.sesiones import obtener_sesiones
+from actions.cola_historial import (
+    ESTADOS_ACTIVOS, COMPLETADO, SIN_DATOS, obtener_cola
+)
+
+logger = obtener_logger(__name__)
+
+# El servidor de acciones importa este módulo al arrancar: /metrics en
+# METRICAS_HOST:METRICAS_PUERTO (127.0.0.1:9102 por defecto)
+servir_metricas()
+
+
+# Variantes del mensaje de resultados y el texto de "Guardado" que usa cada
+# una si la API no lo envía. Solo se formatea la variante elegida.
+PLANTILLAS_PREDICCION = [
+    (
+        """
+🎯 **RESULTADOS DE LA PREDICCIÓN** 🎯
+
+📊 **Modelos de IA:**
+• Random Forest: {random_forest}
+• SVM: {svm}
+• KNN: {knn}
+
+🏆 **Mejor Modelo:** {mejor_modelo}
+
+✅ {guardado}
+
+💡 **Recuerda:** Esta es una predicción basada en datos históricos. Siempre mantén precaución en las vías.
+""",
+        "Predicción guardada",
+    ),
+    (
+        """
+✨ **ANÁLISIS COMPLETADO** ✨
+
+🤖 **Predicciones por Modelo:**
+🌳 Random Forest: {random_forest}
+📊 SVM: {svm}
+🔵 KNN: {knn}
+
+🌟 **Modelo Destacado:** {mejor_modelo}
+
+💾 {guardado}
+
+⚠️ **Nota:** Predicción basada en análisis de datos. Conduce siempre con precaución.
+""",
+        "Datos almacenados exitosamente",
+    ),
+    (
+        """
+🚨 **PREDICCIÓN FINALIZADA** 🚨
+
+🔮 **Resultados de los Algoritmos:**
+🎯 Random Forest → {random_forest}
+🎯 SVM → {svm}
+🎯 KNN → {knn}
+
+🥇 **Algoritmo Más Preciso:** {mejor_modelo}
+
+✅ {guardado}
+
+👉 **Importante:** Resultados predictivos. Conduce con responsabilidad.
+""",
+        "Registro guardado en tu historial",
+    ),
+    (
+        """
+📊 **REPORTE DE PREDICCIÓN** 📊
+
+🔍 **Modelos Analizados:**
+▪️ Random Forest: {random_forest}
+▪️ SVM: {svm}
+▪️ KNN: {knn}
+
+🏅 **Modelo Óptimo:** {mejor_modelo}
+
+📝 {guardado}
+
+❗ **Advertencia:** Predicción estadística. Sigue las normas de tránsito.
+""",
+        "Predicción registrada correctamente",
+    ),
+    (
+        """
+🔵 **RESULTADOS DEL ANÁLISIS** 🔵
+
+🧠 **Predicciones IA:**
+🎯 RF: {random_forest}
+🎯 SVM: {svm}
+🎯 KNN: {knn}
+
+🥇 **Top Model:** {mejor_modelo}
+
+✅ {guardado}
+
+🔴 **Recuerda:** Análisis predictivo. La seguridad vial es responsabilidad de todos.
+""",
+        "¡Guardado en tu historial!",
+    ),
+]
+
+
+def mensaje_prediccion(resultado: Dict[Text, Any]) -> Text:
+    """Mensaje de resultados con una de las variantes, elegida al azar"""
+    plantilla, guardado = random.choice(PLANTILLAS_PREDICCION)
+    return plantilla.format(
+        random_forest=resultado.get("RandomForest", "N/A"),
+        svm=resultado.get("SVM", "N/A"),
+        knn=resultado.get("KNN", "N/A"),
+        mejor_modelo=resultado.get("MejorModelo", "Random Forest"),
+        guardado=resultado.get("Guardado", guardado),
+    )
 
 
 class ActionSessionStart(Action):
@@ -16,6 +133,7 @@ class ActionSessionStart(Action):
     def name(self) -> Text:
         return "action_session_start"
 
+    @medir_accion
     async def run(
         self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]
     ) -> List[Dict[Text, Any]]:
@@ -23,10 +141,20 @@ class ActionSessionStart(Action):
         # Obtener metadatos de la sesión si existen
         events = [SessionStarted()]
 
-        # Verificar si el usuario ya está autenticado
-        autenticado = tracker.get_slot("autenticado")
-        
-        if not autenticado:
+        # Un login reciente de este número se restaura sin llamar a /login
+        # (los slots no pasan de una sesión de Rasa a la siguiente)
+        sesion = obtener_sesiones().restaurar(tracker.sender_id)
+        if sesion is not None:
+            logger.info("Sesión restaurada para id_usuario=%s", sesion.id_usuario)
+            events.extend([
+                SlotSet("autenticado", True),
+                SlotSet("id_usuario", sesion.id_usuario),
+                SlotSet("usuario", sesion.usuario),
+            ])
+            dispatcher.utter_message(
+                text=f"👋 ¡Hola de nuevo, {sesion.usuario}! Tu sesión sigue activa."
+            )
+        elif not tracker.get_slot("autenticado"):
             # Solicitar login inicial
             dispatcher.utter_message(response="utter_solicitar_login_inicial")
         
@@ -42,7 +170,8 @@ class ActionLogin(Action):
     def name(self) -> Text:
         return "action_login"
 
-    def run(self, dispatcher: CollectingDispatcher,
+    @medir_accion
+    async def run(self, dispatcher: CollectingDispatcher,
             tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
 
@@ -50,13 +179,13 @@ class ActionLogin(Action):
         usuario = tracker.get_slot("usuario")
         contraseña = tracker.get_slot("contraseña")
 
-        print(f"🔍 DEBUG - Slots: usuario='{usuario}', contraseña='{contraseña}'")
+        logger.debug("Login: usuario=%r, contraseña en slot=%s", usuario, bool(contraseña))
 
         # Si no hay credenciales, extraerlas del último mensaje
         if not usuario or not contraseña:
             ultimo_mensaje = tracker.latest_message.get('text', '')
-            print(f"🔍 DEBUG - Mensaje del usuario: '{ultimo_mensaje}'")
-            usuario, contraseña = self.extraer_credenciales(ultimo_mensaje)
+            logger.debug("Login: extrayendo credenciales del mensaje (%d caracteres)", len(ultimo_mensaje))
+            usuario, contraseña = extraer_credenciales(ultimo_mensaje)
 
         if not usuario or not contraseña:
             mensajes = [
@@ -69,25 +198,37 @@ class ActionLogin(Action):
             dispatcher.utter_message(text=random.choice(mensajes))
             return []
 
+        # Demasiados intentos del mismo número o contra el mismo usuario se
+        # rechazan aquí, sin llegar a la API
+        espera = obtener_limitador().comprobar("login", tracker.sender_id, usuario)
+        if espera:
+            logger.warning("Login: intento limitado para usuario=%r", usuario)
+            dispatcher.utter_message(
+                text=f"⏳ Demasiados intentos de inicio de sesión. Espera {texto_espera(espera)} e inténtalo de nuevo."
+            )
+            return [SlotSet("contraseña", None)]
+
         # Llamar a la API de login
-        print(f"📡 DEBUG - Enviando petición a: {API_BASE_URL}/login")
-        print(f"📡 DEBUG - Datos: usuario='{usuario}', contraseña='***'")
+        logger.debug("Login: POST %s/login usuario=%r", API_BASE_URL, usuario)
         
         try:
-            response = requests.post(
-                f"{API_BASE_URL}/login",
-                json={"usuario": usuario, "contraseña": contraseña},
-                timeout=60
+            respuesta = await obtener_cliente().post(
+                "/login",
+                {"usuario": usuario, "contraseña": contraseña}
             )
             
-            print(f"📡 DEBUG - Status Code: {response.status_code}")
-            print(f"📡 DEBUG - Respuesta: {response.json()}")
+            logger.debug("Login: %r", respuesta)
 
-            if response.status_code == 200:
-                data = response.json()
-                id_usuario = data.get("id_usuario")
+            if respuesta.status == 200:
+                id_usuario = respuesta.datos.get("id_usuario")
                 
-                print(f"✅ DEBUG LOGIN - Usuario '{usuario}' autenticado con ID: {id_usuario} (tipo: {type(id_usuario)})")
+                logger.info("Login: usuario %r autenticado con id_usuario=%r", usuario, id_usuario)
+                obtener_sesiones().iniciar(
+                    tracker.sender_id,
+                    id_usuario,
+                    usuario,
+                    respuesta.datos.get("token") or respuesta.datos.get("access_token"),
+                )
                 
                 # Mensajes variados de login exitoso
                 mensajes_exitosos = [
@@ -103,8 +244,6 @@ class ActionLogin(Action):
                 # Enviar mensaje de bienvenida con información del bot
                 dispatcher.utter_message(response="utter_bienvenida_post_login")
                 
-                print(f"✅ DEBUG LOGIN - Guardando en slot id_usuario: '{id_usuario}' como string")
-                
                 return [
                     SlotSet("id_usuario", str(id_usuario)),
                     SlotSet("autenticado", True),
@@ -120,9 +259,10 @@ class ActionLogin(Action):
                     "❗ No te pude identificar. Asegúrate de que tus credenciales sean correctas."
                 ]
                 dispatcher.utter_message(text=random.choice(mensajes_fallidos))
+                obtener_sesiones().cerrar(tracker.sender_id)
                 return [SlotSet("autenticado", False), SlotSet("contraseña", None)]
 
-        except requests.exceptions.RequestException as e:
+        except ErrorConexionAPI as e:
             mensajes_error = [
                 "🔴 Error al conectar con el servidor. Por favor, intenta más tarde.",
                 "⚠️ No pude conectarme al sistema. Verifica tu conexión e intenta nuevamente.",
@@ -131,45 +271,9 @@ class ActionLogin(Action):
                 "⚡ No hay respuesta del servidor. Por favor, espera un momento y reintenta."
             ]
             dispatcher.utter_message(text=random.choice(mensajes_error))
-            print(f"Error en login: {e}")
+            logger.warning("Login: error de conexión con la API: %s", e)
             return [SlotSet("autenticado", False), SlotSet("contraseña", None)]
 
-    def extraer_credenciales(self, texto: str) -> tuple:
-        """Extrae usuario y contraseña del texto"""
-        usuario = None
-        contraseña = None
-
-        # Limpiar el texto
-        texto = texto.strip()
-        
-        print(f"🔍 DEBUG - Texto recibido: '{texto}'")
-
-        # Intentar múltiples patrones
-        patrones = [
-            # Patrón 1: "usuario: xxx, contraseña: yyy"
-            (r'usuario[:\s]+([^\s,]+).*contraseña[:\s]+([^\s,]+)', True),
-            # Patrón 2: "usuario xxx contraseña yyy"
-            (r'usuario\s+(\S+)\s+contraseña\s+(\S+)', True),
-            # Patrón 3: "user: xxx pass: yyy"
-            (r'user[:\s]+([^\s,]+).*pass[:\s]+([^\s,]+)', True),
-            # Patrón 4: Solo dos palabras (asume usuario contraseña)
-            (r'^(\S+)\s+(\S+)$', False)
-        ]
-
-        for patron, tiene_palabras_clave in patrones:
-            match = re.search(patron, texto, re.IGNORECASE)
-            if match:
-                if tiene_palabras_clave or (not usuario and not contraseña):
-                    usuario = match.group(1)
-                    contraseña = match.group(2)
-                    print(f"✅ DEBUG - Extraído: usuario='{usuario}', contraseña='{contraseña}'")
-                    break
-
-        if not usuario or not contraseña:
-            print(f"❌ DEBUG - No se pudo extraer credenciales del texto")
-
-        return usuario, contraseña
-
 
 class ActionRegistro(Action):
     """Acción para realizar el registro de un nuevo usuario"""
@@ -177,7 +281,8 @@ class ActionRegistro(Action):
     def name(self) -> Text:
         return "action_registro"
 
-    def run(self, dispatcher: CollectingDispatcher,
+    @medir_accion
+    async def run(self, dispatcher: CollectingDispatcher,
             tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
 
@@ -185,13 +290,13 @@ class ActionRegistro(Action):
         usuario = tracker.get_slot("usuario")
         contraseña = tracker.get_slot("contraseña")
 
-        print(f"🔍 DEBUG REGISTRO - Slots: usuario='{usuario}', contraseña='{contraseña}'")
+        logger.debug("Registro: usuario=%r, contraseña en slot=%s", usuario, bool(contraseña))
 
         # Si no hay credenciales, extraerlas del último mensaje
         if not usuario or not contraseña:
             ultimo_mensaje = tracker.latest_message.get('text', '')
-            print(f"🔍 DEBUG REGISTRO - Mensaje del usuario: '{ultimo_mensaje}'")
-            usuario, contraseña = self.extraer_credenciales(ultimo_mensaje)
+            logger.debug("Registro: extrayendo credenciales del mensaje (%d caracteres)", len(ultimo_mensaje))
+            usuario, contraseña = extraer_credenciales(ultimo_mensaje)
 
         if not usuario or not contraseña:
             mensajes = [
@@ -204,23 +309,26 @@ class ActionRegistro(Action):
             dispatcher.utter_message(text=random.choice(mensajes))
             return []
 
+        espera = obtener_limitador().comprobar("registro", tracker.sender_id, usuario)
+        if espera:
+            logger.warning("Registro: intento limitado para usuario=%r", usuario)
+            dispatcher.utter_message(
+                text=f"⏳ Demasiados intentos de registro. Espera {texto_espera(espera)} e inténtalo de nuevo."
+            )
+            return [SlotSet("contraseña", None)]
+
         # Llamar a la API de registro
-        print(f"📡 DEBUG REGISTRO - Enviando petición a: {API_BASE_URL}/register")
-        print(f"📡 DEBUG REGISTRO - Datos: usuario='{usuario}', contraseña='***'")
+        logger.debug("Registro: POST %s/register usuario=%r", API_BASE_URL, usuario)
         
         try:
-            response = requests.post(
-                f"{API_BASE_URL}/register",
-                json={"usuario": usuario, "contraseña": contraseña},
-                headers={"Content-Type": "application/json"},
-                timeout=60
+            respuesta = await obtener_cliente().post(
+                "/register",
+                {"usuario": usuario, "contraseña": contraseña}
             )
             
-            print(f"📡 DEBUG REGISTRO - Status Code: {response.status_code}")
-            print(f"📡 DEBUG REGISTRO - Respuesta: {response.json()}")
+            logger.debug("Registro: %r", respuesta)
 
-            if response.status_code == 201:
-                data = response.json()
+            if respuesta.status == 201:
                 mensajes_exitosos = [
                     f"✅ ¡Registro exitoso! Tu cuenta '{usuario}' ha sido creada. 🎉\n\nAhora puedes iniciar sesión escribiendo:\n'quiero iniciar sesión'",
                     f"🎊 ¡Bienvenido {usuario}! Tu cuenta está lista. Ya puedes hacer login. 🔐",
@@ -231,7 +339,7 @@ class ActionRegistro(Action):
                 dispatcher.utter_message(text=random.choice(mensajes_exitosos))
                 return [SlotSet("usuario", usuario), SlotSet("contraseña", None)]
             else:
-                error_msg = response.json().get("error", "Error desconocido")
+                error_msg = respuesta.error()
                 mensajes_error = [
                     f"❌ Error en el registro: {error_msg}",
                     f"🔴 No pude crear tu cuenta: {error_msg}",
@@ -242,7 +350,7 @@ class ActionRegistro(Action):
                 dispatcher.utter_message(text=random.choice(mensajes_error))
                 return [SlotSet("contraseña", None)]
 
-        except requests.exceptions.RequestException as e:
+        except ErrorConexionAPI as e:
             mensajes_error = [
                 "🔴 Error al conectar con el servidor. Por favor, intenta más tarde.",
                 "⚠️ Problema de conexión. Intenta registrarte nuevamente en unos momentos.",
@@ -251,45 +359,9 @@ class ActionRegistro(Action):
                 "🚫 Sin conexión al servidor. Intenta más tarde."
             ]
             dispatcher.utter_message(text=random.choice(mensajes_error))
-            print(f"Error en registro: {e}")
+            logger.warning("Registro: error de conexión con la API: %s", e)
             return [SlotSet("contraseña", None)]
 
-    def extraer_credenciales(self, texto: str) -> tuple:
-        """Extrae usuario y contraseña del texto"""
-        usuario = None
-        contraseña = None
-
-        # Limpiar el texto
-        texto = texto.strip()
-        
-        print(f"🔍 DEBUG - Texto recibido para registro: '{texto}'")
-
-        # Intentar múltiples patrones
-        patrones = [
-            # Patrón 1: "usuario: xxx, contraseña: yyy"
-            (r'usuario[:\s]+([^\s,]+).*contraseña[:\s]+([^\s,]+)', True),
-            # Patrón 2: "usuario xxx contraseña yyy"
-            (r'usuario\s+(\S+)\s+contraseña\s+(\S+)', True),
-            # Patrón 3: "user: xxx pass: yyy"
-            (r'user[:\s]+([^\s,]+).*pass[:\s]+([^\s,]+)', True),
-            # Patrón 4: Solo dos palabras (asume usuario contraseña)
-            (r'^(\S+)\s+(\S+)$', False)
-        ]
-
-        for patron, tiene_palabras_clave in patrones:
-            match = re.search(patron, texto, re.IGNORECASE)
-            if match:
-                if tiene_palabras_clave or (not usuario and not contraseña):
-                    usuario = match.group(1)
-                    contraseña = match.group(2)
-                    print(f"✅ DEBUG - Extraído: usuario='{usuario}', contraseña='{contraseña}'")
-                    break
-
-        if not usuario or not contraseña:
-            print(f"❌ DEBUG - No se pudo extraer credenciales del texto")
-
-        return usuario, contraseña
-
 
 class ActionVerificarAutenticacion(Action):
     """Acción para verificar si el usuario está autenticado"""
@@ -297,7 +369,8 @@ class ActionVerificarAutenticacion(Action):
     def name(self) -> Text:
         return "action_verificar_autenticacion"
 
-    def run(self, dispatcher: CollectingDispatcher,
+    @medir_accion
+    async def run(self, dispatcher: CollectingDispatcher,
             tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
 
@@ -322,7 +395,8 @@ class ActionHacerPrediccion(Action):
     def name(self) -> Text:
         return "action_hacer_prediccion"
 
-    def run(self, dispatcher: CollectingDispatcher,
+    @medir_accion
+    async def run(self, dispatcher: CollectingDispatcher,
             tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
 
@@ -343,8 +417,6 @@ class ActionHacerPrediccion(Action):
 
         # Recopilar todos los datos del formulario
         try:
-            print(f"📊 DEBUG PREDICCIÓN - id_usuario del slot: '{id_usuario}' (tipo: {type(id_usuario)})")
-            
             datos_prediccion = {
                 "id_usuario": int(id_usuario),
                 "Day_of_Week": int(tracker.get_slot("day_of_week")),
@@ -362,97 +434,29 @@ class ActionHacerPrediccion(Action):
                 "Number_of_Vehicles": int(tracker.get_slot("num_vehicles"))
             }
             
-            print(f"📊 DEBUG PREDICCIÓN - Enviando a API con id_usuario: {datos_prediccion['id_usuario']} (tipo: {type(datos_prediccion['id_usuario'])})")
-            print(f"📊 DEBUG PREDICCIÓN - Datos completos: {datos_prediccion}")
-            
-            # Llamar a la API de predicción
-            response = requests.post(
-                f"{API_BASE_URL}/predict",
-                json=datos_prediccion,
-                headers={"Content-Type": "application/json"},
-                timeout=60
-            )
+            logger.debug("Predicción: datos=%s", datos_prediccion)
             
-            print(f"📊 DEBUG PREDICCIÓN - Status Code: {response.status_code}")
+            # Escenarios repetidos se responden desde el cache; la API se llama
+            # igual en segundo plano para que la predicción quede en el historial
+            cache = obtener_cache()
+            en_cache = cache.obtener(datos_prediccion)
+            if en_cache is not None:
+                # El historial aún no se escribió (y puede fallar): aviso pendiente
+                respuesta = RespuestaAPI(200, {**en_cache, "Guardado": GUARDADO_PENDIENTE})
+                logger.debug("Predicción: resultado desde cache %s", cache.estadisticas())
+                obtener_cliente().post_en_segundo_plano("/predict", datos_prediccion)
+            else:
+                # Llamar a la API de predicción (agrupada con otras conversaciones)
+                respuesta = await obtener_agrupador().predecir(datos_prediccion)
+                if respuesta.status == 200:
+                    cache.guardar(datos_prediccion, respuesta.datos)
             
-            if response.status_code == 200:
-                resultado = response.json()
-                print(f"📊 DEBUG PREDICCIÓN - Respuesta: {resultado}")
-                
-                # Formatear el mensaje de respuesta - usar variaciones
-                mensajes = [
-                    f"""
-🎯 **RESULTADOS DE LA PREDICCIÓN** 🎯
-
-📊 **Modelos de IA:**
-• Random Forest: {resultado.get('RandomForest', 'N/A')}
-• SVM: {resultado.get('SVM', 'N/A')}
-• KNN: {resultado.get('KNN', 'N/A')}
-
-🏆 **Mejor Modelo:** {resultado.get('MejorModelo', 'Random Forest')}
+            logger.debug("Predicción: %r", respuesta)
 
-✅ {resultado.get('Guardado', 'Predicción guardada')}
-
-💡 **Recuerda:** Esta es una predicción basada en datos históricos. Siempre mantén precaución en las vías.
-""",
-                    f"""
-✨ **ANÁLISIS COMPLETADO** ✨
-
-🤖 **Predicciones por Modelo:**
-🌳 Random Forest: {resultado.get('RandomForest', 'N/A')}
-📊 SVM: {resultado.get('SVM', 'N/A')}
-🔵 KNN: {resultado.get('KNN', 'N/A')}
-
-🌟 **Modelo Destacado:** {resultado.get('MejorModelo', 'Random Forest')}
-
-💾 {resultado.get('Guardado', 'Datos almacenados exitosamente')}
-
-⚠️ **Nota:** Predicción basada en análisis de datos. Conduce siempre con precaución.
-""",
-                    f"""
-🚨 **PREDICCIÓN FINALIZADA** 🚨
-
-🔮 **Resultados de los Algoritmos:**
-🎯 Random Forest → {resultado.get('RandomForest', 'N/A')}
-🎯 SVM → {resultado.get('SVM', 'N/A')}
-🎯 KNN → {resultado.get('KNN', 'N/A')}
-
-🥇 **Algoritmo Más Preciso:** {resultado.get('MejorModelo', 'Random Forest')}
-
-✅ {resultado.get('Guardado', 'Registro guardado en tu historial')}
-
-👉 **Importante:** Resultados predictivos. Conduce con responsabilidad.
-""",
-                    f"""
-📊 **REPORTE DE PREDICCIÓN** 📊
-
-🔍 **Modelos Analizados:**
-▪️ Random Forest: {resultado.get('RandomForest', 'N/A')}
-▪️ SVM: {resultado.get('SVM', 'N/A')}
-▪️ KNN: {resultado.get('KNN', 'N/A')}
-
-🏅 **Modelo Óptimo:** {resultado.get('MejorModelo', 'Random Forest')}
-
-📝 {resultado.get('Guardado', 'Predicción registrada correctamente')}
-
-❗ **Advertencia:** Predicción estadística. Sigue las normas de tránsito.
-""",
-                    f"""
-🔵 **RESULTADOS DEL ANÁLISIS** 🔵
-
-🧠 **Predicciones IA:**
-🎯 RF: {resultado.get('RandomForest', 'N/A')}
-🎯 SVM: {resultado.get('SVM', 'N/A')}
-🎯 KNN: {resultado.get('KNN', 'N/A')}
-
-🥇 **Top Model:** {resultado.get('MejorModelo', 'Random Forest')}
-
-✅ {resultado.get('Guardado', '¡Guardado en tu historial!')}
-
-🔴 **Recuerda:** Análisis predictivo. La seguridad vial es responsabilidad de todos.
-"""
-                ]
-                dispatcher.utter_message(text=random.choice(mensajes))
+            resultado = respuesta.datos
+            if respuesta.status == 200:
+                
+                dispatcher.utter_message(text=mensaje_prediccion(resultado))
                 
                 # Limpiar los slots del formulario
                 return [
@@ -471,7 +475,7 @@ class ActionHacerPrediccion(Action):
                     SlotSet("num_vehicles", None)
                 ]
             else:
-                error = response.json().get("error", "Error desconocido")
+                error = respuesta.error()
                 mensajes_error = [
                     f"❌ Error al hacer la predicción: {error}",
                     f"🔴 No pude procesar la predicción: {error}",
@@ -483,7 +487,7 @@ class ActionHacerPrediccion(Action):
                 return []
                 
         except Exception as e:
-            print(f"❌ ERROR en predicción: {e}")
+            logger.exception("Error en predicción")
             mensajes_error = [
                 "🔴 Hubo un error al procesar la predicción. Por favor, intenta de nuevo.",
                 "❌ Error procesando tu solicitud. Reintenta en un momento.",
@@ -501,7 +505,8 @@ class ActionEnviarHistorial(Action):
     def name(self) -> Text:
         return "action_enviar_historial"
 
-    def run(self, dispatcher: CollectingDispatcher,
+    @medir_accion
+    async def run(self, dispatcher: CollectingDispatcher,
             tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
 
@@ -526,7 +531,7 @@ class ActionEnviarHistorial(Action):
         # Si no hay email, extraerlo del último mensaje
         if not email:
             ultimo_mensaje = tracker.latest_message.get('text', '')
-            email = self.extraer_email(ultimo_mensaje)
+            email = extraer_email(ultimo_mensaje)
         
         # Si aún no hay email, solicitarlo
         if not email:
@@ -534,7 +539,7 @@ class ActionEnviarHistorial(Action):
             return []
         
         # Validar formato de email
-        if not self.validar_email(email):
+        if not validar_email(email):
             mensajes = [
                 "❌ El formato del email no es válido. Por favor, proporciona un correo válido.",
                 "🔴 Email inválido. Verifica el formato (ejemplo@correo.com).",
@@ -545,101 +550,83 @@ class ActionEnviarHistorial(Action):
             dispatcher.utter_message(text=random.choice(mensajes))
             return [SlotSet("email", None)]
         
-        try:
-            # Llamar a la API para enviar el historial
-            print(f"📧 DEBUG HISTORIAL - id_usuario del slot: '{id_usuario}' (tipo: {type(id_usuario)})")
-            print(f"📧 DEBUG HISTORIAL - Convirtiendo a int: {int(id_usuario)}")
-            print(f"📧 DEBUG HISTORIAL - Enviando a: {email} para usuario: {id_usuario}")
-            
-            response = requests.post(
-                f"{API_BASE_URL}/enviar_historial",
-                json={"id_usuario": int(id_usuario), "email": email},
-                headers={"Content-Type": "application/json"},
-                timeout=120
-            )
-            
-            print(f"📧 DEBUG HISTORIAL - Status Code: {response.status_code}")
-            if response.status_code != 200:
-                print(f"📧 DEBUG HISTORIAL - Respuesta de error: {response.text}")
-            
-            if response.status_code == 200:
-                data = response.json()
-                total = data.get("total_predicciones", 0)
-                
-                mensajes_exitosos = [
-                    f"✅ ¡Listo! He enviado tu historial con {total} predicciones a {email}. 📧\n\nRevisa tu bandeja de entrada (y spam si no lo ves).",
-                    f"🎉 ¡Historial enviado! {total} predicciones han sido enviadas a {email}. 📬\n\nChequea tu correo.",
-                    f"📨 ¡Perfecto! Tu PDF con {total} predicciones está en camino a {email}. ✉️\n\nRevisa tu correo en unos momentos.",
-                    f"✨ ¡Hecho! He enviado {total} predicciones a tu correo {email}. 💌\n\nLlega en breve.",
-                    f"🚀 ¡Envío exitoso! {total} predicciones en camino a {email}. 📩\n\nRevisa tu bandeja."
-                ]
-                
-                dispatcher.utter_message(text=random.choice(mensajes_exitosos))
-                return [SlotSet("email", None)]
-                
-            elif response.status_code == 404:
-                mensajes_sin_datos = [
-                    "📭 No tienes predicciones guardadas aún.\n\n¡Haz tu primera predicción para comenzar tu historial!",
-                    "🤷 Todavía no has realizado ninguna predicción.\n\n¿Quieres hacer una ahora?",
-                    "📊 Tu historial está vacío. ¡Empieza haciendo tu primera predicción!",
-                    "📄 Sin datos aún. Haz una predicción primero.",
-                    "🆕 Historial vacío. ¡Realiza tu primera predicción!"
-                ]
-                dispatcher.utter_message(text=random.choice(mensajes_sin_datos))
-                return [SlotSet("email", None)]
-                
-            else:
-                error_msg = response.json().get("error", "Error desconocido")
-                mensajes_error = [
-                    f"❌ No pude enviar el historial: {error_msg}",
-                    f"🔴 Hubo un problema al enviar el correo: {error_msg}",
-                    f"⚠️ Error al procesar tu solicitud: {error_msg}",
-                    f"🚫 Fallo en el envío del historial: {error_msg}",
-                    f"📧 No se pudo enviar el email: {error_msg}"
-                ]
-                dispatcher.utter_message(text=random.choice(mensajes_error))
-                return [SlotSet("email", None)]
-                
-        except requests.exceptions.Timeout:
-            mensajes_timeout = [
-                "⏱️ La solicitud tomó demasiado tiempo. Por favor, intenta de nuevo.",
-                "⏳ Tiempo de espera agotado. Reintenta en un momento.",
-                "🕒 El servidor tardó mucho en responder. Intenta nuevamente.",
-                "⚠️ Timeout. Por favor intenta de nuevo.",
-                "⏰ Solicitud expirada. Reintenta por favor."
+        logger.debug("Historial: encolando envío a %s para id_usuario=%r", email, id_usuario)
+
+        # El envío (PDF + correo) se hace en segundo plano; el resultado llega
+        # después como mensaje proactivo mediante action_notificar_historial
+        cola = obtener_cola()
+        en_curso = cola.estado(int(id_usuario))
+        if en_curso and en_curso["estado"] in ESTADOS_ACTIVOS:
+            mensajes_en_curso = [
+                f"⏳ Ya estoy preparando tu historial para {en_curso['email']}. Te aviso por aquí en cuanto se envíe.",
+                f"📨 Tu historial ya está en camino a {en_curso['email']}. Dame un momento más.",
+                f"🕒 Sigo trabajando en tu envío anterior a {en_curso['email']}. Te confirmo en breve."
             ]
-            dispatcher.utter_message(text=random.choice(mensajes_timeout))
+            dispatcher.utter_message(text=random.choice(mensajes_en_curso))
             return [SlotSet("email", None)]
-            
-        except requests.exceptions.RequestException as e:
+
+        cola.encolar(int(id_usuario), email, tracker.sender_id)
+
+        mensajes_aceptado = [
+            f"📨 ¡Perfecto! Estoy preparando tu historial para enviarlo a {email}. Te aviso por aquí cuando esté listo.",
+            f"⏳ Generando tu PDF con el historial para {email}... Te confirmo en cuanto se envíe.",
+            f"📧 Recibido. Tu historial va en camino a {email}; te escribo cuando termine.",
+            f"🛠️ Estoy armando tu historial para {email}. En unos momentos te confirmo el envío.",
+            f"✉️ ¡Anotado! Preparo el envío a {email} y te aviso apenas salga."
+        ]
+        dispatcher.utter_message(text=random.choice(mensajes_aceptado))
+        return [SlotSet("email", None)]
+
+
+class ActionNotificarHistorial(Action):
+    """Acción proactiva que informa el resultado del envío del historial"""
+
+    def name(self) -> Text:
+        return "action_notificar_historial"
+
+    @medir_accion
+    async def run(self, dispatcher: CollectingDispatcher,
+            tracker: Tracker,
+            domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
+
+        # La cola de historial envía el resultado como entidades del intent externo
+        entidades = {
+            e.get("entity"): e.get("value")
+            for e in tracker.latest_message.get("entities", [])
+        }
+        estado = entidades.get("estado_historial")
+        email = entidades.get("email_historial", "tu correo")
+        total = entidades.get("total_predicciones", 0)
+        error_msg = entidades.get("error_historial", "Error desconocido")
+
+        if estado == COMPLETADO:
+            mensajes_exitosos = [
+                f"✅ ¡Listo! He enviado tu historial con {total} predicciones a {email}. 📧\n\nRevisa tu bandeja de entrada (y spam si no lo ves).",
+                f"🎉 ¡Historial enviado! {total} predicciones han sido enviadas a {email}. 📬\n\nChequea tu correo.",
+                f"📨 ¡Perfecto! Tu PDF con {total} predicciones está en camino a {email}. ✉️\n\nRevisa tu correo en unos momentos.",
+                f"✨ ¡Hecho! He enviado {total} predicciones a tu correo {email}. 💌\n\nLlega en breve.",
+                f"🚀 ¡Envío exitoso! {total} predicciones en camino a {email}. 📩\n\nRevisa tu bandeja."
+            ]
+            dispatcher.utter_message(text=random.choice(mensajes_exitosos))
+
+        elif estado == SIN_DATOS:
+            mensajes_sin_datos = [
+                "📭 No tienes predicciones guardadas aún.\n\n¡Haz tu primera predicción para comenzar tu historial!",
+                "🤷 Todavía no has realizado ninguna predicción.\n\n¿Quieres hacer una ahora?",
+                "📊 Tu historial está vacío. ¡Empieza haciendo tu primera predicción!",
+                "📄 Sin datos aún. Haz una predicción primero.",
+                "🆕 Historial vacío. ¡Realiza tu primera predicción!"
+            ]
+            dispatcher.utter_message(text=random.choice(mensajes_sin_datos))
+
+        else:
             mensajes_error = [
-                "🔴 Error al conectar con el servidor. Por favor, intenta más tarde.",
-                "⚠️ Problema de conexión. Intenta nuevamente en unos momentos.",
-                "❌ No pude comunicarme con el servidor. Reintenta pronto.",
-                "🔌 Error de red. Verifica tu conexión.",
-                "🚫 Sin conexión al servidor. Intenta más tarde."
+                f"❌ No pude enviar el historial: {error_msg}",
+                f"🔴 Hubo un problema al enviar el correo: {error_msg}",
+                f"⚠️ Error al procesar tu solicitud: {error_msg}",
+                f"🚫 Fallo en el envío del historial: {error_msg}",
+                f"📧 No se pudo enviar el email: {error_msg}"
             ]
             dispatcher.utter_message(text=random.choice(mensajes_error))
-            print(f"Error en envío de historial: {e}")
-            return [SlotSet("email", None)]
 
-    def extraer_email(self, texto: str) -> str:
-        """Extrae el email del texto usando expresiones regulares"""
-        # Patrón para detectar emails
-        patron = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-        match = re.search(patron, texto)
-        
-        if match:
-            email = match.group(0)
-            print(f"✅ DEBUG - Email extraído: {email}")
-            return email
-        
-        print(f"❌ DEBUG - No se pudo extraer email del texto: '{texto}'")
-        return None
-
-    def validar_email(self, email: str) -> bool:
-        """Valida el formato del email"""
-        if not email:
-            return False
-        patron = r'^[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}$'
-        return bool(re.match(patron, email))
\ No newline at end of file
+        return []
@@ -0,0 +1,128 @@
+from typing import Any, Dict, Optional, Text
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import sys
+import time
+
+# Nivel de la bitácora de las acciones: DEBUG, INFO, WARNING, ERROR
+NIVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# "texto" para la consola, "json" para una línea JSON por evento
+FORMATO = os.getenv("LOG_FORMATO", "texto").lower()
+# Eventos en espera de escribirse; si se llena, se descartan en vez de bloquear
+TAMANO_COLA = int(os.getenv("LOG_TAMANO_COLA", "10000"))
+
+RAIZ = "actions"
+
+_SECRETOS = re.compile(
+    r"""(?P<clave>contraseña|contrasena|password|passwd|token|secret|app_secret|access_token)"""
+    r"""(?P<sep>['"]?\s*[:=]\s*['"]?)(?P<valor>[^\s,'"}]+)""",
+    re.IGNORECASE,
+)
+_BEARER = re.compile(r"Bearer\s+[A-Za-z0-9._~+/=-]+")
+_EMAIL = re.compile(r"\b([A-Za-z0-9._%+-])[A-Za-z0-9._%+-]*@([A-Za-z0-9.-]+\.[A-Za-z]{2,})\b")
+
+# Atributos propios de LogRecord; el resto llega por `extra=` y va al JSON
+_ATRIBUTOS_REGISTRO = frozenset(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def redactar(texto: Text) -> Text:
+    """Oculta contraseñas, tokens y la parte local de los correos"""
+    texto = _SECRETOS.sub(r"\g<clave>\g<sep>***", texto)
+    texto = _BEARER.sub("Bearer ***", texto)
+    return _EMAIL.sub(r"\1***@\2", texto)
+
+
+class FiltroSecretos(logging.Filter):
+    """Formatea el mensaje una sola vez y lo deja redactado.
+
+    También el traceback y la pila: los formateadores usan `exc_text` si ya
+    está puesto, así que la excepción sale redactada igual que el mensaje.
+
+    Corre en el hilo que registra el evento, y solo para eventos que
+    pasaron el nivel: un `logger.debug` deshabilitado no formatea nada.
+    """
+
+    _formateador = logging.Formatter()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.msg = redactar(record.getMessage())
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self._formateador.formatException(record.exc_info)
+        if record.exc_text:
+            record.exc_text = redactar(record.exc_text)
+        if record.stack_info:
+            record.stack_info = redactar(record.stack_info)
+        return True
+
+
+class FormateadorJSON(logging.Formatter):
+    """Una línea JSON por evento, con los campos pasados en `extra=`"""
+
+    def format(self, record: logging.LogRecord) -> Text:
+        evento: Dict[Text, Any] = {
+            "ts": round(record.created, 3),
+            "nivel": record.levelname,
+            "logger": record.name,
+            "mensaje": record.getMessage(),
+        }
+        for clave, valor in vars(record).items():
+            if clave not in _ATRIBUTOS_REGISTRO:
+                evento[clave] = valor
+        if record.exc_info:
+            evento["excepcion"] = record.exc_text or self.formatException(record.exc_info)
+        return json.dumps(evento, ensure_ascii=False, default=str)
+
+
+class _ManejadorCola(logging.handlers.QueueHandler):
+    """QueueHandler que descarta eventos si la cola está llena"""
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+
+def configurar_bitacora() -> None:
+    """Envía la bitácora de `actions.*` a stdout a través de una cola.
+
+    Los eventos se encolan sin bloquear y un hilo aparte los escribe, así
+    el bucle de eventos del servidor de acciones nunca espera a stdout.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    salida = logging.StreamHandler(sys.stdout)
+    if FORMATO == "json":
+        salida.setFormatter(FormateadorJSON())
+    else:
+        formateador = logging.Formatter("%(asctime)s %(levelname)s %(name)s - %(message)s")
+        formateador.converter = time.gmtime
+        salida.setFormatter(formateador)
+
+    manejador = _ManejadorCola(queue.Queue(TAMANO_COLA))
+    manejador.addFilter(FiltroSecretos())
+
+    raiz = logging.getLogger(RAIZ)
+    raiz.setLevel(NIVEL)
+    raiz.addHandler(manejador)
+    raiz.propagate = False
+
+    _listener = logging.handlers.QueueListener(manejador.queue, salida)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+def obtener_logger(nombre: Text) -> logging.Logger:
+    """Logger hijo de `actions`, con la bitácora ya configurada"""
+    configurar_bitacora()
+    return logging.getLogger(nombre)
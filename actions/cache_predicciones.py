@@ -0,0 +1,94 @@
+from typing import Any, Text, Dict, Optional, Tuple
+from collections import OrderedDict
+import time
+
+from actions.metricas import REGISTRO
+
+# Campos que recibe el modelo, en el orden en que se forma la clave.
+# id_usuario no forma parte de la clave: no cambia el resultado del modelo.
+CAMPOS_MODELO = (
+    "Day_of_Week",
+    "Junction_Control",
+    "Junction_Detail",
+    "Light_Conditions",
+    "Local_Authority_(District)",
+    "Road_Surface_Conditions",
+    "Road_Type",
+    "Speed_limit",
+    "Urban_or_Rural_Area",
+    "Weather_Conditions",
+    "Vehicle_Type",
+    "Number_of_Casualties",
+    "Number_of_Vehicles",
+)
+
+# Lo único que depende del vector de características. "Guardado" y los
+# demás textos de la respuesta son de la petición de un usuario concreto
+CAMPOS_RESULTADO = ("RandomForest", "SVM", "KNN", "MejorModelo")
+
+TAMANO_MAXIMO = 1024
+TTL_SEGUNDOS = 3600
+
+
+def clave_prediccion(datos: Dict[Text, Any]) -> Tuple[int, ...]:
+    """Tupla canónica del vector de características (sin id_usuario)"""
+    return tuple(int(datos[campo]) for campo in CAMPOS_MODELO)
+
+
+class CachePredicciones:
+    """Cache LRU con expiración (TTL) de las salidas del modelo"""
+
+    def __init__(self, tamano_maximo: int = TAMANO_MAXIMO, ttl: float = TTL_SEGUNDOS) -> None:
+        self.tamano_maximo = tamano_maximo
+        self.ttl = ttl
+        self._entradas: "OrderedDict[Tuple[int, ...], Tuple[float, Dict[Text, Any]]]" = OrderedDict()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, datos: Dict[Text, Any]) -> Optional[Dict[Text, Any]]:
+        """Devuelve el resultado cacheado o None si no existe o expiró"""
+        clave = clave_prediccion(datos)
+        entrada = self._entradas.get(clave)
+        if entrada is None or entrada[0] < time.monotonic():
+            if entrada is not None:
+                del self._entradas[clave]
+            self.fallos += 1
+            return None
+
+        self._entradas.move_to_end(clave)
+        self.aciertos += 1
+        return dict(entrada[1])
+
+    def guardar(self, datos: Dict[Text, Any], resultado: Dict[Text, Any]) -> None:
+        clave = clave_prediccion(datos)
+        salidas = {campo: resultado[campo] for campo in CAMPOS_RESULTADO if campo in resultado}
+        self._entradas[clave] = (time.monotonic() + self.ttl, salidas)
+        self._entradas.move_to_end(clave)
+        while len(self._entradas) > self.tamano_maximo:
+            self._entradas.popitem(last=False)
+
+    def estadisticas(self) -> Dict[Text, Any]:
+        consultas = self.aciertos + self.fallos
+        return {
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "tasa_aciertos": self.aciertos / consultas if consultas else 0.0,
+            "entradas": len(self._entradas),
+            "tamano_maximo": self.tamano_maximo,
+        }
+
+
+_cache: Optional[CachePredicciones] = None
+
+
+def obtener_cache() -> CachePredicciones:
+    """Devuelve el cache de predicciones compartido por el servidor de acciones"""
+    global _cache
+    if _cache is None:
+        _cache = CachePredicciones()
+        REGISTRO.calculada(
+            "cache_predicciones_consultas_total", "Consultas al cache de predicciones",
+            lambda: {"acierto": _cache.aciertos, "fallo": _cache.fallos},
+            etiqueta="resultado", tipo="counter",
+        )
+    return _cache
@@ -0,0 +1,411 @@
+from typing import Any, Text, Dict, Optional, Set, Tuple
+import asyncio
+import json
+import os
+import time
+import aiohttp
+
+try:
+    import orjson
+
+    _loads = orjson.loads
+except ImportError:  # aceleración opcional
+    _loads = json.loads
+
+from actions.bitacora import obtener_logger
+from actions import trazas
+from actions.metricas import REGISTRO
+from actions.resiliencia import (
+    ABIERTO, CERRADO, SEMIABIERTO, InterruptorCircuito, LatenciasRecientes, MantenedorCalor,
+    PoliticaReintentos, con_cobertura
+)
+
+logger = obtener_logger(__name__)
+
+LATENCIA_API = REGISTRO.histograma(
+    "api_peticion_duracion_segundos", "Duración de cada POST a la API por ruta", ("ruta",)
+)
+PETICIONES_API = REGISTRO.contador(
+    "api_peticiones_total",
+    "POST a la API por ruta y resultado (status HTTP, timeout, error o circuito_abierto)",
+    ("ruta", "resultado"),
+)
+
+# URL base de tu API Flask en Render (API_BASE_URL apunta a otra, p. ej. el
+# backend falso de pruebas_carga)
+API_BASE_URL = os.environ.get("API_BASE_URL", "https://api-ia-o027.onrender.com")
+
+# Timeouts por endpoint: (conexión, lectura) en segundos.
+# La conexión falla rápido; la lectura respeta lo que tarda cada operación.
+TIMEOUTS_POR_ENDPOINT = {
+    "/login": (10, 60),
+    "/register": (10, 60),
+    "/predict": (10, 60),
+    "/enviar_historial": (10, 120),
+}
+TIMEOUT_POR_DEFECTO = (10, 60)
+
+# Rutas que se usan tal cual como etiqueta de las métricas; cualquier otra
+# cuenta como "otra" para que los números de teléfono, IDs o tokens de una
+# ruta no abran series nuevas ni se publiquen
+RUTAS_CONOCIDAS = frozenset(
+    list(TIMEOUTS_POR_ENDPOINT) + [os.environ.get("API_PREDICT_BATCH_PATH") or "/predict_lote"]
+)
+
+# Llamadas idempotentes que se pueden reintentar y su plazo total (segundos)
+PLAZO_TOTAL_IDEMPOTENTES = {
+    "/login": 90,
+}
+
+# /predict escribe una fila en el historial en cada llamada: solo se
+# reintenta si la petición no llegó a salir (no se obtuvo conexión), nunca
+# tras un timeout de lectura o un 5xx, cuando el backend pudo registrarla
+PLAZO_TOTAL_SIN_ENVIO = {
+    "/predict": 90,
+}
+
+# Petición de cobertura para /predict cuando la primera supera el p95.
+# Desactivada por defecto: si ambas llegan al backend, la predicción se
+# registra dos veces en el historial.
+RUTAS_CON_COBERTURA = {"/predict"} if os.environ.get("API_HEDGE_PREDICT") == "1" else set()
+
+# Tamaño del pool de conexiones keep-alive hacia la API
+LIMITE_CONEXIONES = 20
+# Escrituras de fondo en curso como máximo; con la API caída no se acumulan
+# sin fin: las que no caben se descartan
+MAX_ESCRITURAS_FONDO = 100
+KEEPALIVE_SEGUNDOS = 60
+
+
+def ruta_etiqueta(ruta: Text) -> Text:
+    """Etiqueta de una ruta: sin query string si es conocida, si no "otra"."""
+    ruta = ruta.partition("?")[0]
+    return ruta if ruta in RUTAS_CONOCIDAS else "otra"
+
+
+class ErrorConexionAPI(Exception):
+    """Error de red al comunicarse con la API (equivalente a RequestException)"""
+
+
+class TimeoutAPI(ErrorConexionAPI):
+    """La API no respondió dentro del tiempo límite"""
+
+
+class CircuitoAbiertoAPI(ErrorConexionAPI):
+    """El circuito está abierto: la llamada se rechaza sin tocar la red"""
+
+
+class PeticionNoEnviadaAPI(ErrorConexionAPI):
+    """No se obtuvo conexión con la API: la petición no llegó a enviarse"""
+
+
+def _reintentable(e: Exception) -> bool:
+    return isinstance(e, ErrorConexionAPI) and not isinstance(e, CircuitoAbiertoAPI)
+
+
+def _no_enviada(e: Exception) -> bool:
+    return isinstance(e, PeticionNoEnviadaAPI)
+
+
+# Cuánto del cuerpo de una respuesta que no es JSON se guarda para el error
+LARGO_CUERPO_ERROR = 200
+
+
+class RespuestaAPI:
+    """Respuesta de la API, decodificada una sola vez al recibirla.
+
+    `datos` es siempre un diccionario: vacío si el cuerpo no era un objeto
+    JSON (p. ej. la página HTML de un 502). En ese caso `cuerpo` guarda el
+    principio del texto, solo para los logs: nunca se muestra al usuario.
+    """
+
+    __slots__ = ("status", "datos", "segundos", "cuerpo")
+
+    def __init__(
+        self, status: int, datos: Dict[Text, Any], segundos: float = 0.0, cuerpo: Text = ""
+    ) -> None:
+        self.status = status
+        self.datos = datos
+        self.segundos = segundos
+        self.cuerpo = cuerpo
+
+    @classmethod
+    def decodificar(cls, status: int, crudo: bytes, segundos: float) -> "RespuestaAPI":
+        try:
+            datos = _loads(crudo) if crudo else {}
+        except ValueError:
+            datos = None
+        if isinstance(datos, dict):
+            return cls(status, datos, segundos)
+        texto = crudo[:LARGO_CUERPO_ERROR].decode("utf-8", errors="replace").strip()
+        return cls(status, {}, segundos, texto)
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status < 300
+
+    def error(self, por_defecto: Text = "Error desconocido") -> Text:
+        """Mensaje de error de la API (el campo "error" del JSON), o `por_defecto`"""
+        return self.datos.get("error") or por_defecto
+
+    def __repr__(self) -> Text:
+        return f"RespuestaAPI({self.status}, {self.datos or self.cuerpo!r}, {self.segundos:.3f}s)"
+
+
+class ClienteAPI:
+    """Cliente HTTP compartido hacia la API Flask.
+
+    Mantiene un pool acotado de conexiones keep-alive, aplica timeouts de
+    conexión y lectura por endpoint y lleva estadísticas del pool. Con un
+    interruptor de circuito, las llamadas fallan al instante mientras la API
+    está caída.
+    """
+
+    def __init__(
+        self,
+        base_url: Text = API_BASE_URL,
+        limite_conexiones: int = LIMITE_CONEXIONES,
+        keepalive: float = KEEPALIVE_SEGUNDOS,
+        timeouts: Optional[Dict[Text, Tuple[float, float]]] = None,
+        circuito: Optional[InterruptorCircuito] = None,
+        reintentos: Optional[PoliticaReintentos] = None,
+    ) -> None:
+        self.base_url = base_url
+        self.limite_conexiones = limite_conexiones
+        self.keepalive = keepalive
+        self.timeouts = dict(TIMEOUTS_POR_ENDPOINT)
+        if timeouts:
+            self.timeouts.update(timeouts)
+        self.circuito = circuito
+        self.reintentos = reintentos
+        self.calentador: Optional[MantenedorCalor] = None
+        self._latencias: Dict[Text, LatenciasRecientes] = {}
+
+        self._sesion: Optional[aiohttp.ClientSession] = None
+        self._tareas_fondo: Set[asyncio.Task] = set()
+        self._stats = {
+            "peticiones": 0,
+            "en_vuelo": 0,
+            "errores": 0,
+            "timeouts": 0,
+            "conexiones_nuevas": 0,
+            "conexiones_reutilizadas": 0,
+            "peticiones_cobertura": 0,
+            "escrituras_descartadas": 0,
+        }
+
+    def _obtener_sesion(self) -> aiohttp.ClientSession:
+        """Crea la sesión de forma perezosa, ya dentro del event loop de Sanic"""
+        if self._sesion is None or self._sesion.closed:
+            config_trazas = aiohttp.TraceConfig()
+            config_trazas.on_connection_create_end.append(self._al_crear_conexion)
+            config_trazas.on_connection_reuseconn.append(self._al_reutilizar_conexion)
+
+            conector = aiohttp.TCPConnector(
+                limit=self.limite_conexiones,
+                keepalive_timeout=self.keepalive,
+                ttl_dns_cache=300,
+            )
+            self._sesion = aiohttp.ClientSession(
+                connector=conector,
+                headers={"Content-Type": "application/json"},
+                trace_configs=[config_trazas],
+            )
+        return self._sesion
+
+    async def _al_crear_conexion(self, sesion, contexto, params) -> None:
+        self._stats["conexiones_nuevas"] += 1
+        _marcar_conectado(contexto)
+
+    async def _al_reutilizar_conexion(self, sesion, contexto, params) -> None:
+        self._stats["conexiones_reutilizadas"] += 1
+        _marcar_conectado(contexto)
+
+    def _timeout(self, ruta: Text) -> aiohttp.ClientTimeout:
+        conexion, lectura = self.timeouts.get(ruta, TIMEOUT_POR_DEFECTO)
+        return aiohttp.ClientTimeout(total=None, connect=conexion, sock_read=lectura)
+
+    async def post(self, ruta: Text, datos: Dict[Text, Any]) -> RespuestaAPI:
+        """Hace un POST a la API sin bloquear el event loop.
+
+        El cuerpo se decodifica una vez (con orjson si está instalado). Las
+        rutas idempotentes se reintentan dentro de su plazo total.
+        """
+        if self.reintentos is None:
+            return await self._post_cubierto(ruta, datos)
+        if ruta in PLAZO_TOTAL_IDEMPOTENTES:
+            plazo, reintentable, reintentar_5xx = PLAZO_TOTAL_IDEMPOTENTES[ruta], _reintentable, True
+        elif ruta in PLAZO_TOTAL_SIN_ENVIO:
+            plazo, reintentable, reintentar_5xx = PLAZO_TOTAL_SIN_ENVIO[ruta], _no_enviada, False
+        else:
+            return await self._post_cubierto(ruta, datos)
+
+        try:
+            return await self.reintentos.ejecutar(
+                lambda: self._post_cubierto(ruta, datos), plazo, reintentable, reintentar_5xx
+            )
+        except asyncio.TimeoutError as e:
+            raise TimeoutAPI(f"Plazo total agotado en {ruta}") from e
+
+    async def _post_cubierto(self, ruta: Text, datos: Dict[Text, Any]) -> RespuestaAPI:
+        """Un intento, con petición de cobertura si la ruta lo admite"""
+        if ruta not in RUTAS_CON_COBERTURA:
+            return await self._post_una_vez(ruta, datos)
+
+        latencias = self._latencias.get(ruta)
+        umbral = latencias.p95() if latencias is not None else None
+        resultado, cubierta = await con_cobertura(lambda: self._post_una_vez(ruta, datos), umbral)
+        if cubierta:
+            self._stats["peticiones_cobertura"] += 1
+        return resultado
+
+    async def _post_una_vez(self, ruta: Text, datos: Dict[Text, Any]) -> RespuestaAPI:
+        if self.calentador is not None:
+            self.calentador.registrar_actividad()
+        etiqueta = ruta_etiqueta(ruta)
+        if self.circuito is not None and not self.circuito.permitir():
+            PETICIONES_API.inc(etiqueta, "circuito_abierto")
+            raise CircuitoAbiertoAPI(f"Circuito abierto, llamada a {ruta} rechazada")
+
+        sesion = self._obtener_sesion()
+        self._stats["peticiones"] += 1
+        self._stats["en_vuelo"] += 1
+        resultado_registrado = False
+        tramo = trazas.iniciar(f"api POST {etiqueta}", ruta=etiqueta)
+        # Los hooks de conexión lo marcan al obtener una: a partir de ahí la
+        # API pudo recibir la petición
+        envio = {"conectado": False}
+        inicio = time.monotonic()
+        try:
+            async with sesion.post(
+                f"{self.base_url}{ruta}", json=datos, timeout=self._timeout(ruta),
+                trace_request_ctx=envio,
+            ) as response:
+                respuesta = RespuestaAPI.decodificar(
+                    response.status, await response.read(), time.monotonic() - inicio
+                )
+                LATENCIA_API.observar(respuesta.segundos, etiqueta)
+                PETICIONES_API.inc(etiqueta, str(response.status))
+                tramo.anotar("status", response.status)
+                if response.status < 500:
+                    self._latencias.setdefault(ruta, LatenciasRecientes()).registrar(
+                        respuesta.segundos
+                    )
+                if self.circuito is not None:
+                    resultado_registrado = True
+                    if response.status >= 500:
+                        self.circuito.registrar_fallo()
+                    else:
+                        self.circuito.registrar_exito()
+                return respuesta
+        except asyncio.TimeoutError as e:
+            self._stats["timeouts"] += 1
+            LATENCIA_API.observar(time.monotonic() - inicio, etiqueta)
+            PETICIONES_API.inc(etiqueta, "timeout")
+            tramo.terminar(e)
+            self._registrar_fallo_circuito()
+            resultado_registrado = True
+            if not envio["conectado"]:
+                raise PeticionNoEnviadaAPI(f"Timeout de conexión en {ruta}") from e
+            raise TimeoutAPI(f"Timeout en {ruta}") from e
+        except aiohttp.ClientError as e:
+            self._stats["errores"] += 1
+            PETICIONES_API.inc(etiqueta, "error")
+            tramo.terminar(e)
+            self._registrar_fallo_circuito()
+            resultado_registrado = True
+            if not envio["conectado"]:
+                raise PeticionNoEnviadaAPI(str(e)) from e
+            raise ErrorConexionAPI(str(e)) from e
+        finally:
+            tramo.terminar()
+            self._stats["en_vuelo"] -= 1
+            if self.circuito is not None and not resultado_registrado:
+                self.circuito.liberar()
+
+    def _registrar_fallo_circuito(self) -> None:
+        if self.circuito is not None:
+            self.circuito.registrar_fallo()
+
+    async def ping(self) -> int:
+        """GET a la raíz de la API (calentamiento); no pasa por el circuito"""
+        sesion = self._obtener_sesion()
+        async with sesion.get(f"{self.base_url}/", timeout=self._timeout("/")) as response:
+            return response.status
+
+    def post_en_segundo_plano(self, ruta: Text, datos: Dict[Text, Any]) -> None:
+        """Lanza un POST sin esperar su respuesta (escrituras secundarias)"""
+        if len(self._tareas_fondo) >= MAX_ESCRITURAS_FONDO:
+            self._stats["escrituras_descartadas"] += 1
+            logger.warning("Escritura de fondo a %s descartada: %d en curso", ruta, len(self._tareas_fondo))
+            return
+        tarea = asyncio.create_task(self._post_silencioso(ruta, datos))
+        self._tareas_fondo.add(tarea)
+        tarea.add_done_callback(self._tareas_fondo.discard)
+
+    async def _post_silencioso(self, ruta: Text, datos: Dict[Text, Any]) -> None:
+        try:
+            respuesta = await self.post(ruta, datos)
+            if respuesta.status >= 400:
+                logger.error("Escritura de fondo a %s: %r", ruta, respuesta)
+        except ErrorConexionAPI as e:
+            logger.error("Escritura de fondo a %s: %s", ruta, e)
+
+    def estadisticas(self) -> Dict[Text, Any]:
+        """Estadísticas del pool de conexiones y de las peticiones"""
+        stats = dict(self._stats)
+        stats["limite_conexiones"] = self.limite_conexiones
+        stats["escrituras_de_fondo"] = len(self._tareas_fondo)
+        if self.circuito is not None:
+            stats["circuito"] = self.circuito.estadisticas()
+        if self.reintentos is not None:
+            stats["reintentos"] = self.reintentos.reintentos
+        stats["p95"] = {ruta: l.p95() for ruta, l in self._latencias.items()}
+        if self.calentador is not None:
+            stats["calentamiento"] = self.calentador.estadisticas()
+        conector = self._sesion.connector if self._sesion and not self._sesion.closed else None
+        stats["conexiones_abiertas"] = (
+            len(conector._acquired) + sum(len(c) for c in conector._conns.values())
+            if conector is not None
+            else 0
+        )
+        return stats
+
+    async def cerrar(self) -> None:
+        """Cierra la sesión y libera el pool (al apagar el servidor de acciones)"""
+        if self._sesion is not None and not self._sesion.closed:
+            await self._sesion.close()
+        self._sesion = None
+
+
+def _marcar_conectado(contexto: Any) -> None:
+    envio = contexto.trace_request_ctx
+    if isinstance(envio, dict):
+        envio["conectado"] = True
+
+
+_cliente: Optional[ClienteAPI] = None
+
+
+def obtener_cliente() -> ClienteAPI:
+    """Devuelve el cliente compartido por todas las acciones"""
+    global _cliente
+    if _cliente is None:
+        _cliente = ClienteAPI(
+            circuito=InterruptorCircuito(), reintentos=PoliticaReintentos()
+        )
+        _cliente.calentador = MantenedorCalor(_cliente)
+        REGISTRO.calculada(
+            "api_peticiones_en_vuelo", "POST a la API esperando respuesta",
+            lambda: _cliente._stats["en_vuelo"],
+        )
+        REGISTRO.calculada(
+            "api_conexiones_abiertas", "Conexiones del pool hacia la API",
+            lambda: _cliente.estadisticas()["conexiones_abiertas"],
+        )
+        REGISTRO.calculada(
+            "circuito_estado", "Estado actual del circuito de la API (1 en el estado vigente)",
+            lambda: {e: int(_cliente.circuito.estado == e) for e in (CERRADO, ABIERTO, SEMIABIERTO)},
+            etiqueta="estado",
+        )
+    return _cliente
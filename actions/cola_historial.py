@@ -0,0 +1,229 @@
+from typing import Any, Text, Dict, List, Optional
+import asyncio
+import os
+import time
+import aiohttp
+
+from actions.bitacora import obtener_logger
+from actions.cliente_api import (
+    CircuitoAbiertoAPI, ErrorConexionAPI, PeticionNoEnviadaAPI, obtener_cliente
+)
+
+logger = obtener_logger(__name__)
+
+# Servidor Rasa al que se envían los mensajes proactivos (requiere --enable-api)
+RASA_SERVER_URL = os.environ.get("RASA_SERVER_URL", "http://localhost:5005")
+RASA_TOKEN = os.environ.get("RASA_TOKEN")
+
+# Intent externo que dispara action_notificar_historial en la conversación
+INTENT_RESULTADO = "EXTERNAL_historial_resultado"
+
+# Plazo total del aviso al servidor Rasa (segundos)
+TIMEOUT_NOTIFICACION = 30
+
+NUM_WORKERS = 2
+MAX_INTENTOS = 3
+ESPERA_BASE_REINTENTO = 5.0
+
+# Estados de un envío de historial
+PENDIENTE = "pendiente"
+EN_PROCESO = "en_proceso"
+REINTENTANDO = "reintentando"
+COMPLETADO = "completado"
+SIN_DATOS = "sin_datos"
+FALLIDO = "fallido"
+
+ESTADOS_ACTIVOS = (PENDIENTE, EN_PROCESO, REINTENTANDO)
+
+# Lo que ve el usuario cuando falla la red o el propio worker; el detalle
+# (host, puerto, estado del circuito) solo va a la bitácora
+ERROR_CONEXION = "No pude comunicarme con el servidor"
+ERROR_INTERNO = "Ocurrió un error inesperado"
+
+
+class TrabajoHistorial:
+    """Solicitud de envío de historial por correo de un usuario"""
+
+    def __init__(self, id_usuario: int, email: Text, sender_id: Text) -> None:
+        self.id_usuario = id_usuario
+        self.email = email
+        self.sender_id = sender_id
+        self.estado = PENDIENTE
+        self.intentos = 0
+        self.total_predicciones: Optional[int] = None
+        self.error: Optional[Text] = None
+        self.creado = time.time()
+        self.actualizado = self.creado
+
+    def cambiar_estado(self, estado: Text) -> None:
+        self.estado = estado
+        self.actualizado = time.time()
+
+    def como_dict(self) -> Dict[Text, Any]:
+        return {
+            "id_usuario": self.id_usuario,
+            "email": self.email,
+            "estado": self.estado,
+            "intentos": self.intentos,
+            "total_predicciones": self.total_predicciones,
+            "error": self.error,
+            "creado": self.creado,
+            "actualizado": self.actualizado,
+        }
+
+
+class ColaHistorial:
+    """Cola local de envíos de historial atendida por workers asíncronos.
+
+    La acción encola y responde de inmediato; el worker llama a
+    /enviar_historial (con reintentos) y avisa al usuario a través del
+    servidor Rasa disparando un intent externo en su conversación.
+    """
+
+    def __init__(
+        self,
+        num_workers: int = NUM_WORKERS,
+        max_intentos: int = MAX_INTENTOS,
+        espera_base: float = ESPERA_BASE_REINTENTO,
+    ) -> None:
+        self.num_workers = num_workers
+        self.max_intentos = max_intentos
+        self.espera_base = espera_base
+        self._cola: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._trabajos: Dict[int, TrabajoHistorial] = {}
+        # El aviso va al servidor Rasa, no a la API: sesión propia, sin el
+        # circuito, los reintentos ni las métricas del cliente de la API
+        self._rasa: Optional[aiohttp.ClientSession] = None
+
+    def _iniciar_workers(self) -> None:
+        """Arranca los workers en el event loop actual la primera vez"""
+        if self._cola is None:
+            self._cola = asyncio.Queue()
+        self._workers = [w for w in self._workers if not w.done()]
+        while len(self._workers) < self.num_workers:
+            self._workers.append(asyncio.create_task(self._worker()))
+
+    def encolar(self, id_usuario: int, email: Text, sender_id: Text) -> TrabajoHistorial:
+        """Encola un envío; si el usuario ya tiene uno en curso lo devuelve"""
+        actual = self._trabajos.get(id_usuario)
+        if actual is not None and actual.estado in ESTADOS_ACTIVOS:
+            return actual
+
+        self._iniciar_workers()
+        trabajo = TrabajoHistorial(id_usuario, email, sender_id)
+        self._trabajos[id_usuario] = trabajo
+        self._cola.put_nowait(trabajo)
+        return trabajo
+
+    def estado(self, id_usuario: int) -> Optional[Dict[Text, Any]]:
+        """Estado del último envío solicitado por el usuario"""
+        trabajo = self._trabajos.get(id_usuario)
+        return trabajo.como_dict() if trabajo else None
+
+    async def _worker(self) -> None:
+        while True:
+            trabajo = await self._cola.get()
+            try:
+                await self._procesar(trabajo)
+            except Exception:
+                trabajo.error = ERROR_INTERNO
+                trabajo.cambiar_estado(FALLIDO)
+                logger.exception("Error en envío de historial")
+            finally:
+                self._cola.task_done()
+
+            if trabajo.estado not in ESTADOS_ACTIVOS:
+                await self._notificar(trabajo)
+
+    async def _procesar(self, trabajo: TrabajoHistorial) -> None:
+        while True:
+            trabajo.intentos += 1
+            trabajo.cambiar_estado(EN_PROCESO)
+            logger.debug("Historial: intento %d para id_usuario=%s", trabajo.intentos, trabajo.id_usuario)
+
+            # /enviar_historial manda un correo: solo se reintenta si la
+            # petición seguro que no salió (sin conexión o circuito abierto),
+            # nunca tras un timeout de lectura o un 5xx
+            reintentable = False
+            try:
+                respuesta = await obtener_cliente().post(
+                    "/enviar_historial",
+                    {"id_usuario": trabajo.id_usuario, "email": trabajo.email}
+                )
+            except ErrorConexionAPI as e:
+                respuesta = None
+                trabajo.error = ERROR_CONEXION
+                reintentable = isinstance(e, (PeticionNoEnviadaAPI, CircuitoAbiertoAPI))
+                logger.warning("Historial: id_usuario=%s: %s", trabajo.id_usuario, e)
+
+            status = respuesta.status if respuesta is not None else None
+            if status == 200:
+                trabajo.total_predicciones = respuesta.datos.get("total_predicciones", 0)
+                trabajo.cambiar_estado(COMPLETADO)
+                return
+            if status == 404:
+                trabajo.cambiar_estado(SIN_DATOS)
+                return
+
+            if respuesta is not None:
+                trabajo.error = respuesta.error()
+                logger.debug("Historial: respuesta de error %r", respuesta)
+
+            if not reintentable or trabajo.intentos >= self.max_intentos:
+                trabajo.cambiar_estado(FALLIDO)
+                return
+
+            trabajo.cambiar_estado(REINTENTANDO)
+            await asyncio.sleep(self.espera_base * 2 ** (trabajo.intentos - 1))
+
+    def _sesion_rasa(self) -> aiohttp.ClientSession:
+        if self._rasa is None or self._rasa.closed:
+            self._rasa = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=TIMEOUT_NOTIFICACION)
+            )
+        return self._rasa
+
+    async def _notificar(self, trabajo: TrabajoHistorial) -> None:
+        """Envía el resultado al usuario como mensaje proactivo"""
+        url = f"{RASA_SERVER_URL}/conversations/{trabajo.sender_id}/trigger_intent"
+        # El token va como parámetro aparte para que no acabe en ningún log
+        params = {"output_channel": "latest"}
+        if RASA_TOKEN:
+            params["token"] = RASA_TOKEN
+
+        entidades = {
+            "estado_historial": trabajo.estado,
+            "email_historial": trabajo.email,
+        }
+        if trabajo.total_predicciones is not None:
+            entidades["total_predicciones"] = trabajo.total_predicciones
+        if trabajo.error:
+            entidades["error_historial"] = trabajo.error
+
+        try:
+            async with self._sesion_rasa().post(
+                url, params=params, json={"name": INTENT_RESULTADO, "entities": entidades}
+            ) as respuesta:
+                if respuesta.status != 200:
+                    logger.error("Notificando historial a %s: status %s", trabajo.sender_id, respuesta.status)
+        except asyncio.TimeoutError:
+            logger.error("Notificando historial a %s: timeout", trabajo.sender_id)
+        except aiohttp.ClientError as e:
+            logger.error("Notificando historial a %s: %s", trabajo.sender_id, type(e).__name__)
+
+
+_cola: Optional[ColaHistorial] = None
+
+
+def obtener_cola() -> ColaHistorial:
+    """Devuelve la cola de historial compartida del servidor de acciones"""
+    global _cola
+    if _cola is None:
+        _cola = ColaHistorial()
+    return _cola
+
+
+def estado_envio(id_usuario: int) -> Optional[Dict[Text, Any]]:
+    """Consulta el estado del último envío de historial de un usuario"""
+    return obtener_cola().estado(id_usuario)
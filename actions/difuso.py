@@ -0,0 +1,161 @@
+from typing import Dict, FrozenSet, List, Optional, Text, Tuple
+import heapq
+import os
+
+# Confianza (0-1) a partir de la cual se acepta el valor aproximado sin
+# preguntar; entre ambos umbrales solo se sugiere al volver a preguntar
+UMBRAL_ACEPTAR = float(os.getenv("DIFUSO_UMBRAL_ACEPTAR", "0.75"))
+UMBRAL_SUGERIR = float(os.getenv("DIFUSO_UMBRAL_SUGERIR", "0.5"))
+
+# Confianza fija cuando el texto contiene todas las palabras de un sinónimo
+# ("lluvia muy fuerte" -> "lluvia fuerte")
+CONFIANZA_CONTENIDO = 0.9
+
+# Palabras que niegan lo que sigue: "no hay semáforo" contiene "semáforo",
+# pero dice lo contrario. Si sobran en el texto, nunca se acepta sin preguntar
+NEGACIONES = frozenset({"no", "sin", "nada", "ni", "tampoco", "nunca"})
+
+# Trigramas de caracteres, y cuántos sinónimos de la preselección por
+# trigramas se comparan después por distancia de edición
+N_GRAMA = 3
+CANDIDATOS = 3
+
+# (frase, valor, confianza)
+Coincidencia = Tuple[Text, int, float]
+
+
+def distancia(a: Text, b: Text) -> int:
+    """Distancia de Levenshtein (inserción, borrado, sustitución).
+
+    Versión paralela por bits (Myers/Hyyrö): cada columna de la matriz de
+    programación dinámica se actualiza con unas pocas operaciones sobre
+    enteros en lugar de un bucle por carácter.
+    """
+    if not a:
+        return len(b)
+    if not b:
+        return len(a)
+    patron: Dict[Text, int] = {}
+    for i, c in enumerate(a):
+        patron[c] = patron.get(c, 0) | (1 << i)
+    ultimo = 1 << (len(a) - 1)
+    todos = (1 << len(a)) - 1
+    positivos, negativos, d = todos, 0, len(a)
+    for c in b:
+        iguales = patron.get(c, 0)
+        xv = iguales | negativos
+        xh = (((iguales & positivos) + positivos) ^ positivos) | iguales
+        ph = negativos | ~(xh | positivos)
+        mh = positivos & xh
+        if ph & ultimo:
+            d += 1
+        elif mh & ultimo:
+            d -= 1
+        ph = (ph << 1) | 1
+        mh <<= 1
+        positivos = (mh | ~(xv | ph)) & todos
+        negativos = ph & xv
+    return d
+
+
+def ngramas(texto: Text, n: int = N_GRAMA) -> FrozenSet[Text]:
+    """N-gramas de caracteres con un espacio de relleno en los extremos"""
+    relleno = f" {texto} "
+    return frozenset(relleno[i:i + n] for i in range(len(relleno) - n + 1))
+
+
+class IndiceDifuso:
+    """Índice de sinónimos ya plegados para búsquedas aproximadas.
+
+    Un índice invertido de trigramas de caracteres elige los pocos
+    sinónimos que comparten más trigramas con el texto (coeficiente de
+    Dice); solo esos se comparan por distancia de edición, así el coste no
+    crece con el tamaño del vocabulario. Las frases parciales se resuelven
+    con un índice palabra -> sinónimos que la contienen.
+    """
+
+    def __init__(self, sinonimos: Dict[Text, int]) -> None:
+        self.valores = dict(sinonimos)
+
+        self.gramas: Dict[Text, int] = {}
+        self.por_grama: Dict[Text, List[Text]] = {}
+        for frase in self.valores:
+            gramas = ngramas(frase)
+            self.gramas[frase] = len(gramas)
+            for grama in gramas:
+                self.por_grama.setdefault(grama, []).append(frase)
+
+        # Las frases de una sola letra ("t", "y") solo valen como acierto exacto
+        self.por_palabra: Dict[Text, List[Tuple[Text, ...]]] = {}
+        for frase in self.valores:
+            if len(frase) < 2:
+                continue
+            palabras = tuple(frase.split())
+            for palabra in set(palabras):
+                self.por_palabra.setdefault(palabra, []).append(palabras)
+
+    def _contenido(self, texto: Text) -> Optional[Coincidencia]:
+        """Sinónimo más largo cuyas palabras aparecen todas en el texto"""
+        palabras = set(texto.split())
+        mejores: List[Tuple[Text, ...]] = []
+        for palabra in palabras:
+            for frase in self.por_palabra.get(palabra, ()):
+                if len(frase) > 1 and not palabras.issuperset(frase):
+                    continue
+                if not mejores or len(frase) > len(mejores[0]):
+                    mejores = [frase]
+                elif len(frase) == len(mejores[0]):
+                    mejores.append(frase)
+
+        valores = {self.valores[" ".join(frase)] for frase in mejores}
+        if len(valores) != 1:
+            # Sin coincidencias, o dos sinónimos igual de largos que se contradicen
+            return None
+        frase = " ".join(mejores[0])
+        return frase, self.valores[frase], CONFIANZA_CONTENIDO
+
+    def buscar(self, texto: Text) -> Optional[Coincidencia]:
+        """Mejor coincidencia aproximada para un texto ya plegado, o None"""
+        coincidencia = self._buscar(texto)
+        if coincidencia is None:
+            return None
+        frase, valor, confianza = coincidencia
+        if NEGACIONES.intersection(texto.split()).difference(frase.split()):
+            # "no estaba mojado": como mucho se sugiere, nunca se acepta
+            return frase, valor, min(confianza, UMBRAL_ACEPTAR - 0.01)
+        return coincidencia
+
+    def _buscar(self, texto: Text) -> Optional[Coincidencia]:
+        if " " in texto:
+            coincidencia = self._contenido(texto)
+            if coincidencia is not None:
+                return coincidencia
+
+        gramas = ngramas(texto)
+        compartidos: Dict[Text, int] = {}
+        for grama in gramas:
+            for frase in self.por_grama.get(grama, ()):
+                compartidos[frase] = compartidos.get(frase, 0) + 1
+        preseleccion = heapq.nlargest(
+            CANDIDATOS,
+            compartidos,
+            key=lambda f: 2 * compartidos[f] / (len(gramas) + self.gramas[f]),
+        )
+
+        # Confianza = 1 - distancia de edición / longitud mayor
+        mejor: Optional[Coincidencia] = None
+        empate = False
+        for frase in preseleccion:
+            confianza = 1 - distancia(texto, frase) / max(len(texto), len(frase))
+            if mejor is None or confianza > mejor[2]:
+                mejor = (frase, self.valores[frase], confianza)
+                empate = False
+            elif confianza == mejor[2] and self.valores[frase] != mejor[1]:
+                empate = True
+
+        if mejor is None or mejor[2] < UMBRAL_SUGERIR:
+            return None
+        if empate:
+            # Igual de cerca de dos valores distintos: nunca se acepta sin preguntar
+            return mejor[0], mejor[1], min(mejor[2], UMBRAL_ACEPTAR - 0.01)
+        return mejor
@@ -0,0 +1,122 @@
+from typing import List, Optional, Text, Tuple
+
+# Palabras clave que anteceden al valor: "usuario: ana", "pass=1234", "clave 1234"
+CLAVES_USUARIO = frozenset({"usuario", "user", "username"})
+CLAVES_CONTRASENA = frozenset({"contraseña", "contrasena", "password", "pass", "clave"})
+_SEPARADORES = ":="
+# Índice del campo en la lista de valores de extraer()
+_CAMPOS = {**{c: 0 for c in CLAVES_USUARIO}, **{c: 1 for c in CLAVES_CONTRASENA}}
+
+# Puntuación que rodea a un correo en una frase ("escríbeme a ana@x.com.")
+_PUNTUACION_EMAIL = ".,;:()<>[]{}\"'¡!¿?"
+_CARACTERES_LOCAL = frozenset("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789._%+-")
+_CARACTERES_DOMINIO = frozenset("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789.-")
+
+
+class DatosExtraidos:
+    """Credenciales y correo encontrados en un mensaje"""
+
+    __slots__ = ("usuario", "contraseña", "email")
+
+    def __init__(self) -> None:
+        self.usuario: Optional[Text] = None
+        self.contraseña: Optional[Text] = None
+        self.email: Optional[Text] = None
+
+
+def validar_email(email: Optional[Text]) -> bool:
+    """usuario@dominio.tld, sin expresiones regulares (tiempo lineal)"""
+    if not email:
+        return False
+    local, arroba, dominio = email.partition("@")
+    if not arroba or not local or not _CARACTERES_LOCAL.issuperset(local):
+        return False
+    host, punto, tld = dominio.rpartition(".")
+    return bool(
+        punto and host and _CARACTERES_DOMINIO.issuperset(host)
+        and len(tld) >= 2 and tld.isascii() and tld.isalpha()
+    )
+
+
+def _palabras(texto: Text) -> List[Text]:
+    # Las comas y los ";" separan igual que los espacios: "usuario:ana,contraseña:1234"
+    if "," in texto:
+        texto = texto.replace(",", " ")
+    if ";" in texto:
+        texto = texto.replace(";", " ")
+    return texto.split()
+
+
+def extraer(texto: Text) -> DatosExtraidos:
+    """Usuario, contraseña y correo en una sola pasada sobre las palabras.
+
+    Reconoce "usuario: ana, contraseña: 1234", "usuario:ana,contraseña:1234",
+    "usuario ana contraseña 1234", "user=ana pass=1234" y, si no hay
+    palabras clave, un mensaje de exactamente dos palabras ("ana 1234").
+    El primer correo válido que aparezca se guarda en `email`.
+
+    Las palabras se separan por espacios, comas o ";" y cada una se mira
+    una sola vez, así el coste es lineal incluso con mensajes largos pegados.
+    """
+    valores: List[Optional[Text]] = [None, None]  # usuario, contraseña
+    email: Optional[Text] = None
+    con_clave = False
+    pendiente = -1  # campo cuya clave ya se leyó, falta el valor
+
+    for palabra in _palabras(texto):
+        if pendiente >= 0:
+            valor = palabra.lstrip(_SEPARADORES)
+            if not valor:
+                # ":" o "=" sueltos entre la clave y el valor
+                continue
+            valores[pendiente] = valor
+            pendiente = -1
+            continue
+
+        if email is None and "@" in palabra:
+            candidato = palabra.strip(_PUNTUACION_EMAIL)
+            if validar_email(candidato):
+                email = candidato
+
+        # "usuario:ana" / "pass=1234" vienen pegados; si no, el valor es la
+        # palabra siguiente
+        if ":" in palabra:
+            clave, _, resto = palabra.partition(":")
+        elif "=" in palabra:
+            clave, _, resto = palabra.partition("=")
+        else:
+            clave, resto = palabra, ""
+        campo = _CAMPOS.get(clave.lower())
+        if campo is None:
+            continue
+        con_clave = True
+        if valores[campo] is not None:
+            continue
+        valor = resto.lstrip(_SEPARADORES)
+        if valor:
+            valores[campo] = valor
+        else:
+            pendiente = campo
+
+    datos = DatosExtraidos()
+    datos.usuario, datos.contraseña = valores
+    datos.email = email
+    if not con_clave:
+        # Como el patrón original (^\S+\s+\S+$): dos palabras separadas por espacios
+        palabras = texto.split()
+        if len(palabras) == 2:
+            datos.usuario, datos.contraseña = palabras
+    return datos
+
+
+def extraer_credenciales(texto: Text) -> Tuple[Optional[Text], Optional[Text]]:
+    """(usuario, contraseña); cualquiera de los dos puede ser None"""
+    datos = extraer(texto)
+    if datos.usuario and datos.contraseña:
+        return datos.usuario, datos.contraseña
+    return None, None
+
+
+def extraer_email(texto: Text) -> Optional[Text]:
+    """Primer correo válido del texto, o None"""
+    return extraer(texto).email
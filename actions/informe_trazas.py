@@ -0,0 +1,156 @@
+"""Informe de las trazas escritas con TRAZAS_ARCHIVO.
+
+Une los archivos del servidor de Rasa y del servidor de acciones, y
+muestra en qué se fue el tiempo de cada turno:
+
+    python -m actions.informe_trazas trazas_rasa.jsonl trazas_acciones.jsonl
+    python -m actions.informe_trazas trazas_*.jsonl --lentas 10 --plegado turnos.folded
+
+`--plegado` escribe las pilas en formato "a;b;c microsegundos", que
+aceptan flamegraph.pl y speedscope.
+"""
+from typing import Any, Dict, Iterable, List, Optional, Text, Tuple
+from collections import defaultdict
+import argparse
+import json
+
+ANCHO_BARRA = 40
+COLUMNAS = ("total", "cola", "rasa", "acciones", "api", "graph")
+
+
+class Traza:
+    """Los tramos de un turno, ordenados por inicio"""
+
+    def __init__(self, tramos: List[Dict[Text, Any]]) -> None:
+        self.tramos = sorted(tramos, key=lambda t: t["inicio"])
+        ids = {t["tramo"] for t in self.tramos}
+        self.hijos: Dict[Optional[Text], List[Dict[Text, Any]]] = defaultdict(list)
+        for tramo in self.tramos:
+            # Sin el padre en los archivos (otro proceso sin exportar), es raíz
+            padre = tramo["padre"] if tramo["padre"] in ids else None
+            self.hijos[padre].append(tramo)
+        self.raiz = self.hijos[None][0]
+        self.inicio = self.tramos[0]["inicio"]
+        self.fin = max(t["inicio"] + t["duracion"] for t in self.tramos)
+
+    def desglose(self) -> Dict[Text, float]:
+        """Segundos por componente.
+
+        "rasa" es lo que el turno no pasó en la cola ni en el servidor de
+        acciones (NLU, política y la llamada HTTP a las acciones); "acciones"
+        excluye lo que esperaron a la API, y "graph" corre en paralelo.
+        """
+        raiz = self.raiz
+        cola = raiz["atributos"].get("queue_wait", 0.0)
+        acciones = sum(
+            t["duracion"] for t in self.hijos[raiz["tramo"]] if t["nombre"].startswith("accion ")
+        )
+        api = sum(t["duracion"] for t in self.tramos if t["nombre"].startswith("api "))
+        graph = sum(t["duracion"] for t in self.tramos if t["nombre"].startswith("graph "))
+        return {
+            "total": self.fin - self.inicio,
+            "cola": cola,
+            "rasa": (
+                max(0.0, raiz["duracion"] - cola - acciones)
+                if raiz["nombre"] == "whatsapp.turn" else 0.0
+            ),
+            "acciones": acciones - api,
+            "api": api,
+            "graph": graph,
+        }
+
+    def pilas(self) -> Iterable[Tuple[Text, float]]:
+        """(pila, tiempo propio en segundos) de cada tramo"""
+
+        def recorrer(tramo: Dict[Text, Any], prefijo: Text):
+            pila = f"{prefijo};{tramo['nombre']}" if prefijo else tramo["nombre"]
+            hijos = self.hijos[tramo["tramo"]]
+            yield pila, max(0.0, tramo["duracion"] - sum(h["duracion"] for h in hijos))
+            for hijo in hijos:
+                yield from recorrer(hijo, pila)
+
+        for raiz in self.hijos[None]:
+            yield from recorrer(raiz, "")
+
+    def dibujar(self) -> List[Text]:
+        """Árbol de tramos con una barra ubicada en la línea de tiempo del turno"""
+        total = max(self.fin - self.inicio, 1e-9)
+        lineas = []
+
+        def dibujar(tramo: Dict[Text, Any], nivel: int) -> None:
+            desde = int((tramo["inicio"] - self.inicio) / total * ANCHO_BARRA)
+            largo = max(1, round(tramo["duracion"] / total * ANCHO_BARRA))
+            barra = (" " * desde + "█" * largo)[:ANCHO_BARRA].ljust(ANCHO_BARRA)
+            nombre = ("  " * nivel + tramo["nombre"])[:38]
+            error = f"  ❌ {tramo['error']}" if tramo.get("error") else ""
+            lineas.append(f"  {nombre:<38} |{barra}| {tramo['duracion'] * 1000:>8.1f} ms{error}")
+            for hijo in self.hijos[tramo["tramo"]]:
+                dibujar(hijo, nivel + 1)
+
+        for raiz in self.hijos[None]:
+            dibujar(raiz, 0)
+        return lineas
+
+
+def cargar(rutas: Iterable[Text]) -> List[Traza]:
+    por_traza: Dict[Text, List[Dict[Text, Any]]] = defaultdict(list)
+    for ruta in rutas:
+        with open(ruta, encoding="utf-8") as archivo:
+            for linea in archivo:
+                if linea.strip():
+                    tramo = json.loads(linea)
+                    por_traza[tramo["traza"]].append(tramo)
+    return [Traza(tramos) for tramos in por_traza.values()]
+
+
+def percentil(valores: List[float], p: float) -> float:
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(p * len(ordenados)))]
+
+
+def main(argv: Optional[List[Text]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Desglose de latencia por turno")
+    parser.add_argument("archivos", nargs="+", help="JSONL escritos con TRAZAS_ARCHIVO")
+    parser.add_argument("--lentas", type=int, default=5, help="turnos más lentos a dibujar")
+    parser.add_argument("--plegado", help="escribe las pilas plegadas (flamegraph.pl / speedscope)")
+    args = parser.parse_args(argv)
+
+    trazas = cargar(args.archivos)
+    if not trazas:
+        print("Sin tramos en los archivos")
+        return
+    desgloses = [t.desglose() for t in trazas]
+
+    print("=" * 78)
+    print(f"⏱️  {len(trazas)} turnos — desglose de latencia (ms)")
+    print("=" * 78)
+    print(f"{'':<8}" + "".join(f"{c:>11}" for c in COLUMNAS))
+    for nombre, p in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99), ("máx", 1.0)):
+        print(f"{nombre:<8}" + "".join(
+            f"{percentil([d[c] for d in desgloses], p) * 1000:>11.1f}" for c in COLUMNAS
+        ))
+
+    lentas = sorted(zip(trazas, desgloses), key=lambda td: td[1]["total"], reverse=True)
+    print(f"\n🐢 {min(args.lentas, len(lentas))} turnos más lentos")
+    for traza, desglose in lentas[: args.lentas]:
+        remitente = traza.raiz["atributos"].get("sender_hash", "?")
+        partes = ", ".join(f"{c} {desglose[c] * 1000:.0f}" for c in COLUMNAS[1:] if desglose[c])
+        print(f"\ntraza {traza.raiz['traza']}  remitente {remitente}  "
+              f"{desglose['total'] * 1000:.0f} ms ({partes})")
+        for linea in traza.dibujar():
+            print(linea)
+
+    if args.plegado:
+        pilas: Dict[Text, float] = defaultdict(float)
+        for traza in trazas:
+            for pila, propio in traza.pilas():
+                pilas[pila] += propio
+        with open(args.plegado, "w", encoding="utf-8") as archivo:
+            for pila, segundos in sorted(pilas.items()):
+                archivo.write(f"{pila} {round(segundos * 1e6)}\n")
+        print(f"\n🔥 Pilas plegadas en {args.plegado}")
+    print("=" * 78)
+
+
+if __name__ == "__main__":
+    main()
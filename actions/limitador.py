@@ -0,0 +1,156 @@
+from typing import Any, Text, Dict, List, Optional, Tuple
+import math
+import os
+import time
+
+from actions.metricas import REGISTRO
+
+# (intentos, ventana en segundos) por acción y por clave
+LIMITES = {
+    "login": {
+        "sender": (int(os.environ.get("LIMITE_LOGIN_SENDER", "5")), 60.0),
+        "usuario": (int(os.environ.get("LIMITE_LOGIN_USUARIO", "10")), 900.0),
+    },
+    "registro": {
+        "sender": (int(os.environ.get("LIMITE_REGISTRO_SENDER", "3")), 600.0),
+        "usuario": (int(os.environ.get("LIMITE_REGISTRO_USUARIO", "3")), 600.0),
+    },
+}
+
+# Cada cuántos intentos registrados se borran las claves inactivas
+LIMPIAR_CADA = 1000
+
+
+class _Contador:
+    __slots__ = ("inicio", "actual", "anterior")
+
+    def __init__(self, inicio: float) -> None:
+        self.inicio = inicio
+        self.actual = 0
+        self.anterior = 0
+
+
+class VentanaDeslizante:
+    """Límite de intentos por clave con contador de ventana deslizante.
+
+    En lugar de guardar la hora de cada intento, cada clave guarda solo dos
+    contadores: la ventana fija actual y la anterior. El total deslizante se
+    estima ponderando la anterior por la fracción que aún se solapa, así la
+    memoria por clave es constante aunque llegue una ráfaga de intentos.
+    """
+
+    def __init__(self, limite: int, ventana: float) -> None:
+        self.limite = limite
+        self.ventana = ventana
+        self._contadores: Dict[Text, _Contador] = {}
+        self._registrados = 0
+
+    def _contador(self, clave: Text, ahora: float) -> _Contador:
+        inicio = ahora - ahora % self.ventana
+        contador = self._contadores.get(clave)
+        if contador is None:
+            contador = self._contadores[clave] = _Contador(inicio)
+        elif contador.inicio != inicio:
+            # La ventana actual pasa a ser la anterior solo si es la contigua
+            contiguas = inicio - contador.inicio == self.ventana
+            contador.anterior = contador.actual if contiguas else 0
+            contador.actual = 0
+            contador.inicio = inicio
+        return contador
+
+    def espera(self, clave: Text, ahora: float) -> float:
+        """Segundos hasta que se admita otro intento (0 si ya se admite)"""
+        if clave not in self._contadores:
+            return 0.0
+        c = self._contador(clave, ahora)
+        transcurrido = (ahora - c.inicio) / self.ventana
+        if c.anterior * (1 - transcurrido) + c.actual + 1 <= self.limite:
+            return 0.0
+        if c.actual + 1 <= self.limite:
+            # Basta con que la ventana anterior pese menos
+            libre = 1 - (self.limite - 1 - c.actual) / c.anterior
+            return c.inicio + self.ventana * libre - ahora
+        # Hay que esperar a la siguiente ventana, donde la actual pesa como anterior
+        libre = 1 - (self.limite - 1) / c.actual
+        return c.inicio + self.ventana * (1 + libre) - ahora
+
+    def registrar(self, clave: Text, ahora: float) -> None:
+        self._contador(clave, ahora).actual += 1
+        self._registrados += 1
+        if self._registrados % LIMPIAR_CADA == 0:
+            self._limpiar(ahora)
+
+    def _limpiar(self, ahora: float) -> None:
+        # Sin intentos en la ventana actual ni en la anterior, la clave sobra
+        vigente = ahora - ahora % self.ventana - self.ventana
+        for clave in [c for c, v in self._contadores.items() if v.inicio < vigente]:
+            del self._contadores[clave]
+
+    def __len__(self) -> int:
+        return len(self._contadores)
+
+
+class LimitadorAcceso:
+    """Limita login y registro por número de WhatsApp y por nombre de usuario"""
+
+    def __init__(self, limites: Dict[Text, Dict[Text, Tuple[int, float]]] = LIMITES) -> None:
+        self.ventanas = {
+            accion: {tipo: VentanaDeslizante(*limite) for tipo, limite in por_tipo.items()}
+            for accion, por_tipo in limites.items()
+        }
+        self.permitidos = {accion: 0 for accion in limites}
+        self.rechazados = {accion: 0 for accion in limites}
+
+    def comprobar(self, accion: Text, sender_id: Text, usuario: Optional[Text]) -> float:
+        """Registra el intento si se admite; si no, devuelve los segundos de espera.
+
+        Un intento rechazado no cuenta, y uno admitido cuenta en todas las
+        claves a la vez: un límite no consume cupo del otro.
+        """
+        ahora = time.monotonic()
+        ventanas = self.ventanas[accion]
+        claves: List[Tuple[VentanaDeslizante, Text]] = [(ventanas["sender"], sender_id)]
+        if usuario:
+            claves.append((ventanas["usuario"], usuario.lower()))
+
+        espera = max(ventana.espera(clave, ahora) for ventana, clave in claves)
+        if espera > 0:
+            self.rechazados[accion] += 1
+            return espera
+
+        for ventana, clave in claves:
+            ventana.registrar(clave, ahora)
+        self.permitidos[accion] += 1
+        return 0.0
+
+    def estadisticas(self) -> Dict[Text, Any]:
+        return {
+            accion: {
+                "permitidos": self.permitidos[accion],
+                "rechazados": self.rechazados[accion],
+                "claves": {tipo: len(v) for tipo, v in ventanas.items()},
+            }
+            for accion, ventanas in self.ventanas.items()
+        }
+
+
+def texto_espera(segundos: float) -> Text:
+    """"45 segundos" / "3 minutos", redondeando hacia arriba"""
+    if segundos <= 60:
+        return f"{math.ceil(segundos)} segundos"
+    return f"{math.ceil(segundos / 60)} minutos"
+
+
+_limitador: Optional[LimitadorAcceso] = None
+
+
+def obtener_limitador() -> LimitadorAcceso:
+    """Devuelve el limitador compartido por las acciones de acceso"""
+    global _limitador
+    if _limitador is None:
+        _limitador = LimitadorAcceso()
+        REGISTRO.calculada(
+            "limitador_rechazados_total", "Intentos rechazados por el limitador, por acción",
+            lambda: dict(_limitador.rechazados), etiqueta="accion", tipo="counter",
+        )
+    return _limitador
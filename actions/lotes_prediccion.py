@@ -0,0 +1,149 @@
+from typing import Any, Awaitable, Callable, Text, Dict, List, Optional, Tuple, Union
+import asyncio
+import os
+
+from actions.cliente_api import RespuestaAPI, obtener_cliente
+from actions.modelo_local import modelos_locales, predecir_lote_local
+
+# Ventana de agrupación: se despacha el lote al cumplirse el tiempo o al
+# juntar TAMANO_LOTE predicciones, lo que ocurra primero
+VENTANA_MS = float(os.environ.get("PREDICT_BATCH_WINDOW_MS", "10"))
+TAMANO_LOTE = int(os.environ.get("PREDICT_BATCH_SIZE", "16"))
+
+# Endpoint opcional que acepta varias predicciones en una sola petición:
+# recibe {"lote": [datos, ...]} y responde {"resultados": [resultado, ...]}.
+# Si no está configurado (ni hay modelos locales) no se agrupa: cada
+# predicción va directa a /predict.
+RUTA_LOTE = os.environ.get("API_PREDICT_BATCH_PATH")
+
+EjecutorLote = Callable[[List[Dict[Text, Any]]], Awaitable[List[RespuestaAPI]]]
+
+
+async def enviar_lote_api(lote: List[Dict[Text, Any]]) -> List[RespuestaAPI]:
+    """Envía un lote de predicciones a la API y devuelve una respuesta por elemento"""
+    cliente = obtener_cliente()
+
+    if RUTA_LOTE:
+        respuesta = await cliente.post(RUTA_LOTE, {"lote": lote})
+        resultados = respuesta.datos.get("resultados")
+        if respuesta.status != 200 or not isinstance(resultados, list) or len(resultados) != len(lote):
+            status = respuesta.status if respuesta.status != 200 else 502
+            error = {"error": respuesta.error("Respuesta de lote inválida")}
+            return [RespuestaAPI(status, error, respuesta.segundos)] * len(lote)
+        return [
+            RespuestaAPI(400 if "error" in r else 200, r, respuesta.segundos)
+            for r in resultados
+        ]
+
+    respuestas = await asyncio.gather(
+        *(cliente.post("/predict", datos) for datos in lote), return_exceptions=True
+    )
+    return list(respuestas)
+
+
+class AgrupadorPredicciones:
+    """Agrupa predicciones concurrentes en lotes y reparte los resultados.
+
+    Cada acción espera su propio futuro; el lote se despacha cuando se cumple
+    la ventana de tiempo o se alcanza el tamaño máximo.
+    """
+
+    def __init__(
+        self,
+        ejecutor: EjecutorLote = enviar_lote_api,
+        ventana_ms: float = VENTANA_MS,
+        tamano_lote: int = TAMANO_LOTE,
+    ) -> None:
+        self.ejecutor = ejecutor
+        self.ventana = ventana_ms / 1000.0
+        self.tamano_lote = tamano_lote
+        self._pendientes: List[Tuple[Dict[Text, Any], asyncio.Future]] = []
+        self._temporizador: Optional[asyncio.TimerHandle] = None
+        self._tareas: set = set()
+        self.lotes = 0
+        self.elementos = 0
+
+    async def predecir(self, datos: Dict[Text, Any]) -> RespuestaAPI:
+        """Añade la predicción al lote en curso y espera su resultado"""
+        loop = asyncio.get_running_loop()
+        futuro = loop.create_future()
+        self._pendientes.append((datos, futuro))
+
+        if len(self._pendientes) >= self.tamano_lote:
+            self._despachar()
+        elif self._temporizador is None:
+            self._temporizador = loop.call_later(self.ventana, self._despachar)
+
+        return await futuro
+
+    def _despachar(self) -> None:
+        if self._temporizador is not None:
+            self._temporizador.cancel()
+            self._temporizador = None
+
+        lote, self._pendientes = self._pendientes, []
+        if not lote:
+            return
+
+        tarea = asyncio.ensure_future(self._ejecutar(lote))
+        self._tareas.add(tarea)
+        tarea.add_done_callback(self._tareas.discard)
+
+    async def _ejecutar(self, lote: List[Tuple[Dict[Text, Any], asyncio.Future]]) -> None:
+        self.lotes += 1
+        self.elementos += len(lote)
+        try:
+            resultados = await self.ejecutor([datos for datos, _ in lote])
+        except Exception as e:
+            resultados = [e] * len(lote)
+
+        for (_, futuro), resultado in zip(lote, resultados):
+            if futuro.done():
+                continue
+            if isinstance(resultado, BaseException):
+                futuro.set_exception(resultado)
+            else:
+                futuro.set_result(resultado)
+
+    def estadisticas(self) -> Dict[Text, Any]:
+        return {
+            "lotes": self.lotes,
+            "elementos": self.elementos,
+            "tamano_medio": self.elementos / self.lotes if self.lotes else 0.0,
+            "pendientes": len(self._pendientes),
+        }
+
+
+class PrediccionDirecta:
+    """Cada predicción va directa a /predict, sin ventana de agrupación.
+
+    Sin endpoint de lote ni modelos locales, un lote acaba en peticiones
+    sueltas de todos modos: esperar la ventana solo añadiría latencia.
+    """
+
+    def __init__(self) -> None:
+        self.elementos = 0
+
+    async def predecir(self, datos: Dict[Text, Any]) -> RespuestaAPI:
+        self.elementos += 1
+        return await obtener_cliente().post("/predict", datos)
+
+    def estadisticas(self) -> Dict[Text, Any]:
+        return {"lotes": 0, "elementos": self.elementos, "tamano_medio": 0.0, "pendientes": 0}
+
+
+_agrupador: Optional[Union[AgrupadorPredicciones, PrediccionDirecta]] = None
+
+
+def obtener_agrupador() -> Union[AgrupadorPredicciones, PrediccionDirecta]:
+    """Devuelve el agrupador de predicciones compartido"""
+    global _agrupador
+    if _agrupador is None:
+        if modelos_locales is not None:
+            # Con modelos locales el lote se puntúa en proceso (vectorizado)
+            _agrupador = AgrupadorPredicciones(predecir_lote_local)
+        elif RUTA_LOTE:
+            _agrupador = AgrupadorPredicciones(enviar_lote_api)
+        else:
+            _agrupador = PrediccionDirecta()
+    return _agrupador
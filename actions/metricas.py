@@ -0,0 +1,243 @@
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Text, Tuple
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import functools
+import os
+import threading
+import time
+
+from actions import trazas
+from actions.bitacora import obtener_logger
+
+logger = obtener_logger(__name__)
+
+# Puerto del endpoint /metrics del servidor de acciones (vacío = deshabilitado)
+PUERTO = os.environ.get("METRICAS_PUERTO", "9102")
+# Solo local por defecto: el endpoint no tiene autenticación
+HOST = os.environ.get("METRICAS_HOST", "127.0.0.1")
+
+# Límites superiores de los buckets de latencia, en segundos
+LIMITES_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+TIPO_CONTENIDO = "text/plain; version=0.0.4; charset=utf-8"
+
+Etiquetas = Tuple[Text, ...]
+
+
+def _etiquetas(nombres: Etiquetas, valores: Etiquetas, extra: Text = "") -> Text:
+    pares = [f'{n}="{_escapar(v)}"' for n, v in zip(nombres, valores)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+def _escapar(valor: Any) -> Text:
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Contador:
+    """Contador monótono con etiquetas.
+
+    Sin locks: solo se escribe desde el hilo del event loop, y el hilo del
+    endpoint solo lee (una lectura puede ver el valor de un instante antes).
+    """
+
+    tipo = "counter"
+
+    def __init__(self, nombre: Text, ayuda: Text, etiquetas: Etiquetas = ()) -> None:
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = etiquetas
+        self._valores: Dict[Etiquetas, float] = {}
+
+    def inc(self, *valores: Text, n: float = 1) -> None:
+        self._valores[valores] = self._valores.get(valores, 0) + n
+
+    def lineas(self) -> List[Text]:
+        return [
+            f"{self.nombre}{_etiquetas(self.etiquetas, valores)} {valor}"
+            for valores, valor in list(self._valores.items())
+        ]
+
+
+class Histograma:
+    """Histograma de buckets fijos con etiquetas (mismo modelo sin locks)"""
+
+    tipo = "histogram"
+
+    def __init__(
+        self,
+        nombre: Text,
+        ayuda: Text,
+        etiquetas: Etiquetas = (),
+        limites: Tuple[float, ...] = LIMITES_LATENCIA,
+    ) -> None:
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = etiquetas
+        self.limites = limites
+        # Por etiquetas: [conteo por bucket (+Inf al final), suma, total]
+        self._series: Dict[Etiquetas, List[Any]] = {}
+
+    def observar(self, valor: float, *valores: Text) -> None:
+        serie = self._series.get(valores)
+        if serie is None:
+            serie = self._series[valores] = [[0] * (len(self.limites) + 1), 0.0, 0]
+        serie[0][bisect_left(self.limites, valor)] += 1
+        serie[1] += valor
+        serie[2] += 1
+
+    def lineas(self) -> List[Text]:
+        lineas = []
+        for valores, (buckets, suma, total) in list(self._series.items()):
+            acumulado = 0
+            for limite, conteo in zip(self.limites + (float("inf"),), list(buckets)):
+                acumulado += conteo
+                le = 'le="+Inf"' if limite == float("inf") else f'le="{limite!r}"'
+                lineas.append(
+                    f"{self.nombre}_bucket{_etiquetas(self.etiquetas, valores, le)} {acumulado}"
+                )
+            lineas.append(f"{self.nombre}_sum{_etiquetas(self.etiquetas, valores)} {suma}")
+            lineas.append(f"{self.nombre}_count{_etiquetas(self.etiquetas, valores)} {total}")
+        return lineas
+
+
+class MetricaCalculada:
+    """Valor que se lee en el momento del scrape (p. ej. de un estadisticas())"""
+
+    def __init__(
+        self,
+        nombre: Text,
+        ayuda: Text,
+        funcion: Callable[[], Any],
+        etiqueta: Optional[Text] = None,
+        tipo: Text = "gauge",
+    ) -> None:
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.funcion = funcion
+        self.etiqueta = etiqueta
+        self.tipo = tipo
+
+    def lineas(self) -> List[Text]:
+        try:
+            valor = self.funcion()
+        except Exception as e:
+            logger.warning("Métrica %s no disponible: %s", self.nombre, e)
+            return []
+        if self.etiqueta is None:
+            return [f"{self.nombre} {valor}"]
+        # Con etiqueta, la función devuelve {valor_etiqueta: número}
+        return [
+            f'{self.nombre}{{{self.etiqueta}="{_escapar(clave)}"}} {numero}'
+            for clave, numero in valor.items()
+        ]
+
+
+class RegistroMetricas:
+    """Conjunto de métricas de un proceso y su exposición en formato Prometheus"""
+
+    def __init__(self) -> None:
+        self._metricas: Dict[Text, Any] = {}
+
+    def _registrar(self, metrica: Any) -> Any:
+        # Idempotente: volver a importar un módulo no duplica la métrica
+        return self._metricas.setdefault(metrica.nombre, metrica)
+
+    def contador(self, nombre: Text, ayuda: Text, etiquetas: Etiquetas = ()) -> Contador:
+        return self._registrar(Contador(nombre, ayuda, etiquetas))
+
+    def histograma(
+        self,
+        nombre: Text,
+        ayuda: Text,
+        etiquetas: Etiquetas = (),
+        limites: Tuple[float, ...] = LIMITES_LATENCIA,
+    ) -> Histograma:
+        return self._registrar(Histograma(nombre, ayuda, etiquetas, limites))
+
+    def calculada(
+        self,
+        nombre: Text,
+        ayuda: Text,
+        funcion: Callable[[], Any],
+        etiqueta: Optional[Text] = None,
+        tipo: Text = "gauge",
+    ) -> MetricaCalculada:
+        return self._registrar(MetricaCalculada(nombre, ayuda, funcion, etiqueta, tipo))
+
+    def exponer(self) -> Text:
+        lineas = []
+        for metrica in list(self._metricas.values()):
+            lineas.append(f"# HELP {metrica.nombre} {metrica.ayuda}")
+            lineas.append(f"# TYPE {metrica.nombre} {metrica.tipo}")
+            lineas.extend(metrica.lineas())
+        return "\n".join(lineas) + "\n"
+
+
+REGISTRO = RegistroMetricas()
+
+DURACION_ACCIONES = REGISTRO.histograma(
+    "acciones_duracion_segundos", "Duración de Action.run por acción", ("accion",)
+)
+ERRORES_ACCIONES = REGISTRO.contador(
+    "acciones_errores_total", "Excepciones no capturadas en Action.run", ("accion",)
+)
+
+
+def medir_accion(run: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+    """Decorador para `Action.run`: duración y errores por `name()`, y su tramo.
+
+    El tramo cuelga del turno que abrió el canal (traceparent en la
+    metadata del mensaje), así las llamadas a la API quedan dentro.
+    """
+
+    @functools.wraps(run)
+    async def envoltura(self: Any, dispatcher: Any, tracker: Any, domain: Any) -> Any:
+        inicio = time.perf_counter()
+        padre = trazas.traceparent_de(tracker) if trazas.ARCHIVO else None
+        try:
+            with trazas.iniciar(f"accion {self.name()}", padre):
+                return await run(self, dispatcher, tracker, domain)
+        except Exception:
+            ERRORES_ACCIONES.inc(self.name())
+            raise
+        finally:
+            DURACION_ACCIONES.observar(time.perf_counter() - inicio, self.name())
+
+    return envoltura
+
+
+class _ManejadorMetricas(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        cuerpo = REGISTRO.exponer().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", TIPO_CONTENIDO)
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, formato: Text, *args: Any) -> None:
+        pass
+
+
+_servidor: Optional[ThreadingHTTPServer] = None
+
+
+def servir_metricas(puerto: Optional[Text] = PUERTO, host: Text = HOST) -> None:
+    """Expone GET /metrics en un hilo aparte (una vez por proceso)"""
+    global _servidor
+    if _servidor is not None or not puerto:
+        return
+    try:
+        _servidor = ThreadingHTTPServer((host, int(puerto)), _ManejadorMetricas)
+    except OSError as e:
+        # Otro proceso del servidor de acciones ya tiene el puerto
+        logger.warning("No se pudo abrir el endpoint de métricas en %s: %s", puerto, e)
+        return
+    _servidor.daemon_threads = True
+    threading.Thread(target=_servidor.serve_forever, name="metricas", daemon=True).start()
+    logger.info("Métricas en http://%s:%s/metrics", host, puerto)
@@ -0,0 +1,110 @@
+from typing import Any, Text, Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import json
+import os
+
+from actions.bitacora import obtener_logger
+from actions.cache_predicciones import CAMPOS_MODELO
+from actions.cliente_api import RespuestaAPI, obtener_cliente
+
+logger = obtener_logger(__name__)
+
+try:
+    import joblib
+    import numpy as np
+except ImportError:  # dependencias opcionales, solo para el modo local
+    joblib = None
+    np = None
+
+# Carpeta con los modelos serializados. Si no está definida, las predicciones
+# se piden a la API como siempre.
+#   random_forest.joblib, svm.joblib, knn.joblib
+#   metadatos.json (opcional): {"etiquetas": {"0": "Fatal", ...}, "mejor_modelo": "RandomForest"}
+MODELOS_DIR = os.environ.get("MODELOS_LOCALES_DIR")
+
+ARCHIVOS_MODELOS = {
+    "RandomForest": "random_forest.joblib",
+    "SVM": "svm.joblib",
+    "KNN": "knn.joblib",
+}
+
+# El historial se escribe después, con un /predict en segundo plano que
+# puede fallar: el resultado no puede darlo por guardado
+GUARDADO_PENDIENTE = "La predicción se registrará en tu historial"
+
+
+class ModelosLocales:
+    """Modelos RandomForest/SVM/KNN cargados en memoria del servidor de acciones"""
+
+    def __init__(self, directorio: Text) -> None:
+        if joblib is None or np is None:
+            raise ImportError(
+                "El modo de inferencia local requiere numpy, joblib y scikit-learn"
+            )
+
+        self.directorio = directorio
+        self.modelos = {
+            nombre: joblib.load(os.path.join(directorio, archivo))
+            for nombre, archivo in ARCHIVOS_MODELOS.items()
+        }
+
+        metadatos: Dict[Text, Any] = {}
+        ruta_metadatos = os.path.join(directorio, "metadatos.json")
+        if os.path.exists(ruta_metadatos):
+            with open(ruta_metadatos, encoding="utf-8") as f:
+                metadatos = json.load(f)
+
+        self.etiquetas = {str(k): v for k, v in metadatos.get("etiquetas", {}).items()}
+        self.mejor_modelo = metadatos.get("mejor_modelo", "RandomForest")
+
+    def _etiqueta(self, valor: Any) -> Text:
+        return self.etiquetas.get(str(valor), str(valor))
+
+    def predecir_lote(self, lote: List[Dict[Text, Any]]) -> List[Dict[Text, Any]]:
+        """Puntúa todas las filas del lote con una sola llamada por modelo"""
+        matriz = np.array(
+            [[datos[campo] for campo in CAMPOS_MODELO] for datos in lote], dtype=float
+        )
+        salidas = {nombre: modelo.predict(matriz) for nombre, modelo in self.modelos.items()}
+
+        resultados = []
+        for i in range(len(lote)):
+            resultado = {nombre: self._etiqueta(salida[i]) for nombre, salida in salidas.items()}
+            resultado["MejorModelo"] = self.mejor_modelo
+            resultado["Guardado"] = GUARDADO_PENDIENTE
+            resultados.append(resultado)
+        return resultados
+
+
+def cargar_modelos() -> Optional[ModelosLocales]:
+    """Carga los modelos al arrancar si el modo local está configurado"""
+    if not MODELOS_DIR:
+        return None
+    try:
+        modelos = ModelosLocales(MODELOS_DIR)
+        logger.info("Modelos locales cargados desde %s", MODELOS_DIR)
+        return modelos
+    except Exception as e:
+        logger.error("Error cargando modelos locales, se usará la API: %s", e)
+        return None
+
+
+modelos_locales = cargar_modelos()
+
+# Un hilo propio para la inferencia: los .predict de sklearn son síncronos y
+# en el event loop bloquearían todas las acciones en curso mientras corren
+_ejecutor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="modelos_locales")
+
+
+async def predecir_lote_local(lote: List[Dict[Text, Any]]) -> List[RespuestaAPI]:
+    """Ejecutor de lotes en proceso; el historial se guarda en segundo plano"""
+    loop = asyncio.get_running_loop()
+    resultados = await loop.run_in_executor(_ejecutor, modelos_locales.predecir_lote, lote)
+
+    # /predict es el único endpoint que registra en el historial del usuario
+    cliente = obtener_cliente()
+    for datos in lote:
+        cliente.post_en_segundo_plano("/predict", datos)
+
+    return [RespuestaAPI(200, resultado) for resultado in resultados]
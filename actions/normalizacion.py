@@ -0,0 +1,353 @@
+from typing import Any, Text, Dict, FrozenSet, List, Optional, Tuple
+import re
+
+from actions.difuso import NEGACIONES, UMBRAL_ACEPTAR, Coincidencia, IndiceDifuso
+
+# Diccionarios de mapeo (texto a número)
+DIAS_SEMANA = {
+    "domingo": 0, "dom": 0,
+    "lunes": 1, "lun": 1,
+    "martes": 2, "mar": 2,
+    "miércoles": 3, "miercoles": 3, "mie": 3,
+    "jueves": 4, "jue": 4,
+    "viernes": 5, "vie": 5,
+    "sábado": 6, "sabado": 6, "sab": 6
+}
+
+CONTROL_CRUCE = {
+    "sin control": 0, "ninguno": 0, "nada": 0, "sin": 0,
+    "stop": 1, "señal de stop": 1, "señales de stop": 1, "alto": 1,
+    "semáforo": 2, "semaforo": 2, "luz": 2, "luces": 2,
+    "rotonda": 3, "glorieta": 3, "redondel": 3,
+    "semáforo con sensor": 4, "semaforo con sensor": 4, "sensor": 4,
+    "señales de prioridad": 5, "prioridad": 5, "señal de prioridad": 5,
+    "otro": 6, "otra": 6, "otro control": 6
+}
+
+TIPO_CRUCE = {
+    "cruce simple": 0, "simple": 0, "normal": 0,
+    "cruce en t": 1, "t": 1, "cruce t": 1,
+    "cruce en y": 2, "y": 2, "cruce y": 2,
+    "cruce múltiple": 3, "cruce multiple": 3, "múltiple": 3, "multiple": 3,
+    "rotonda": 4, "glorieta": 4, "redondel": 4,
+    "entrada": 5, "salida": 5, "entrada/salida privada": 5, "privada": 5,
+    "otro": 6, "otra": 6
+}
+
+LUZ = {
+    "día": 0, "dia": 0, "luz del día": 0, "plena luz": 0, "de día": 0, "claro": 0,
+    "oscuro sin iluminación": 1, "oscuro sin luz": 1, "sin luz": 1, "muy oscuro": 1,
+    "oscuro con iluminación": 1, "oscuro con luz": 2, "con luz": 2, "alumbrado": 2,
+    "amanecer": 3, "atardecer": 3, "anochecer": 3, "penumbra": 3,
+    "niebla": 4, "humo": 4, "neblina": 4,
+    "otro": 5, "otra": 5
+}
+
+SUPERFICIE = {
+    "seco": 0, "asfalto seco": 0, "seca": 0, "dry": 0,
+    "húmedo": 1, "humedo": 1, "mojado": 1, "asfalto húmedo": 1, "mojada": 1, "wet": 1,
+    "hielo": 2, "nieve": 2, "helado": 2, "congelado": 2,
+    "grava": 3, "gravilla": 3, "piedritas": 3,
+    "otro": 4, "otra": 4
+}
+
+TIPO_VIA = {
+    "calle": 0, "callejón": 0, "callejon": 0,
+    "avenida": 1, "av": 1, "ave": 1,
+    "carretera principal": 2, "autopista": 2, "principal": 2,
+    "carretera secundaria": 3, "secundaria": 3, "vía secundaria": 3,
+    "rotonda": 4, "glorieta": 4, "redondel": 4,
+    "otro": 5, "otra": 5
+}
+
+CLIMA = {
+    "despejado": 0, "soleado": 0, "sol": 0, "claro": 0, "buen tiempo": 0,
+    "lluvia ligera": 1, "llovizna": 1, "lluvia leve": 1, "chispeando": 1,
+    "lluvia intensa": 2, "lluvia fuerte": 2, "tormenta": 2, "aguacero": 2, "diluvio": 2,
+    "niebla": 3, "neblina": 3, "bruma": 3,
+    "nieve": 4, "nevada": 4, "nevando": 4,
+    "viento fuerte": 5, "ventoso": 5, "viento": 5, "vendaval": 5,
+    "otro": 6, "otra": 6
+}
+
+VEHICULO = {
+    "coche": 0, "carro": 0, "auto": 0, "automóvil": 0, "automovil": 0, "sedan": 0,
+    "motocicleta": 1, "moto": 1, "motorbike": 1, "motorcycle": 1,
+    "camión": 2, "camion": 2, "truck": 2, "trailer": 2,
+    "autobús": 3, "autobus": 3, "bus": 3, "buseta": 3,
+    "bicicleta": 4, "bici": 4, "bike": 4, "cicla": 4,
+    "peatón": 5, "peaton": 5, "persona": 5, "caminando": 5, "a pie": 5,
+    "otro": 6, "otra": 6
+}
+
+AREA = {
+    "urbano": 0, "urbana": 0, "ciudad": 0, "urbano": 0,
+    "rural": 1, "campo": 1, "zona rural": 1
+}
+
+VICTIMAS = {
+    "ninguna": 0, "cero": 0, "sin víctimas": 0, "ninguno": 0, "0": 0,
+    "una": 1, "uno": 1, "1": 1,
+    "dos": 2, "2": 2,
+    "tres": 3, "3": 3,
+    "cuatro": 4, "4": 4,
+    "cinco": 5, "más de cinco": 5, "5": 5, "muchas": 5
+}
+
+NUM_VEHICULOS = {
+    "uno": 1, "un": 1, "1": 1,
+    "dos": 2, "2": 2,
+    "tres": 3, "3": 3,
+    "cuatro": 4, "4": 4,
+    "cinco": 5, "más de cinco": 5, "5": 5, "muchos": 5
+}
+
+DISTRITOS_VALIDOS = (0, 1, 3, 4, 76, 159, 176, 267, 384)
+LIMITES_VALIDOS = (30, 40, 50, 60, 70, 80, 90, 100, 110, 120)
+
+# Plegado de acentos: "Miércoles " y "miercoles" caen en la misma clave
+_PLIEGUE = str.maketrans("áéíóúüñ", "aeiouun")
+_NUMERO = re.compile(r"^-?\d+(?:\.\d+)?$")
+_PALABRA = re.compile(r"\d+(?:\.\d+)?|[a-z]+")
+# Separadores de cláusula: una negación no pasa de uno a otro ("no, el lunes")
+_CLAUSULA = re.compile(r"[,;:!?]|\.(?!\d)")
+# Palabras hacia atrás en las que una negación anula la coincidencia
+# ("no había semáforo")
+VENTANA_NEGACION = 2
+
+# Palabras demasiado comunes para asignarlas a un slot que no se ha
+# preguntado: conectores ("y", "sin"), números en palabras y respuestas vagas
+SOLO_SI_SE_PREGUNTA = frozenset({
+    "t", "y", "sin", "nada", "alto", "luz", "luces", "normal", "simple", "claro",
+    "entrada", "salida", "principal", "persona", "sol", "otro", "otra", "otro control",
+    "un", "una", "uno", "dos", "tres", "cuatro", "cinco", "cero",
+    "ninguna", "ninguno", "muchas", "muchos",
+})
+
+
+def plegar(texto: Text) -> Text:
+    """Minúsculas, sin acentos y con los espacios colapsados"""
+    return " ".join(texto.lower().translate(_PLIEGUE).split())
+
+
+class ReglaSlot:
+    """Sinónimos y valores numéricos admitidos para un slot del formulario"""
+
+    __slots__ = ("slot", "sinonimos", "permitidos", "tope", "tabla", "nombres", "difuso")
+
+    def __init__(
+        self,
+        slot: Text,
+        sinonimos: Optional[Dict[Text, int]],
+        permitidos: Any,
+        tope: Optional[int] = None,
+    ) -> None:
+        self.slot = slot
+        # Se indexa la clave tal cual y plegada: la mayoría de las entradas
+        # aciertan sin tener que plegar el texto del usuario
+        self.sinonimos: Dict[Text, int] = {}
+        for clave, valor in (sinonimos or {}).items():
+            self.sinonimos[clave] = valor
+            self.sinonimos[plegar(clave)] = valor
+        self.permitidos: FrozenSet[int] = frozenset(permitidos)
+        # Valores por encima del tope se recortan (p. ej. "más de cinco" víctimas)
+        self.tope = tope
+        # Tabla de búsqueda directa: sinónimos más los valores permitidos
+        # escritos como número, que es la respuesta más frecuente
+        self.tabla: Dict[Text, int] = dict(self.sinonimos)
+        for valor in self.permitidos:
+            self.tabla.setdefault(str(valor), valor)
+
+        # Índice aproximado sobre las claves plegadas; `nombres` guarda la
+        # primera forma escrita (con acentos) para sugerirla al usuario
+        self.nombres: Dict[Text, Text] = {}
+        for clave in sinonimos or {}:
+            self.nombres.setdefault(plegar(clave), clave)
+        self.difuso = IndiceDifuso(
+            {plegada: self.sinonimos[plegada] for plegada in self.nombres}
+        ) if self.nombres else None
+
+    def numero(self, texto: Text) -> Optional[int]:
+        """Valor numérico admitido, o None (sin excepciones en el camino común)"""
+        if texto.isdigit():
+            valor = int(texto)
+        elif _NUMERO.match(texto):
+            valor = int(float(texto))
+        else:
+            return None
+        if self.tope is not None and valor > self.tope:
+            valor = self.tope
+        return valor if valor in self.permitidos else None
+
+    def normalizar(self, texto: Text) -> Optional[int]:
+        """`texto` ya en minúsculas y sin espacios en los extremos"""
+        valor = self.tabla.get(texto)
+        if valor is not None:
+            return valor
+        valor = self.numero(texto)
+        if valor is not None:
+            return valor
+        # Plegar solo si hay algo que plegar (acentos o espacios repetidos)
+        if not texto.isascii() or "  " in texto:
+            return self.sinonimos.get(plegar(texto))
+        return None
+
+    def aproximar(self, texto: Text) -> Optional[Coincidencia]:
+        """Sinónimo más parecido (errores de tipeo, frases parciales), o None"""
+        if self.difuso is None or not any(c.isalpha() for c in texto):
+            return None
+        coincidencia = self.difuso.buscar(plegar(texto))
+        if coincidencia is None:
+            return None
+        frase, valor, confianza = coincidencia
+        return self.nombres[frase], valor, confianza
+
+
+class NormalizadorSlots:
+    """Motor de normalización de slots, construido una sola vez al importar.
+
+    Además de la tabla por slot mantiene un índice por prefijo: la primera
+    palabra de cada sinónimo apunta a las frases que empiezan por ella
+    (las más largas primero), para buscar sinónimos dentro de un texto libre.
+    """
+
+    def __init__(self, reglas: List[ReglaSlot]) -> None:
+        self.reglas = {regla.slot: regla for regla in reglas}
+
+        self.indice_prefijos: Dict[Text, List[Tuple[Tuple[Text, ...], Text, int]]] = {}
+        for regla in reglas:
+            for frase, valor in regla.sinonimos.items():
+                if frase != plegar(frase):
+                    continue
+                palabras = tuple(frase.split())
+                self.indice_prefijos.setdefault(palabras[0], []).append(
+                    (palabras, regla.slot, valor)
+                )
+        for candidatos in self.indice_prefijos.values():
+            candidatos.sort(key=lambda c: len(c[0]), reverse=True)
+
+    def resolver(self, slot: Text, valor: Any) -> Tuple[Optional[int], Optional[Text]]:
+        """Código numérico del slot y, si no se aceptó, un sinónimo a sugerir.
+
+        Primero se busca el valor exacto; si no aparece se intenta la
+        coincidencia aproximada, que solo se acepta por encima de
+        UMBRAL_ACEPTAR. Por debajo se devuelve la frase más parecida para
+        volver a preguntar con una sugerencia.
+        """
+        regla = self.reglas[slot]
+        texto = str(valor).lower().strip()
+        # Acierto directo en la tabla sin pasar por ReglaSlot.normalizar
+        resultado = regla.tabla.get(texto)
+        if resultado is None:
+            resultado = regla.normalizar(texto)
+        if resultado is not None:
+            return resultado, None
+
+        coincidencia = regla.aproximar(texto)
+        if coincidencia is None:
+            return None, None
+        frase, resultado, confianza = coincidencia
+        if confianza >= UMBRAL_ACEPTAR:
+            return resultado, None
+        return None, frase
+
+    def normalizar(self, slot: Text, valor: Any) -> Optional[int]:
+        """Convierte el valor del usuario al código numérico del slot, o None"""
+        return self.resolver(slot, valor)[0]
+
+    def candidatos(self, palabras: List[Text], inicio: int) -> List[Tuple[int, Text, int]]:
+        """Sinónimos que aparecen en `palabras` a partir de `inicio`.
+
+        Devuelve (número de palabras, slot, valor), de la frase más larga a
+        la más corta.
+        """
+        encontrados = []
+        for frase, slot, valor in self.indice_prefijos.get(palabras[inicio], ()):
+            fin = inicio + len(frase)
+            if tuple(palabras[inicio:fin]) == frase:
+                encontrados.append((len(frase), slot, valor))
+        return encontrados
+
+    def extraer(
+        self, texto: Text, pendientes: List[Text], solicitado: Optional[Text]
+    ) -> Dict[Text, int]:
+        """Valores de todos los slots pendientes que aparecen en un texto libre.
+
+        Recorre el texto una vez tomando en cada posición el sinónimo más
+        largo. Un sinónimo que sirve para varios slots pendientes ("rotonda",
+        "niebla") o una palabra de SOLO_SI_SE_PREGUNTA solo se asigna al slot
+        preguntado. Con los números igual, salvo los que solo pueden ser un
+        límite de velocidad o un código de distrito. Lo que sigue de cerca a
+        una negación ("no había semáforo", "sin lluvia fuerte") no se asigna.
+        """
+        abiertos = set(pendientes)
+        if solicitado:
+            abiertos.add(solicitado)
+        palabras: List[Text] = []
+        inicio_clausula: List[int] = []
+        for clausula in _CLAUSULA.split(plegar(texto)):
+            inicio = len(palabras)
+            palabras.extend(_PALABRA.findall(clausula))
+            inicio_clausula.extend([inicio] * (len(palabras) - inicio))
+        encontrados: Dict[Text, int] = {}
+
+        def negada(i: int) -> bool:
+            desde = max(inicio_clausula[i], i - VENTANA_NEGACION)
+            return any(palabras[j] in NEGACIONES for j in range(desde, i))
+
+        def asignar(slots: Dict[Text, int], frase: Text) -> None:
+            libres = {s: v for s, v in slots.items() if s in abiertos and s not in encontrados}
+            if solicitado in libres:
+                encontrados[solicitado] = libres[solicitado]
+            elif len(libres) == 1 and frase not in SOLO_SI_SE_PREGUNTA:
+                encontrados.update(libres)
+
+        i = 0
+        while i < len(palabras):
+            palabra = palabras[i]
+            if palabra[0].isdigit():
+                numero = int(float(palabra))
+                slots = {}
+                if solicitado in self.reglas:
+                    valor = self.reglas[solicitado].numero(palabra)
+                    if valor is not None:
+                        slots[solicitado] = valor
+                if numero in LIMITES_VALIDOS:
+                    slots["speed_limit"] = numero
+                elif numero in DISTRITOS_VALIDOS and numero > 6:
+                    slots["local_authority"] = numero
+                if not negada(i):
+                    asignar(slots, palabra)
+                i += 1
+                continue
+
+            candidatos = self.candidatos(palabras, i)
+            if not candidatos:
+                i += 1
+                continue
+            largo = candidatos[0][0]
+            # Negado, se salta la frase entera: mejor preguntar que adivinar
+            if not negada(i):
+                asignar(
+                    {slot: valor for n, slot, valor in candidatos if n == largo},
+                    " ".join(palabras[i:i + largo]),
+                )
+            i += largo
+        return encontrados
+
+
+NORMALIZADOR = NormalizadorSlots([
+    ReglaSlot("day_of_week", DIAS_SEMANA, range(0, 7)),
+    ReglaSlot("junction_control", CONTROL_CRUCE, range(0, 7)),
+    ReglaSlot("junction_detail", TIPO_CRUCE, range(0, 7)),
+    ReglaSlot("light_conditions", LUZ, range(0, 6)),
+    ReglaSlot("local_authority", None, DISTRITOS_VALIDOS),
+    ReglaSlot("road_surface", SUPERFICIE, range(0, 5)),
+    ReglaSlot("road_type", TIPO_VIA, range(0, 6)),
+    ReglaSlot("speed_limit", None, LIMITES_VALIDOS),
+    ReglaSlot("urban_rural", AREA, (0, 1)),
+    ReglaSlot("weather", CLIMA, range(0, 7)),
+    ReglaSlot("vehicle_type", VEHICULO, range(0, 7)),
+    ReglaSlot("casualties", VICTIMAS, range(0, 6), tope=5),
+    ReglaSlot("num_vehicles", NUM_VEHICULOS, range(1, 6), tope=5),
+])
@@ -0,0 +1,272 @@
+from typing import Any, Awaitable, Callable, Text, Dict, Optional, Tuple
+from collections import deque
+import asyncio
+import random
+import time
+
+from actions.bitacora import obtener_logger
+from actions.metricas import REGISTRO
+
+logger = obtener_logger(__name__)
+
+# Estados del interruptor de circuito
+CERRADO = "cerrado"
+ABIERTO = "abierto"
+SEMIABIERTO = "semiabierto"
+
+UMBRAL_FALLOS = 5
+TIEMPO_APERTURA = 30.0
+
+TRANSICIONES_CIRCUITO = REGISTRO.contador(
+    "circuito_transiciones_total", "Cambios de estado del circuito de la API", ("desde", "hacia")
+)
+
+# Reintentos para llamadas idempotentes
+MAX_INTENTOS = 3
+ESPERA_BASE = 0.5
+ESPERA_MAXIMA = 4.0
+
+# Petición de cobertura (hedging): muestras mínimas antes de fiarse del p95
+MUESTRAS_MINIMAS_P95 = 20
+VENTANA_LATENCIAS = 200
+
+# Mantener caliente el backend de Render (se duerme tras ~15 min sin tráfico)
+INTERVALO_CALENTAMIENTO = 240.0
+INACTIVIDAD_MAXIMA = 900.0
+
+
+class InterruptorCircuito:
+    """Circuit breaker para las llamadas a la API.
+
+    Tras UMBRAL_FALLOS fallos consecutivos se abre y rechaza las llamadas al
+    instante durante TIEMPO_APERTURA segundos. Luego pasa a semiabierto y deja
+    pasar una única llamada de prueba: si sale bien se cierra, si falla se
+    vuelve a abrir.
+    """
+
+    def __init__(
+        self, umbral_fallos: int = UMBRAL_FALLOS, tiempo_apertura: float = TIEMPO_APERTURA
+    ) -> None:
+        self.umbral_fallos = umbral_fallos
+        self.tiempo_apertura = tiempo_apertura
+        self.estado = CERRADO
+        self._fallos_consecutivos = 0
+        self._abierto_desde = 0.0
+        self._prueba_en_curso = False
+        self.rechazadas = 0
+        self.transiciones: Dict[Tuple[Text, Text], int] = {}
+
+    def _cambiar_estado(self, nuevo: Text) -> None:
+        if nuevo == self.estado:
+            return
+        clave = (self.estado, nuevo)
+        self.transiciones[clave] = self.transiciones.get(clave, 0) + 1
+        TRANSICIONES_CIRCUITO.inc(self.estado, nuevo)
+        logger.warning("Circuito de la API: %s -> %s", self.estado, nuevo)
+        self.estado = nuevo
+        if nuevo == ABIERTO:
+            self._abierto_desde = time.monotonic()
+
+    def permitir(self) -> bool:
+        """Indica si la llamada puede salir; en semiabierto solo pasa una prueba"""
+        if self.estado == ABIERTO:
+            if time.monotonic() - self._abierto_desde < self.tiempo_apertura:
+                self.rechazadas += 1
+                return False
+            self._cambiar_estado(SEMIABIERTO)
+
+        if self.estado == SEMIABIERTO:
+            if self._prueba_en_curso:
+                self.rechazadas += 1
+                return False
+            self._prueba_en_curso = True
+
+        return True
+
+    def registrar_exito(self) -> None:
+        self._prueba_en_curso = False
+        self._fallos_consecutivos = 0
+        self._cambiar_estado(CERRADO)
+
+    def registrar_fallo(self) -> None:
+        self._prueba_en_curso = False
+        self._fallos_consecutivos += 1
+        if self.estado == SEMIABIERTO or self._fallos_consecutivos >= self.umbral_fallos:
+            self._cambiar_estado(ABIERTO)
+
+    def liberar(self) -> None:
+        """Libera la prueba si la llamada se canceló sin resultado"""
+        self._prueba_en_curso = False
+
+    def estadisticas(self) -> Dict[Text, Any]:
+        return {
+            "estado": self.estado,
+            "fallos_consecutivos": self._fallos_consecutivos,
+            "rechazadas": self.rechazadas,
+            "transiciones": {
+                f"{origen}->{destino}": n for (origen, destino), n in self.transiciones.items()
+            },
+        }
+
+
+class MantenedorCalor:
+    """Hace ping periódico al backend mientras haya conversaciones activas"""
+
+    def __init__(
+        self,
+        cliente: Any,
+        intervalo: float = INTERVALO_CALENTAMIENTO,
+        inactividad_maxima: float = INACTIVIDAD_MAXIMA,
+    ) -> None:
+        self.cliente = cliente
+        self.intervalo = intervalo
+        self.inactividad_maxima = inactividad_maxima
+        self._ultima_actividad = 0.0
+        self._tarea: Optional[asyncio.Task] = None
+        self.pings_ok = 0
+        self.pings_fallidos = 0
+
+    def registrar_actividad(self) -> None:
+        """Marca actividad y arranca el ping si no está corriendo"""
+        self._ultima_actividad = time.monotonic()
+        if self._tarea is None or self._tarea.done():
+            self._tarea = asyncio.create_task(self._bucle())
+
+    async def _bucle(self) -> None:
+        while time.monotonic() - self._ultima_actividad < self.inactividad_maxima:
+            await asyncio.sleep(self.intervalo)
+            try:
+                status = await self.cliente.ping()
+                if status < 500:
+                    self.pings_ok += 1
+                else:
+                    self.pings_fallidos += 1
+            except Exception as e:
+                self.pings_fallidos += 1
+                logger.warning("Ping de calentamiento fallido: %s", e)
+
+    def estadisticas(self) -> Dict[Text, Any]:
+        return {
+            "activo": self._tarea is not None and not self._tarea.done(),
+            "pings_ok": self.pings_ok,
+            "pings_fallidos": self.pings_fallidos,
+        }
+
+
+class ErrorReintentable(Exception):
+    """Respuesta 5xx que merece otro intento; guarda la respuesta original"""
+
+    def __init__(self, respuesta: Any) -> None:
+        super().__init__(f"Status {respuesta.status}")
+        self.respuesta = respuesta
+
+
+class PoliticaReintentos:
+    """Reintentos con espera exponencial y jitter dentro de un plazo total.
+
+    Solo se aplica a llamadas idempotentes. Se reintentan errores de conexión,
+    timeouts y respuestas 5xx; nunca un circuito abierto (debe fallar rápido).
+    Con `reintentar_5xx` en False, un 5xx se devuelve tal cual y solo se
+    reintentan los errores que acepte `reintentable`.
+    """
+
+    def __init__(
+        self,
+        max_intentos: int = MAX_INTENTOS,
+        espera_base: float = ESPERA_BASE,
+        espera_maxima: float = ESPERA_MAXIMA,
+    ) -> None:
+        self.max_intentos = max_intentos
+        self.espera_base = espera_base
+        self.espera_maxima = espera_maxima
+        self.reintentos = 0
+
+    async def ejecutar(
+        self,
+        llamada: Callable[[], Awaitable[Any]],
+        plazo_total: float,
+        reintentable: Callable[[Exception], bool],
+        reintentar_5xx: bool = True,
+    ) -> Any:
+        """Ejecuta `llamada`, cuyo resultado tiene un atributo `status`"""
+        limite = time.monotonic() + plazo_total
+        intento = 0
+        while True:
+            intento += 1
+            restante = limite - time.monotonic()
+            try:
+                respuesta = await asyncio.wait_for(llamada(), timeout=restante)
+                if reintentar_5xx and respuesta.status >= 500:
+                    raise ErrorReintentable(respuesta)
+                return respuesta
+            except Exception as e:
+                ultimo = intento >= self.max_intentos
+                if not isinstance(e, ErrorReintentable) and not reintentable(e):
+                    raise
+                # Full jitter: espera aleatoria entre 0 y el tope exponencial
+                espera = random.uniform(
+                    0, min(self.espera_maxima, self.espera_base * 2 ** (intento - 1))
+                )
+                if ultimo or time.monotonic() + espera >= limite:
+                    if isinstance(e, ErrorReintentable):
+                        return e.respuesta
+                    raise
+            self.reintentos += 1
+            await asyncio.sleep(espera)
+
+
+class LatenciasRecientes:
+    """Ventana deslizante de latencias para estimar el p95 por endpoint"""
+
+    def __init__(self, tamano: int = VENTANA_LATENCIAS) -> None:
+        self._muestras: deque = deque(maxlen=tamano)
+        self._p95: Optional[float] = None
+        self._desde_calculo = 0
+
+    def registrar(self, segundos: float) -> None:
+        self._muestras.append(segundos)
+        self._desde_calculo += 1
+
+    def p95(self) -> Optional[float]:
+        if len(self._muestras) < MUESTRAS_MINIMAS_P95:
+            return None
+        # Recalcular cada pocas muestras basta; ordenar 200 floats es barato
+        if self._p95 is None or self._desde_calculo >= 10:
+            ordenadas = sorted(self._muestras)
+            self._p95 = ordenadas[int(len(ordenadas) * 0.95) - 1]
+            self._desde_calculo = 0
+        return self._p95
+
+
+async def con_cobertura(
+    llamada: Callable[[], Awaitable[Any]], umbral: Optional[float]
+) -> Tuple[Any, bool]:
+    """Lanza una segunda petición si la primera supera el umbral (hedging).
+
+    Devuelve el primer resultado exitoso y si hizo falta la segunda petición;
+    la que pierde se cancela.
+    """
+    primera = asyncio.ensure_future(llamada())
+    if umbral is None:
+        return await primera, False
+
+    hechas, _ = await asyncio.wait({primera}, timeout=umbral)
+    if hechas:
+        return primera.result(), False
+
+    segunda = asyncio.ensure_future(llamada())
+    pendientes = {primera, segunda}
+    error: Optional[BaseException] = None
+    try:
+        while pendientes:
+            hechas, pendientes = await asyncio.wait(
+                pendientes, return_when=asyncio.FIRST_COMPLETED
+            )
+            for tarea in hechas:
+                if tarea.exception() is None:
+                    return tarea.result(), True
+                error = tarea.exception()
+        raise error
+    finally:
+        for tarea in pendientes:
+            tarea.cancel()
@@ -0,0 +1,206 @@
+from typing import Any, Text, Dict, Optional
+from collections import OrderedDict
+import hashlib
+import hmac
+import os
+import secrets
+import sqlite3
+import time
+
+from actions.bitacora import obtener_logger
+from actions.metricas import REGISTRO
+
+logger = obtener_logger(__name__)
+
+# Tiempo que un login sigue valiendo para el mismo número de WhatsApp. El
+# sender_id basta para restaurarlo: solo es seguro si el webhook comprueba
+# la firma de Meta (app_secret) y no hay canales sin autenticar (rest)
+TTL_SEGUNDOS = float(os.environ.get("SESIONES_TTL_SEGUNDOS", str(12 * 3600)))
+MAX_SESIONES = int(os.environ.get("SESIONES_MAX", "50000"))
+# Archivo SQLite para que las sesiones sobrevivan reinicios y se compartan
+# entre varios procesos del servidor de acciones; sin él, solo en memoria
+RUTA_SQLITE = os.environ.get("SESIONES_SQLITE_PATH")
+# Clave de la firma de los tokens locales. Sin ella se genera una por
+# proceso, que solo sirve con el almacén en memoria: con SQLite cada proceso
+# rechazaría las sesiones firmadas por los demás.
+SECRETO_CONFIGURADO = bool(os.environ.get("SESIONES_SECRETO"))
+SECRETO = os.environ.get("SESIONES_SECRETO", "").encode() or secrets.token_bytes(32)
+
+PREFIJO_LOCAL = "local:"
+
+
+def firmar(sender_id: Text, id_usuario: Text, expira: float) -> Text:
+    """Token local: caducidad + HMAC-SHA256 de (sender_id, id_usuario, caducidad)"""
+    mensaje = f"{sender_id}|{id_usuario}|{expira:.0f}".encode()
+    firma = hmac.new(SECRETO, mensaje, hashlib.sha256).hexdigest()
+    return f"{PREFIJO_LOCAL}{expira:.0f}.{firma}"
+
+
+class SesionUsuario:
+    """Autenticación recordada para un sender_id"""
+
+    __slots__ = ("sender_id", "id_usuario", "usuario", "token", "expira")
+
+    def __init__(
+        self, sender_id: Text, id_usuario: Text, usuario: Text, token: Text, expira: float
+    ) -> None:
+        self.sender_id = sender_id
+        self.id_usuario = id_usuario
+        self.usuario = usuario
+        self.token = token
+        self.expira = expira
+
+    def vigente(self, ahora: float) -> bool:
+        return self.expira > ahora
+
+    def firma_valida(self) -> bool:
+        """Si el token es local, que la firma sea correcta.
+
+        Los tokens emitidos por la API se guardan tal cual: comprobarlos
+        exigiría justo la llamada que la sesión quiere ahorrar.
+        """
+        if self.token.startswith(PREFIJO_LOCAL):
+            esperado = firmar(self.sender_id, self.id_usuario, self.expira)
+            return hmac.compare_digest(self.token, esperado)
+        return True
+
+
+class AlmacenSesionesMemoria:
+    """Sesiones en memoria con expiración y tamaño máximo"""
+
+    def __init__(self, ttl: float = TTL_SEGUNDOS, max_sesiones: int = MAX_SESIONES) -> None:
+        self.ttl = ttl
+        self.max_sesiones = max_sesiones
+        # Orden de inserción == orden de caducidad (TTL fijo)
+        self._sesiones: "OrderedDict[Text, SesionUsuario]" = OrderedDict()
+
+    def _purgar(self, ahora: float) -> None:
+        while self._sesiones:
+            sesion = next(iter(self._sesiones.values()))
+            if sesion.expira > ahora and len(self._sesiones) <= self.max_sesiones:
+                break
+            self._sesiones.popitem(last=False)
+
+    def guardar(self, sesion: SesionUsuario) -> None:
+        self._sesiones[sesion.sender_id] = sesion
+        self._sesiones.move_to_end(sesion.sender_id)
+        self._purgar(time.time())
+
+    def obtener(self, sender_id: Text) -> Optional[SesionUsuario]:
+        return self._sesiones.get(sender_id)
+
+    def eliminar(self, sender_id: Text) -> None:
+        self._sesiones.pop(sender_id, None)
+
+    def __len__(self) -> int:
+        return len(self._sesiones)
+
+
+class AlmacenSesionesSQLite:
+    """Sesiones en un archivo SQLite compartido por los procesos de acciones"""
+
+    PURGAR_CADA = 500
+
+    def __init__(self, ruta: Text, ttl: float = TTL_SEGUNDOS) -> None:
+        self.ttl = ttl
+        self._escrituras = 0
+        self._conn = sqlite3.connect(ruta, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sesiones ("
+            "sender_id TEXT PRIMARY KEY, id_usuario TEXT, usuario TEXT, token TEXT, expira REAL)"
+        )
+
+    def guardar(self, sesion: SesionUsuario) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO sesiones VALUES (?, ?, ?, ?, ?)",
+            (sesion.sender_id, sesion.id_usuario, sesion.usuario, sesion.token, sesion.expira),
+        )
+        self._escrituras += 1
+        if self._escrituras % self.PURGAR_CADA == 0:
+            self._conn.execute("DELETE FROM sesiones WHERE expira <= ?", (time.time(),))
+
+    def obtener(self, sender_id: Text) -> Optional[SesionUsuario]:
+        fila = self._conn.execute(
+            "SELECT sender_id, id_usuario, usuario, token, expira FROM sesiones WHERE sender_id = ?",
+            (sender_id,),
+        ).fetchone()
+        return SesionUsuario(*fila) if fila else None
+
+    def eliminar(self, sender_id: Text) -> None:
+        self._conn.execute("DELETE FROM sesiones WHERE sender_id = ?", (sender_id,))
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM sesiones").fetchone()[0]
+
+
+class GestorSesiones:
+    """Crea, restaura e invalida sesiones sobre cualquiera de los almacenes"""
+
+    def __init__(self, almacen: Any, ttl: float = TTL_SEGUNDOS) -> None:
+        self.almacen = almacen
+        self.ttl = ttl
+        self.restauradas = 0
+        self.rechazadas = 0
+
+    def iniciar(
+        self, sender_id: Text, id_usuario: Any, usuario: Text, token_api: Optional[Text] = None
+    ) -> SesionUsuario:
+        """Recuerda un login correcto; sin token de la API se firma uno local"""
+        expira = float(int(time.time() + self.ttl))
+        id_usuario = str(id_usuario)
+        token = token_api or firmar(sender_id, id_usuario, expira)
+        sesion = SesionUsuario(sender_id, id_usuario, usuario, token, expira)
+        self.almacen.guardar(sesion)
+        return sesion
+
+    def restaurar(self, sender_id: Text) -> Optional[SesionUsuario]:
+        """Sesión vigente del sender_id, o None (las caducadas se borran)"""
+        sesion = self.almacen.obtener(sender_id)
+        if sesion is None:
+            return None
+        if not sesion.vigente(time.time()):
+            self.almacen.eliminar(sender_id)
+            return None
+        if not sesion.firma_valida():
+            # No se borra: la pudo firmar otro proceso con otra clave, y
+            # borrarla cerraría una sesión legítima
+            self.rechazadas += 1
+            return None
+        self.restauradas += 1
+        return sesion
+
+    def cerrar(self, sender_id: Text) -> None:
+        self.almacen.eliminar(sender_id)
+
+    def estadisticas(self) -> Dict[Text, Any]:
+        return {
+            "sesiones": len(self.almacen),
+            "restauradas": self.restauradas,
+            "rechazadas": self.rechazadas,
+        }
+
+
+_sesiones: Optional[GestorSesiones] = None
+
+
+def obtener_sesiones() -> GestorSesiones:
+    """Devuelve el gestor de sesiones compartido"""
+    global _sesiones
+    if _sesiones is None:
+        if RUTA_SQLITE and not SECRETO_CONFIGURADO:
+            logger.warning(
+                "SESIONES_SQLITE_PATH sin SESIONES_SECRETO: cada proceso firmaría con su "
+                "propia clave; se usan sesiones en memoria"
+            )
+            almacen = AlmacenSesionesMemoria()
+        elif RUTA_SQLITE:
+            almacen = AlmacenSesionesSQLite(RUTA_SQLITE)
+        else:
+            almacen = AlmacenSesionesMemoria()
+        _sesiones = GestorSesiones(almacen)
+        REGISTRO.calculada(
+            "sesiones_restauradas_total", "Sesiones recordadas que evitaron un /login",
+            lambda: _sesiones.restauradas, tipo="counter",
+        )
+    return _sesiones
@@ -1,8 +1,9 @@
 import requests
 import json
+import os
 
-# Tu URL de Render
-API_BASE_URL = "https://api-ia-o027.onrender.com"
+# Tu URL de Render (o la API falsa: API_BASE_URL=http://localhost:5057)
+API_BASE_URL = os.environ.get("API_BASE_URL", "https://api-ia-o027.onrender.com")
 
 print("=" * 60)
 print("🧪 PRUEBA DE CONEXIÓN CON LA API")
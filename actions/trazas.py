@@ -0,0 +1,201 @@
+from typing import Any, Dict, Optional, Text, Tuple, Union
+from contextvars import ContextVar
+import atexit
+import json
+import os
+import queue
+import random
+import secrets
+import threading
+import time
+
+# Archivo JSONL donde cada proceso escribe sus tramos (vacío = trazas apagadas).
+# Usa uno por proceso: el informe (actions/informe_trazas.py) los une por traza.
+ARCHIVO = os.environ.get("TRAZAS_ARCHIVO", "")
+# Fracción de turnos que se trazan; la decisión viaja en el traceparent
+MUESTREO = float(os.environ.get("TRAZAS_MUESTREO", "1.0"))
+# Tramos en espera de escribirse; si se llena, se descartan en vez de bloquear
+TAMANO_COLA = int(os.environ.get("TRAZAS_TAMANO_COLA", "10000"))
+
+# Clave del contexto en la metadata del UserMessage (formato W3C Trace Context)
+CLAVE_METADATA = "traceparent"
+
+
+class Tramo:
+    """Un tramo de una traza: nombre, inicio, duración y atributos.
+
+    Se crea ya iniciado. Como context manager lo marca como tramo actual
+    (los tramos creados dentro, también en tareas hijas, cuelgan de él) y
+    lo termina al salir; `terminar()` sirve cuando empieza en una tarea y
+    acaba en otra.
+    """
+
+    __slots__ = (
+        "traza", "id", "padre", "nombre", "inicio", "duracion", "atributos", "error",
+        "muestreado", "_t0", "_token",
+    )
+
+    def __init__(
+        self,
+        nombre: Text,
+        traza: Text,
+        padre: Optional[Text],
+        muestreado: bool,
+        atributos: Dict[Text, Any],
+    ) -> None:
+        self.traza = traza
+        self.id = secrets.token_hex(8)
+        self.padre = padre
+        self.nombre = nombre
+        self.inicio = time.time()
+        self.duracion: Optional[float] = None
+        self.atributos = atributos
+        self.error: Optional[Text] = None
+        self.muestreado = muestreado
+        self._t0 = time.perf_counter()
+        self._token = None
+
+    def traceparent(self) -> Text:
+        return f"00-{self.traza}-{self.id}-{'01' if self.muestreado else '00'}"
+
+    def anotar(self, clave: Text, valor: Any) -> None:
+        self.atributos[clave] = valor
+
+    def terminar(self, error: Optional[BaseException] = None) -> None:
+        if self.duracion is not None:
+            return
+        self.duracion = time.perf_counter() - self._t0
+        if error is not None:
+            self.error = type(error).__name__
+        if self.muestreado:
+            _exportar(self)
+
+    def a_dict(self) -> Dict[Text, Any]:
+        return {
+            "traza": self.traza,
+            "tramo": self.id,
+            "padre": self.padre,
+            "nombre": self.nombre,
+            "inicio": self.inicio,
+            "duracion": self.duracion,
+            "atributos": self.atributos,
+            "error": self.error,
+        }
+
+    def __enter__(self) -> "Tramo":
+        self._token = _actual.set(self)
+        return self
+
+    def __exit__(self, tipo: Any, error: Optional[BaseException], traza: Any) -> None:
+        _actual.reset(self._token)
+        self.terminar(error)
+
+
+class _TramoNulo:
+    """Lo que devuelve `iniciar` con las trazas apagadas: no hace nada"""
+
+    __slots__ = ()
+
+    def traceparent(self) -> None:
+        return None
+
+    def anotar(self, clave: Text, valor: Any) -> None:
+        pass
+
+    def terminar(self, error: Optional[BaseException] = None) -> None:
+        pass
+
+    def __enter__(self) -> "_TramoNulo":
+        return self
+
+    def __exit__(self, tipo: Any, error: Optional[BaseException], traza: Any) -> None:
+        pass
+
+
+NULO = _TramoNulo()
+
+_actual: ContextVar[Optional[Tramo]] = ContextVar("tramo_actual", default=None)
+
+
+def _leer_traceparent(valor: Text) -> Optional[Tuple[Text, Text, bool]]:
+    partes = valor.split("-")
+    if len(partes) != 4 or len(partes[1]) != 32 or len(partes[2]) != 16:
+        return None
+    return partes[1], partes[2], partes[3] == "01"
+
+
+def iniciar(
+    nombre: Text, padre: Union[Tramo, Text, None] = None, **atributos: Any
+) -> Union[Tramo, _TramoNulo]:
+    """Empieza un tramo hijo de `padre`, del tramo actual o, si no hay, una traza nueva.
+
+    `padre` puede ser un traceparent recibido de otro proceso. Las trazas
+    nuevas se muestrean con MUESTREO; las hijas heredan la decisión.
+    """
+    if not ARCHIVO:
+        return NULO
+    if padre is None:
+        padre = _actual.get()
+    if isinstance(padre, Tramo):
+        return Tramo(nombre, padre.traza, padre.id, padre.muestreado, atributos)
+    contexto = _leer_traceparent(padre) if padre else None
+    if contexto is not None:
+        traza, id_padre, muestreado = contexto
+        return Tramo(nombre, traza, id_padre, muestreado, atributos)
+    return Tramo(nombre, secrets.token_hex(16), None, random.random() < MUESTREO, atributos)
+
+
+def traceparent_de(tracker: Any) -> Optional[Text]:
+    """Contexto que el canal dejó en la metadata del último mensaje del usuario"""
+    metadata = tracker.latest_message.get("metadata") or {}
+    if CLAVE_METADATA not in metadata:
+        for evento in reversed(tracker.events):
+            if evento.get("event") == "user":
+                metadata = evento.get("metadata") or {}
+                break
+    return metadata.get(CLAVE_METADATA)
+
+
+class _Exportador:
+    """Escribe los tramos terminados en ARCHIVO desde un hilo aparte"""
+
+    def __init__(self, ruta: Text) -> None:
+        self.ruta = ruta
+        self.cola: "queue.Queue[Optional[Tramo]]" = queue.Queue(TAMANO_COLA)
+        self.descartados = 0
+        self._hilo = threading.Thread(target=self._escribir, name="trazas", daemon=True)
+        self._hilo.start()
+        atexit.register(self.cerrar)
+
+    def exportar(self, tramo: Tramo) -> None:
+        try:
+            self.cola.put_nowait(tramo)
+        except queue.Full:
+            self.descartados += 1
+
+    def _escribir(self) -> None:
+        with open(self.ruta, "a", encoding="utf-8") as archivo:
+            while True:
+                tramo = self.cola.get()
+                if tramo is None:
+                    return
+                archivo.write(json.dumps(tramo.a_dict(), ensure_ascii=False, default=str) + "\n")
+                if self.cola.empty():
+                    archivo.flush()
+
+    def cerrar(self) -> None:
+        try:
+            self.cola.put(None, timeout=2)
+        except queue.Full:
+            return
+        self._hilo.join(timeout=2)
+
+
+_exportador: Optional[_Exportador] = None
+
+
+def _exportar(tramo: Tramo) -> None:
+    global _exportador
+    if _exportador is None:
+        _exportador = _Exportador(ARCHIVO)
+    _exportador.exportar(tramo)
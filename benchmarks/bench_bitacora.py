@@ -0,0 +1,55 @@
+import io
+import logging
+import os
+import sys
+import timeit
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from actions.bitacora import obtener_logger, redactar  # noqa: E402
+
+REPETICIONES = 5
+NUMERO = 20000
+
+DATOS = {
+    "id_usuario": 42, "Day_of_Week": 1, "Junction_Control": 2, "Junction_Detail": 0,
+    "Light_Conditions": 0, "Local_Authority_(District)": 76, "Road_Surface_Conditions": 1,
+    "Road_Type": 2, "Speed_limit": 100, "Urban_or_Rural_Area": 0, "Weather_Conditions": 2,
+    "Vehicle_Type": 1, "Number_of_Casualties": 1, "Number_of_Vehicles": 2,
+}
+
+
+def anterior():
+    """Lo que hacía ActionPrediccion en cada turno: print con f-string a stdout"""
+    print(f"📊 DEBUG PREDICCIÓN - id_usuario del slot: '{42}' (tipo: {type(42)})")
+    print(f"📊 DEBUG PREDICCIÓN - Datos completos: {DATOS}")
+
+
+def medir(funcion):
+    tiempos = timeit.repeat(funcion, number=NUMERO, repeat=REPETICIONES)
+    return min(tiempos) / NUMERO * 1e9
+
+
+if __name__ == "__main__":
+    logger = obtener_logger("actions.bench")
+
+    with redirect_stdout(io.StringIO()):
+        t_print = medir(anterior)
+    logging.getLogger("actions").setLevel(logging.INFO)
+    t_apagado = medir(lambda: logger.debug("Predicción: datos=%s", DATOS))
+
+    print("=" * 60)
+    print("⏱️  BENCHMARK: bitácora de las acciones (ns por evento)")
+    print("=" * 60)
+    print(f"print() con f-string (stdout en memoria): {t_print:8.0f} ns")
+    print(f"logger.debug con DEBUG deshabilitado:     {t_apagado:8.0f} ns")
+    print("\n🔒 Redacción:")
+    for texto in (
+        "usuario='ana', contraseña='s3creta'",
+        "{'usuario': 'ana', 'contraseña': 'hunter2'}",
+        "Authorization: Bearer EAAG1234abcd",
+        "Encolando envío a ana.perez@correo.com",
+    ):
+        print(f"   {texto}  ->  {redactar(texto)}")
+    print("=" * 60)
@@ -0,0 +1,102 @@
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from actions.extraccion import extraer, extraer_credenciales, extraer_email  # noqa: E402
+
+REPETICIONES = 3
+
+
+def credenciales_anterior(texto):
+    """Réplica de ActionLogin.extraer_credenciales antes del cambio"""
+    texto = texto.strip()
+    patrones = [
+        (r'usuario[:\s]+([^\s,]+).*contraseña[:\s]+([^\s,]+)', True),
+        (r'usuario\s+(\S+)\s+contraseña\s+(\S+)', True),
+        (r'user[:\s]+([^\s,]+).*pass[:\s]+([^\s,]+)', True),
+        (r'^(\S+)\s+(\S+)$', False),
+    ]
+    for patron, _ in patrones:
+        match = re.search(patron, texto, re.IGNORECASE)
+        if match:
+            return match.group(1), match.group(2)
+    return None, None
+
+
+def email_anterior(texto):
+    """Réplica de ActionEnviarHistorial.extraer_email antes del cambio"""
+    match = re.search(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', texto)
+    return match.group(0) if match else None
+
+
+NORMALES = [
+    "usuario: ana, contraseña: s3creta",
+    "Usuario ana Contraseña s3creta",
+    "user: ana pass: s3creta",
+    "ana s3creta",
+    "envíalo a ana.perez@correo.com por favor",
+]
+
+# Formas unidas por comas: solo se comprueba que den lo mismo que antes
+CON_COMAS = [
+    "usuario:ana,contraseña:1234",
+    "usuario: ana,contraseña: 1234",
+    "Usuario:Ana,Contraseña:1234",
+    "usuario ana,contraseña 1234",
+    "usuario: ana , contraseña: 1234",
+    "user:ana,pass:1234",
+    "foo@bar.com,baz",
+    "mi correo es ana@correo.com, gracias",
+]
+
+# Entradas pensadas para disparar backtracking en los patrones anteriores
+ADVERSARIAS = {
+    "'usuario' + espacios sin contraseña": lambda n: "usuario " + " " * n + "x",
+    "'usuario:' repetido": lambda n: "usuario: a " * (n // 11),
+    "'user ' repetido sin pass": lambda n: "user a " * (n // 7),
+    "texto pegado sin '@'": lambda n: "a" * n,
+    "dominio sin TLD": lambda n: "a@" + "a." * (n // 2),
+    "'@' repetido": lambda n: "a@" * (n // 2),
+}
+TAMANOS = (1000, 4000, 16000)
+
+
+def medir(funcion, texto, numero):
+    tiempos = timeit.repeat(lambda: funcion(texto), number=numero, repeat=REPETICIONES)
+    return min(tiempos) / numero * 1e6
+
+
+def anterior(texto):
+    credenciales_anterior(texto)
+    email_anterior(texto)
+
+
+if __name__ == "__main__":
+    print("=" * 78)
+    print("⏱️  BENCHMARK: extracción de credenciales y correo (µs por mensaje)")
+    print("=" * 78)
+    for texto in CON_COMAS:
+        assert credenciales_anterior(texto) == extraer_credenciales(texto), texto
+        assert email_anterior(texto) == extraer_email(texto), texto
+    for texto in NORMALES:
+        if "@" in texto:
+            assert email_anterior(texto) == extraer_email(texto)
+        else:
+            assert credenciales_anterior(texto) == extraer_credenciales(texto)
+        t_anterior = medir(anterior, texto, 20000)
+        t_nuevo = medir(extraer, texto, 20000)
+        print(f"{texto[:40]:<42}{t_anterior:>10.2f}{t_nuevo:>10.2f}{t_anterior / t_nuevo:>9.1f}x")
+
+    print("\n🧨 Entradas adversarias (anterior / nuevo, µs)")
+    print(f"{'caso':<38}" + "".join(f"{n:>13}" for n in TAMANOS))
+    for nombre, generar in ADVERSARIAS.items():
+        celdas = []
+        for n in TAMANOS:
+            texto = generar(n)
+            numero = 3 if n > 4000 else 10
+            celdas.append(f"{medir(anterior, texto, numero):>7.0f}/{medir(extraer, texto, numero):<5.0f}")
+        print(f"{nombre:<38}" + "".join(f"{c:>13}" for c in celdas))
+    print("=" * 78)
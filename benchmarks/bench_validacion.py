@@ -0,0 +1,147 @@
+import os
+import random
+import string
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from actions.difuso import IndiceDifuso  # noqa: E402
+from actions.normalizacion import (  # noqa: E402
+    CLIMA, DIAS_SEMANA, NORMALIZADOR, VICTIMAS
+)
+
+REPETICIONES = 5
+NUMERO = 2000
+
+
+def anterior_tabla(tabla, minimo, maximo):
+    """Camino original de validate_* con tabla: dict exacto + int(float()) en try/except"""
+    def validar(slot_value):
+        texto = str(slot_value).lower().strip()
+        if texto in tabla:
+            return tabla[texto]
+        try:
+            valor = int(float(texto))
+            if minimo <= valor <= maximo:
+                return valor
+        except:  # noqa: E722 (réplica fiel del código original)
+            pass
+        return None
+    return validar
+
+
+def anterior_velocidad(slot_value):
+    """Camino original de validate_speed_limit: lista literal en cada llamada"""
+    texto = str(slot_value).strip()
+    limites_validos = [30, 40, 50, 60, 70, 80, 90, 100, 110, 120]
+    try:
+        valor = int(float(texto))
+        if valor in limites_validos:
+            return valor
+    except:  # noqa: E722
+        pass
+    return None
+
+
+def anterior_victimas(slot_value):
+    """Camino original de validate_casualties: el dict se construía en cada llamada"""
+    texto = str(slot_value).lower().strip()
+    numeros_texto = dict(VICTIMAS)
+    if texto in numeros_texto:
+        return numeros_texto[texto]
+    try:
+        valor = int(float(texto))
+        if valor >= 5:
+            valor = 5
+        if 0 <= valor <= 5:
+            return valor
+    except:  # noqa: E722
+        pass
+    return None
+
+
+CASOS = [
+    # (slot, función anterior, tipo de entrada, valor)
+    ("day_of_week", anterior_tabla(DIAS_SEMANA, 0, 6), "válido", "lunes"),
+    ("day_of_week", anterior_tabla(DIAS_SEMANA, 0, 6), "sinónimo con acento", " Miércoles "),
+    ("day_of_week", anterior_tabla(DIAS_SEMANA, 0, 6), "numérico", "3"),
+    ("day_of_week", anterior_tabla(DIAS_SEMANA, 0, 6), "inválido", "no sé"),
+    ("weather", anterior_tabla(CLIMA, 0, 6), "sinónimo", "lluvia fuerte"),
+    ("weather", anterior_tabla(CLIMA, 0, 6), "inválido", "granizo"),
+    ("speed_limit", anterior_velocidad, "numérico", "100"),
+    ("speed_limit", anterior_velocidad, "inválido", "rápido"),
+    ("casualties", anterior_victimas, "sinónimo", "dos"),
+    ("casualties", anterior_victimas, "numérico (recorte)", "12"),
+]
+
+
+# Entradas que antes obligaban a volver a preguntar
+CASOS_DIFUSOS = [
+    ("junction_control", "semaforos"),
+    ("day_of_week", "lunez"),
+    ("vehicle_type", "motosicleta"),
+    ("weather", "lluvia muy fuerte"),
+    ("road_type", "carretera secundara"),
+    ("vehicle_type", "camoin"),
+    ("weather", "granizo"),
+]
+
+# Respuestas negadas: contienen el sinónimo pero dicen lo contrario. Nunca
+# se aceptan (como mucho se sugiere el sinónimo al volver a preguntar)
+CASOS_NEGADOS = [
+    ("junction_control", "no hay semaforo"),
+    ("road_surface", "no estaba mojado"),
+    ("urban_rural", "no es rural"),
+    ("weather", "nada de viento"),
+    ("light_conditions", "no era de dia"),
+]
+
+TAMANOS_VOCABULARIO = (100, 1000, 10000)
+
+
+def vocabulario_sintetico(tamano):
+    azar = random.Random(7)
+    return {
+        "".join(azar.choice(string.ascii_lowercase) for _ in range(azar.randint(4, 14))): i % 7
+        for i in range(tamano)
+    }
+
+
+def medir(funcion):
+    tiempos = timeit.repeat(funcion, number=NUMERO, repeat=REPETICIONES)
+    return min(tiempos) / NUMERO * 1e9
+
+
+if __name__ == "__main__":
+    print("=" * 72)
+    print("⏱️  BENCHMARK: normalización de slots (ns por validación)")
+    print("=" * 72)
+    print(f"{'slot':<14}{'entrada':<22}{'anterior':>12}{'nuevo':>12}{'mejora':>10}")
+    for slot, anterior, tipo, valor in CASOS:
+        t_anterior = medir(lambda: anterior(valor))
+        t_nuevo = medir(lambda: NORMALIZADOR.normalizar(slot, valor))
+        print(f"{slot:<14}{tipo:<22}{t_anterior:>12.0f}{t_nuevo:>12.0f}{t_anterior / t_nuevo:>9.1f}x")
+
+    print("\n🔎 Resolución aproximada (µs por validación)")
+    print(f"{'slot':<18}{'entrada':<22}{'resultado':<22}{'µs':>8}")
+    for slot, valor in CASOS_DIFUSOS:
+        resultado = NORMALIZADOR.resolver(slot, valor)
+        t = medir(lambda: NORMALIZADOR.resolver(slot, valor)) / 1000
+        print(f"{slot:<18}{valor:<22}{str(resultado):<22}{t:>8.1f}")
+
+    print("\n🚫 Respuestas negadas (deben quedar sin valor)")
+    for slot, valor in CASOS_NEGADOS:
+        resultado = NORMALIZADOR.resolver(slot, valor)
+        assert resultado[0] is None, (slot, valor, resultado)
+        t = medir(lambda: NORMALIZADOR.resolver(slot, valor)) / 1000
+        print(f"{slot:<18}{valor:<22}{str(resultado):<22}{t:>8.1f}")
+
+    print("\n📈 Crecimiento con el vocabulario (µs por búsqueda con error de tipeo)")
+    for tamano in TAMANOS_VOCABULARIO:
+        vocabulario = vocabulario_sintetico(tamano)
+        indice = IndiceDifuso(vocabulario)
+        consulta = next(iter(vocabulario))[:-1] + "x"
+        t = medir(lambda: indice.buscar(consulta)) / 1000
+        print(f"   {tamano:>6} sinónimos: {t:8.1f} µs")
+    print("=" * 72)
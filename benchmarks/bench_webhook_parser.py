@@ -0,0 +1,116 @@
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from channels.webhook_parser import parse_webhook  # noqa: E402
+
+REPETICIONES = 5
+NUMERO = 2000
+
+
+def mensaje_texto(i):
+    return {
+        "from": f"5730000{i:05d}",
+        "id": f"wamid.HBgMNTczMDAwMDAwMDAwFQIAEhgg{i:08d}",
+        "timestamp": "1700000000",
+        "type": "text",
+        "text": {"body": "lunes, moto, lluvia intensa, autopista, 100"},
+    }
+
+
+def mensaje_boton(i):
+    return {
+        "from": f"5730000{i:05d}",
+        "id": f"wamid.HBgMNTczMDAwMDAwMDAwFQIAEhgg{i:08d}",
+        "timestamp": "1700000000",
+        "type": "interactive",
+        "interactive": {
+            "type": "button_reply",
+            "button_reply": {"id": "btn_si", "title": "Sí"},
+        },
+    }
+
+
+def payload(mensajes=None, estados=None):
+    valor = {
+        "messaging_product": "whatsapp",
+        "metadata": {"display_phone_number": "15550000000", "phone_number_id": "1234567890"},
+    }
+    if mensajes:
+        valor["contacts"] = [{"profile": {"name": "Usuario Prueba"}, "wa_id": "573000000000"}]
+        valor["messages"] = mensajes
+    if estados:
+        valor["statuses"] = estados
+    return json.dumps({
+        "object": "whatsapp_business_account",
+        "entry": [{"id": "102290129340398", "changes": [{"value": valor, "field": "messages"}]}],
+    }).encode()
+
+
+def estado(i):
+    return {
+        "id": f"wamid.HBgMNTczMDAwMDAwMDAwFQIAERgS{i:08d}",
+        "status": "delivered",
+        "timestamp": "1700000000",
+        "recipient_id": f"5730000{i:05d}",
+        "conversation": {"id": "c0ffee", "origin": {"type": "service"}},
+        "pricing": {"billable": True, "pricing_model": "CBP", "category": "service"},
+    }
+
+
+ESCENARIOS = {
+    "1 mensaje de texto": payload([mensaje_texto(0)]),
+    "lote de 20 mensajes (texto + botones)": payload(
+        [mensaje_texto(i) if i % 2 else mensaje_boton(i) for i in range(20)]
+    ),
+    "solo estados (5 entregas)": payload(estados=[estado(i) for i in range(5)]),
+}
+
+
+def parser_anterior(body):
+    """Recorrido original de WhatsAppConnector.receive (con el log de depuración)"""
+    payload = json.loads(body)
+    json.dumps(payload, indent=2)
+    resultado = []
+    if "entry" in payload:
+        for entry in payload["entry"]:
+            for change in entry.get("changes", []):
+                value = change.get("value", {})
+                if "messages" in value:
+                    for message in value["messages"]:
+                        sender_id = message.get("from")
+                        text = ""
+                        if message.get("type") == "text":
+                            text = message["text"]["body"]
+                        elif message.get("type") == "button":
+                            text = message["button"]["text"]
+                        elif message.get("type") == "interactive":
+                            if message["interactive"]["type"] == "button_reply":
+                                text = message["interactive"]["button_reply"]["title"]
+                            elif message["interactive"]["type"] == "list_reply":
+                                text = message["interactive"]["list_reply"]["title"]
+                        if sender_id and text:
+                            nombre = value.get("contacts", [{}])[0].get("profile", {}).get("name")
+                            resultado.append((sender_id, text, nombre))
+    return resultado
+
+
+def medir(funcion, body):
+    tiempos = timeit.repeat(lambda: funcion(body), number=NUMERO, repeat=REPETICIONES)
+    return min(tiempos) / NUMERO * 1e6
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("⏱️  BENCHMARK: parser del webhook de WhatsApp (µs por payload)")
+    print("=" * 60)
+    for nombre, body in ESCENARIOS.items():
+        anterior = medir(parser_anterior, body)
+        nuevo = medir(parse_webhook, body)
+        print(f"\n📦 {nombre} ({len(body)} bytes)")
+        print(f"   anterior: {anterior:8.2f} µs")
+        print(f"   nuevo:    {nuevo:8.2f} µs  (x{anterior / nuevo:.1f})")
+    print("\n" + "=" * 60)
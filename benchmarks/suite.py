@@ -0,0 +1,233 @@
+"""Suite de microbenchmarks de los caminos calientes, con línea base.
+
+    python benchmarks/suite.py                                  # solo medir
+    python benchmarks/suite.py --guardar benchmarks/linea_base.json
+    python benchmarks/suite.py --comparar benchmarks/linea_base.json --umbral 1.25
+    python benchmarks/suite.py --filtro validacion/
+
+La línea base es un JSON con el tiempo por llamada de cada caso (el mínimo
+de varias repeticiones, que es lo más estable) y los datos de la máquina.
+Con --comparar, un caso que tarde más de `umbral` veces lo de la línea
+base cuenta como regresión y el proceso termina con código 1. Compara
+solo líneas base tomadas en la misma máquina.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Importar actions.actions abre el endpoint de métricas; aquí no hace falta
+os.environ.setdefault("METRICAS_PUERTO", "")
+
+REPETICIONES = 5
+UMBRAL = 1.25
+
+RESULTADO_API = {
+    "RandomForest": "Leve", "SVM": "Grave", "KNN": "Leve",
+    "MejorModelo": "RandomForest", "Guardado": "Predicción guardada en el historial",
+}
+
+
+def casos_validacion():
+    from rasa_sdk.executor import CollectingDispatcher
+    from actions.validacion import ValidatePrediccionForm
+
+    formulario = ValidatePrediccionForm()
+    dispatcher = CollectingDispatcher()
+    # Los slots numéricos no tienen sinónimos; "errata" y "negado" pasan por
+    # la búsqueda aproximada
+    entradas = {
+        "day_of_week": {
+            "valido": "lunes", "sinonimo": "sab", "numerico": "3", "errata": "lunez", "invalido": "xyzzy",
+        },
+        "junction_control": {
+            "valido": "semáforo", "sinonimo": "glorieta", "numerico": "2",
+            "negado": "no hay semaforo", "invalido": "xyzzy",
+        },
+        "weather": {
+            "valido": "lluvia intensa", "sinonimo": "aguacero", "numerico": "2",
+            "errata": "lluvia intesa", "negado": "nada de viento", "invalido": "xyzzy",
+        },
+        "vehicle_type": {"valido": "moto", "sinonimo": "motorbike", "numerico": "1", "invalido": "xyzzy"},
+        "speed_limit": {"valido": "100", "numerico": "100.0", "invalido": "55"},
+        "local_authority": {"valido": "76", "numerico": "76.0", "invalido": "999"},
+    }
+
+    def caso(validar, valor):
+        def llamar():
+            validar(valor, dispatcher, None, None)
+            # Los inválidos dejan un mensaje; que la lista no crezca sin fin
+            dispatcher.messages.clear()
+        return llamar
+
+    casos = {}
+    for slot, por_tipo in entradas.items():
+        validar = getattr(formulario, f"validate_{slot}")
+        for tipo, valor in por_tipo.items():
+            casos[f"validacion/{slot}/{tipo}"] = caso(validar, valor)
+    return casos
+
+
+def casos_extraccion():
+    from actions.extraccion import extraer_credenciales, extraer_email
+
+    mensajes = {
+        "clave_valor": "usuario: ana, contraseña: s3creta",
+        "sin_claves": "ana s3creta",
+        "frase_larga": "hola buenas, quisiera entrar con mi usuario ana y la contraseña s3creta " * 4,
+    }
+    casos = {
+        f"extraccion/credenciales/{nombre}": (lambda texto=texto: extraer_credenciales(texto))
+        for nombre, texto in mensajes.items()
+    }
+    casos["extraccion/email/frase"] = lambda: extraer_email("envíalo a ana.perez@correo.com por favor")
+    casos["extraccion/email/sin_correo"] = lambda: extraer_email("quiero ver mi historial " * 8)
+    return casos
+
+
+def casos_prediccion():
+    from actions.actions import mensaje_prediccion
+
+    return {
+        "prediccion/mensaje/completo": lambda: mensaje_prediccion(RESULTADO_API),
+        "prediccion/mensaje/sin_campos": lambda: mensaje_prediccion({}),
+    }
+
+
+def casos_webhook():
+    from channels.webhook_parser import parse_webhook
+
+    def cuerpo(mensajes):
+        return json.dumps({
+            "object": "whatsapp_business_account",
+            "entry": [{"id": "0", "changes": [{"field": "messages", "value": {
+                "messaging_product": "whatsapp",
+                "metadata": {"phone_number_id": "123456789"},
+                "contacts": [{"profile": {"name": "Ana"}, "wa_id": "573000000001"}],
+                "messages": mensajes,
+            }}]}],
+        }).encode()
+
+    def texto(i):
+        return {
+            "from": "573000000001", "id": f"wamid.{i:020d}", "timestamp": "1700000000",
+            "type": "text", "text": {"body": "lunes, moto, lluvia intensa, autopista, 100"},
+        }
+
+    estados = json.dumps({
+        "object": "whatsapp_business_account",
+        "entry": [{"id": "0", "changes": [{"field": "messages", "value": {
+            "messaging_product": "whatsapp",
+            "statuses": [{"id": "wamid.1", "status": "delivered", "recipient_id": "573000000001"}],
+        }}]}],
+    }).encode()
+    un_mensaje = cuerpo([texto(0)])
+    diez_mensajes = cuerpo([texto(i) for i in range(10)])
+    return {
+        "webhook/texto": lambda: parse_webhook(un_mensaje),
+        "webhook/lote_10": lambda: parse_webhook(diez_mensajes),
+        "webhook/solo_estados": lambda: parse_webhook(estados),
+    }
+
+
+GRUPOS = [casos_validacion, casos_extraccion, casos_prediccion, casos_webhook]
+
+
+def medir(funcion):
+    """ns por llamada: (mínimo, mediana) de REPETICIONES tandas"""
+    temporizador = timeit.Timer(funcion)
+    # Llamadas por tanda para que cada una dure al menos 0.2 s
+    numero, _ = temporizador.autorange()
+    tiempos = [t / numero * 1e9 for t in temporizador.repeat(REPETICIONES, numero)]
+    return min(tiempos), statistics.median(tiempos)
+
+
+def ejecutar(filtro):
+    resultados = {}
+    for grupo in GRUPOS:
+        try:
+            casos = grupo()
+        except ImportError as e:
+            # p. ej. sin rasa_sdk instalado
+            print(f"⚠️  {grupo.__name__} omitido: {e}")
+            continue
+        for nombre, funcion in casos.items():
+            if filtro and filtro not in nombre:
+                continue
+            minimo, mediana = medir(funcion)
+            resultados[nombre] = {"ns": round(minimo, 1), "mediana_ns": round(mediana, 1)}
+            print(f"{nombre:<48}{minimo:>12.0f}{mediana:>12.0f}")
+    return resultados
+
+
+def comparar(resultados, base, umbral):
+    """Imprime la comparación; devuelve los casos que empeoraron más de `umbral`"""
+    regresiones = []
+    print(f"\n{'caso':<48}{'base ns':>12}{'ahora ns':>12}{'ratio':>9}")
+    for nombre, actual in resultados.items():
+        anterior = base.get(nombre)
+        if anterior is None:
+            print(f"{nombre:<48}{'—':>12}{actual['ns']:>12.0f}{'nuevo':>9}")
+            continue
+        ratio = actual["ns"] / anterior["ns"]
+        marca = ""
+        if ratio > umbral:
+            marca = "  🔴 regresión"
+            regresiones.append(nombre)
+        elif ratio < 1 / umbral:
+            marca = "  🟢 mejora"
+        print(f"{nombre:<48}{anterior['ns']:>12.0f}{actual['ns']:>12.0f}{ratio:>8.2f}x{marca}")
+    for nombre in sorted(set(base) - set(resultados)):
+        print(f"{nombre:<48}{base[nombre]['ns']:>12.0f}{'—':>12}{'omitido':>9}")
+    return regresiones
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Microbenchmarks con línea base")
+    parser.add_argument("--filtro", help="solo casos cuyo nombre contenga este texto")
+    parser.add_argument("--guardar", help="escribe los resultados como línea base JSON")
+    parser.add_argument("--comparar", help="línea base JSON contra la que comparar")
+    parser.add_argument("--umbral", type=float, default=UMBRAL, help="ratio que cuenta como regresión")
+    args = parser.parse_args(argv)
+
+    print("=" * 84)
+    print("⏱️  SUITE DE BENCHMARKS (ns por llamada)")
+    print("=" * 84)
+    print(f"{'caso':<48}{'mínimo':>12}{'mediana':>12}")
+    resultados = ejecutar(args.filtro)
+
+    if args.guardar:
+        with open(args.guardar, "w", encoding="utf-8") as archivo:
+            json.dump({
+                "maquina": {
+                    "python": platform.python_version(),
+                    "implementacion": platform.python_implementation(),
+                    "plataforma": platform.platform(),
+                    "procesador": platform.processor() or platform.machine(),
+                },
+                "fecha": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "resultados": resultados,
+            }, archivo, indent=2, ensure_ascii=False)
+        print(f"\n💾 Línea base en {args.guardar}")
+
+    codigo = 0
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as archivo:
+            base = json.load(archivo)
+        if base.get("maquina", {}).get("python") != platform.python_version():
+            print(f"\n⚠️  Línea base tomada con Python {base.get('maquina', {}).get('python')}")
+        regresiones = comparar(resultados, base["resultados"], args.umbral)
+        if regresiones:
+            print(f"\n🔴 {len(regresiones)} regresiones por encima de {args.umbral}x")
+            codigo = 1
+    print("=" * 84)
+    return codigo
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Text
+
+# Meta retries failed deliveries for a while; a day comfortably covers it
+DEDUPE_TTL_SECONDS = 24 * 3600
+DEDUPE_MAX_SIZE = 100_000
+
+
+class MemoryDedupeStore:
+    """Bounded, time-windowed set of already handled WhatsApp message ids."""
+
+    def __init__(self, ttl: float = DEDUPE_TTL_SECONDS, max_size: int = DEDUPE_MAX_SIZE) -> None:
+        self.ttl = ttl
+        self.max_size = max_size
+        # Insertion order == expiry order, so expired ids are always at the front
+        self._seen: "OrderedDict[Text, float]" = OrderedDict()
+        self.duplicates = 0
+
+    def _evict(self, now: float) -> None:
+        while self._seen:
+            message_id, expires = next(iter(self._seen.items()))
+            if expires > now and len(self._seen) <= self.max_size:
+                break
+            self._seen.popitem(last=False)
+
+    def check_and_mark(self, message_id: Text) -> bool:
+        """Return True if the id was already seen, otherwise remember it."""
+        now = time.monotonic()
+        expires = self._seen.get(message_id)
+        if expires is not None and expires > now:
+            self.duplicates += 1
+            return True
+
+        self._seen[message_id] = now + self.ttl
+        self._seen.move_to_end(message_id)
+        self._evict(now)
+        return False
+
+    def forget(self, message_id: Text) -> None:
+        """Drop an id whose message could not be accepted, so a redelivery is processed."""
+        self._seen.pop(message_id, None)
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+
+class SQLiteDedupeStore:
+    """Dedupe store shared by several server workers through a local SQLite file."""
+
+    PURGE_EVERY = 1000
+
+    def __init__(self, path: Text, ttl: float = DEDUPE_TTL_SECONDS) -> None:
+        self.ttl = ttl
+        self.duplicates = 0
+        self._inserts = 0
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS seen_messages (id TEXT PRIMARY KEY, expires REAL)"
+        )
+
+    def check_and_mark(self, message_id: Text) -> bool:
+        """Return True if the id was already seen, otherwise remember it."""
+        now = time.time()
+        # The primary key makes the insert the atomic test-and-set across workers
+        cursor = self._conn.execute(
+            "INSERT INTO seen_messages (id, expires) VALUES (?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET expires = excluded.expires "
+            "WHERE seen_messages.expires <= ?",
+            (message_id, now + self.ttl, now),
+        )
+        if cursor.rowcount == 0:
+            self.duplicates += 1
+            return True
+
+        self._inserts += 1
+        if self._inserts % self.PURGE_EVERY == 0:
+            self._conn.execute("DELETE FROM seen_messages WHERE expires <= ?", (now,))
+        return False
+
+    def forget(self, message_id: Text) -> None:
+        """Drop an id whose message could not be accepted, so a redelivery is processed."""
+        self._conn.execute("DELETE FROM seen_messages WHERE id = ?", (message_id,))
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM seen_messages").fetchone()[0]
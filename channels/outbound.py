@@ -0,0 +1,165 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Mapping, Optional, Text, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Cloud API default throughput per business phone number (messages/second)
+MESSAGES_PER_SECOND = 80
+BURST_SIZE = 80
+
+# WhatsApp rejects text bodies longer than this
+MAX_TEXT_LENGTH = 4096
+COALESCE_SEPARATOR = "\n\n"
+
+MAX_RATE_LIMIT_RETRIES = 5
+DEFAULT_RETRY_AFTER = 1.0
+
+# (status, headers) returned by the function that performs the HTTP POST.
+# Header lookups must be case-insensitive (aiohttp's CIMultiDictProxy):
+# HTTP/2 proxies send "retry-after" in lowercase.
+SendResult = Tuple[int, Mapping[Text, Text]]
+SendFunction = Callable[[Dict[Text, Any]], Awaitable[SendResult]]
+
+
+class TokenBucket:
+    """Token bucket for one phone number; 429 responses pause it entirely."""
+
+    def __init__(self, rate: float = MESSAGES_PER_SECOND, capacity: float = BURST_SIZE) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+
+    def pause(self, seconds: float) -> None:
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0.0
+
+    async def acquire(self) -> None:
+        while True:
+            now = time.monotonic()
+            if now < self._paused_until:
+                await asyncio.sleep(self._paused_until - now)
+                continue
+
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class _Outgoing:
+    __slots__ = ("payload", "text")
+
+    def __init__(self, payload: Dict[Text, Any], text: Optional[Text]) -> None:
+        self.payload = payload
+        # Only plain text messages can be merged with their neighbours
+        self.text = text
+
+
+class OutboundScheduler:
+    """Rate-limit-aware sender for Graph API messages.
+
+    Messages are queued per recipient and drained by one task per recipient,
+    which keeps their order. Consecutive queued text messages to the same
+    recipient are coalesced into one message when `coalesce_text` is on.
+    All recipients of a phone number share its token bucket, and a 429
+    pauses the bucket for the time given in Retry-After.
+    """
+
+    def __init__(self, send: SendFunction, coalesce_text: bool = True) -> None:
+        self._send = send
+        self.coalesce_text = coalesce_text
+        self._buckets: Dict[Text, TokenBucket] = {}
+        self._queues: Dict[Text, Deque[_Outgoing]] = {}
+        self._drainers: Dict[Text, asyncio.Task] = {}
+        self.stats = {"sent": 0, "coalesced": 0, "rate_limited": 0, "failed": 0}
+
+    def submit(
+        self,
+        phone_number_id: Text,
+        recipient_id: Text,
+        payload: Dict[Text, Any],
+        text: Optional[Text] = None,
+    ) -> None:
+        """Queue a message; delivery happens in the recipient's drain task."""
+        self._queues.setdefault(recipient_id, deque()).append(_Outgoing(payload, text))
+
+        drainer = self._drainers.get(recipient_id)
+        if drainer is None or drainer.done():
+            self._drainers[recipient_id] = asyncio.create_task(
+                self._drain(phone_number_id, recipient_id)
+            )
+
+    def _next_batch(self, queue: Deque[_Outgoing]) -> Dict[Text, Any]:
+        item = queue.popleft()
+        if not self.coalesce_text or item.text is None:
+            return item.payload
+
+        texts = [item.text]
+        length = len(item.text)
+        while queue and queue[0].text is not None:
+            following = queue[0].text
+            length += len(COALESCE_SEPARATOR) + len(following)
+            if length > MAX_TEXT_LENGTH:
+                break
+            texts.append(queue.popleft().text)
+
+        if len(texts) == 1:
+            return item.payload
+        self.stats["coalesced"] += len(texts) - 1
+        payload = dict(item.payload)
+        payload["text"] = {"body": COALESCE_SEPARATOR.join(texts)}
+        return payload
+
+    async def _drain(self, phone_number_id: Text, recipient_id: Text) -> None:
+        bucket = self._buckets.setdefault(phone_number_id, TokenBucket())
+        queue = self._queues[recipient_id]
+        try:
+            while queue:
+                await self._deliver(bucket, self._next_batch(queue))
+        finally:
+            if not queue:
+                self._queues.pop(recipient_id, None)
+                self._drainers.pop(recipient_id, None)
+
+    async def _deliver(self, bucket: TokenBucket, payload: Dict[Text, Any]) -> None:
+        retry_after = DEFAULT_RETRY_AFTER
+        for _ in range(MAX_RATE_LIMIT_RETRIES + 1):
+            await bucket.acquire()
+            try:
+                status, headers = await self._send(payload)
+            except Exception as e:
+                self.stats["failed"] += 1
+                logger.error(f"Failed to send message: {e}")
+                return
+
+            if status != 429:
+                if status >= 400:
+                    self.stats["failed"] += 1
+                    logger.error(f"Failed to send message: Graph API status {status}")
+                else:
+                    self.stats["sent"] += 1
+                return
+
+            self.stats["rate_limited"] += 1
+            try:
+                wait = float(headers.get("Retry-After", retry_after))
+            except ValueError:
+                wait = retry_after
+            logger.warning(f"Graph API rate limit hit, pausing sends for {wait}s")
+            bucket.pause(wait)
+            retry_after *= 2
+
+        self.stats["failed"] += 1
+        logger.error("Giving up on message after repeated rate limiting")
+
+    async def flush(self) -> None:
+        """Wait until every queued message has been handled."""
+        while self._drainers:
+            await asyncio.gather(*list(self._drainers.values()), return_exceptions=True)
@@ -0,0 +1,96 @@
+import json
+import re
+from typing import Any, List, Optional, Text
+
+try:
+    import orjson
+
+    _loads = orjson.loads
+except ImportError:  # optional speed-up
+    _loads = json.loads
+
+# Status-only updates (sent/delivered/read) never carry a "messages" key, so
+# they can be acknowledged without decoding the body at all. The colon keeps
+# `"field": "messages"` from matching.
+_MESSAGES_KEY = re.compile(rb'"messages"\s*:')
+
+
+class InvalidPayload(ValueError):
+    """The webhook body is empty or not a JSON object."""
+
+
+class InboundMessage:
+    """A user message extracted from a webhook payload."""
+
+    __slots__ = ("message_id", "sender_id", "text", "profile_name")
+
+    def __init__(
+        self,
+        message_id: Optional[Text],
+        sender_id: Text,
+        text: Text,
+        profile_name: Optional[Text],
+    ) -> None:
+        self.message_id = message_id
+        self.sender_id = sender_id
+        self.text = text
+        self.profile_name = profile_name
+
+    def __repr__(self) -> Text:
+        return f"InboundMessage({self.message_id!r}, {self.sender_id!r}, {self.text!r})"
+
+
+def _message_text(message: Any) -> Text:
+    kind = message.get("type")
+    if kind == "text":
+        return message["text"]["body"]
+    if kind == "button":
+        return message["button"]["text"]
+    if kind == "interactive":
+        interactive = message["interactive"]
+        reply_type = interactive.get("type")
+        if reply_type in ("button_reply", "list_reply"):
+            return interactive[reply_type]["title"]
+    return ""
+
+
+def parse_webhook(body: bytes) -> List[InboundMessage]:
+    """Turn a raw webhook body into the user messages it carries.
+
+    Raises InvalidPayload for empty or malformed bodies. Messages without a
+    sender or without text (images, reactions, ...) are skipped.
+    """
+    if not body:
+        raise InvalidPayload("Empty body")
+    if not _MESSAGES_KEY.search(body):
+        return []
+
+    try:
+        payload = _loads(body)
+    except ValueError as e:
+        raise InvalidPayload(str(e)) from e
+    if not isinstance(payload, dict):
+        raise InvalidPayload("Payload is not a JSON object")
+
+    messages: List[InboundMessage] = []
+    for entry in payload.get("entry") or ():
+        for change in entry.get("changes") or ():
+            value = change.get("value")
+            if not value:
+                continue
+            raw_messages = value.get("messages")
+            if not raw_messages:
+                continue
+
+            # The contact profile is per change, not per message
+            contacts = value.get("contacts")
+            profile_name = (contacts[0].get("profile") or {}).get("name") if contacts else None
+
+            for message in raw_messages:
+                sender_id = message.get("from")
+                text = _message_text(message)
+                if sender_id and text:
+                    messages.append(
+                        InboundMessage(message.get("id"), sender_id, text, profile_name)
+                    )
+    return messages
@@ -1,15 +1,67 @@
+import asyncio
+import hashlib
+import hmac
 import logging
-import json
+import time
+import zlib
 from typing import Text, List, Any, Dict, Optional, Callable, Awaitable
 
 from rasa.core.channels.channel import InputChannel, OutputChannel, UserMessage
 from sanic import Blueprint, response
 from sanic.request import Request
 from sanic.response import HTTPResponse
-import requests
+import aiohttp
+
+from actions import trazas
+from actions.metricas import REGISTRO, TIPO_CONTENIDO
+from channels.dedupe import MemoryDedupeStore, SQLiteDedupeStore
+from channels.outbound import OutboundScheduler, SendResult
+from channels.webhook_parser import InvalidPayload, parse_webhook
 
 logger = logging.getLogger(__name__)
 
+# Outbound connection pool to graph.facebook.com, shared by every reply
+GRAPH_API_POOL_SIZE = 50
+GRAPH_API_KEEPALIVE = 60
+GRAPH_API_TIMEOUT = aiohttp.ClientTimeout(total=30, connect=10)
+
+# Inbound processing: messages are sharded by sender over a fixed set of
+# consumer tasks, so each sender is handled in order while different
+# senders run concurrently. Queues are bounded to apply backpressure.
+MESSAGE_WORKERS = 8
+MESSAGE_QUEUE_SIZE = 100
+ENQUEUE_TIMEOUT = 2.0
+
+GRAPH_API_URL = "https://graph.facebook.com/v17.0"
+
+# Metrics for this process (the Rasa server), scraped at GET /webhooks/whatsapp/metrics.
+# The route only exists when the `metrics_token` credential is set, and
+# scrapers must send it as a bearer token: the webhook is public.
+WEBHOOK_MESSAGES = REGISTRO.contador(
+    "whatsapp_webhook_messages_total",
+    "Inbound messages by outcome (accepted, duplicate or rejected when the queue is full)",
+    ("outcome",),
+)
+TURN_DURATION = REGISTRO.histograma(
+    "whatsapp_turn_duration_seconds",
+    "Time to process one inbound message, from dequeue until Rasa finishes the turn",
+)
+QUEUE_WAIT = REGISTRO.histograma(
+    "whatsapp_queue_wait_seconds", "Time an inbound message waits in its shard queue"
+)
+SEND_DURATION = REGISTRO.histograma(
+    "whatsapp_send_duration_seconds", "Graph API POST latency"
+)
+SEND_RESULTS = REGISTRO.contador(
+    "whatsapp_send_total", "Graph API POSTs by HTTP status (or error)", ("status",)
+)
+
+
+def sender_hash(sender_id: Text) -> Text:
+    """Pseudonymous sender id for spans: phone numbers never reach the trace files."""
+    return hashlib.sha256(sender_id.encode("utf-8")).hexdigest()[:12]
+
+
 class WhatsAppConnector(InputChannel):
     """A custom connector for WhatsApp Cloud API."""
 
@@ -23,11 +75,34 @@ class WhatsAppConnector(InputChannel):
         app_secret: Text,
         page_access_token: Text,
         phone_number_id: Text,
+        dedupe_sqlite_path: Optional[Text] = None,
+        coalesce_messages: bool = True,
+        graph_api_url: Text = GRAPH_API_URL,
+        metrics_token: Optional[Text] = None,
     ) -> None:
         self.verify_token = verify_token
+        self.metrics_token = metrics_token
         self.app_secret = app_secret
         self.page_access_token = page_access_token
         self.phone_number_id = phone_number_id
+        if not app_secret:
+            logger.warning(
+                "WhatsApp app_secret is not set: webhook signatures will not be "
+                "verified and anyone can post messages as any sender"
+            )
+        # One output channel (and HTTP pool) per connector, not per message
+        self.output_channel = WhatsAppOutput(
+            page_access_token, phone_number_id, coalesce_messages, graph_api_url
+        )
+        self._queues: List[asyncio.Queue] = []
+        self._workers: List[Optional[asyncio.Task]] = []
+        # Meta redelivers payloads on slow or failed responses; remember the
+        # message ids already accepted (SQLite when several workers share them)
+        self.dedupe = (
+            SQLiteDedupeStore(dedupe_sqlite_path)
+            if dedupe_sqlite_path
+            else MemoryDedupeStore()
+        )
 
     @classmethod
     def from_credentials(cls, credentials: Optional[Dict[Text, Any]]) -> "WhatsAppConnector":
@@ -40,8 +115,67 @@ class WhatsAppConnector(InputChannel):
             app_secret=credentials.get("app_secret"),
             page_access_token=credentials.get("page_access_token"),
             phone_number_id=credentials.get("phone_number_id"),
+            dedupe_sqlite_path=credentials.get("dedupe_sqlite_path"),
+            coalesce_messages=credentials.get("coalesce_messages", True),
+            graph_api_url=credentials.get("graph_api_url", GRAPH_API_URL),
+            metrics_token=credentials.get("metrics_token"),
         )
 
+    def _signature_valid(self, body: bytes, header: Optional[Text]) -> bool:
+        """Check Meta's X-Hub-Signature-256 (HMAC-SHA256 of the raw body)."""
+        if not self.app_secret:
+            return True
+        if not header or not header.startswith("sha256="):
+            return False
+        expected = hmac.new(self.app_secret.encode(), body, hashlib.sha256).hexdigest()
+        return hmac.compare_digest(header[len("sha256="):].encode(), expected.encode())
+
+    def _start_workers(
+        self, on_new_message: Callable[[UserMessage], Awaitable[Any]]
+    ) -> None:
+        """Start the consumer tasks on the server's event loop (first use)."""
+        if not self._queues:
+            self._queues = [
+                asyncio.Queue(maxsize=MESSAGE_QUEUE_SIZE) for _ in range(MESSAGE_WORKERS)
+            ]
+            self._workers = [None] * MESSAGE_WORKERS
+        for i, queue in enumerate(self._queues):
+            worker = self._workers[i]
+            if worker is None or worker.done():
+                self._workers[i] = asyncio.create_task(self._consume(queue, on_new_message))
+
+    async def _consume(
+        self,
+        queue: asyncio.Queue,
+        on_new_message: Callable[[UserMessage], Awaitable[Any]],
+    ) -> None:
+        while True:
+            message, enqueued_at, turn = await queue.get()
+            started = time.perf_counter()
+            QUEUE_WAIT.observar(started - enqueued_at)
+            turn.anotar("queue_wait", started - enqueued_at)
+            try:
+                # Graph API sends started during the turn become its children
+                with turn:
+                    await on_new_message(message)
+            except Exception:
+                logger.exception(f"Error processing message from {message.sender_id}")
+            finally:
+                TURN_DURATION.observar(time.perf_counter() - started)
+                queue.task_done()
+
+    async def _enqueue(self, message: UserMessage, turn: Any) -> bool:
+        """Queue a message on its sender's shard; False if the shard stays full."""
+        shard = zlib.crc32(message.sender_id.encode()) % len(self._queues)
+        try:
+            await asyncio.wait_for(
+                self._queues[shard].put((message, time.perf_counter(), turn)), ENQUEUE_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            logger.warning(f"Inbound queue {shard} full, rejecting message from {message.sender_id}")
+            return False
+        return True
+
     def blueprint(
         self, on_new_message: Callable[[UserMessage], Awaitable[Any]]
     ) -> Blueprint:
@@ -51,6 +185,17 @@ class WhatsAppConnector(InputChannel):
         async def health(request: Request) -> HTTPResponse:
             return response.json({"status": "ok"})
 
+        if self.metrics_token:
+
+            @custom_webhook.route("/metrics", methods=["GET"])
+            async def metrics(request: Request) -> HTTPResponse:
+                expected = f"Bearer {self.metrics_token}"
+                if not hmac.compare_digest(
+                    request.headers.get("Authorization", "").encode(), expected.encode()
+                ):
+                    return response.text("Unauthorized", status=401)
+                return response.text(REGISTRO.exponer(), content_type=TIPO_CONTENIDO)
+
         @custom_webhook.route("/webhook", methods=["GET"])
         async def verify(request: Request) -> HTTPResponse:
             """Verification for Facebook/WhatsApp webhook."""
@@ -63,73 +208,138 @@ class WhatsAppConnector(InputChannel):
         @custom_webhook.route("/webhook", methods=["POST"])
         async def receive(request: Request) -> HTTPResponse:
             """Receive messages from WhatsApp."""
-            payload = request.json
-            
-            # Log incoming payload for debugging
-            logger.debug(f"Received payload: {json.dumps(payload, indent=2)}")
+            # The sender id is what restores a logged-in session, so only
+            # payloads signed by Meta may speak for it
+            if not self._signature_valid(
+                request.body, request.headers.get("X-Hub-Signature-256")
+            ):
+                logger.warning("Rejecting webhook POST with a missing or invalid signature")
+                return response.text("Invalid signature", status=403)
 
-            if not payload:
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Received payload: %s", request.body.decode("utf-8", "replace"))
+
+            try:
+                messages = parse_webhook(request.body)
+            except InvalidPayload:
                 return response.text("No payload", status=400)
 
-            # Check if this is a WhatsApp status update or message
-            if "entry" in payload:
-                for entry in payload["entry"]:
-                    for change in entry.get("changes", []):
-                        value = change.get("value", {})
-                        
-                        if "messages" in value:
-                            for message in value["messages"]:
-                                sender_id = message.get("from")
-                                text = ""
-                                
-                                if message.get("type") == "text":
-                                    text = message["text"]["body"]
-                                elif message.get("type") == "button":
-                                    text = message["button"]["text"]
-                                elif message.get("type") == "interactive":
-                                    if message["interactive"]["type"] == "button_reply":
-                                        text = message["interactive"]["button_reply"]["title"]
-                                    elif message["interactive"]["type"] == "list_reply":
-                                        text = message["interactive"]["list_reply"]["title"]
-                                
-                                if sender_id and text:
-                                    out_channel = WhatsAppOutput(
-                                        self.page_access_token,
-                                        self.phone_number_id
-                                    )
-                                    
-                                    await on_new_message(
-                                        UserMessage(
-                                            text,
-                                            out_channel,
-                                            sender_id,
-                                            input_channel=self.name(),
-                                            metadata={"name": value.get("contacts", [{}])[0].get("profile", {}).get("name")}
-                                        )
-                                    )
+            if messages:
+                self._start_workers(on_new_message)
+
+            for message in messages:
+                if message.message_id and self.dedupe.check_and_mark(message.message_id):
+                    logger.debug("Skipping duplicate message %s", message.message_id)
+                    WEBHOOK_MESSAGES.inc("duplicate")
+                    continue
+
+                # The turn span runs until Rasa finishes with the message; the
+                # action server picks up its traceparent from the metadata
+                turn = trazas.iniciar("whatsapp.turn", sender_hash=sender_hash(message.sender_id))
+                metadata = {"name": message.profile_name}
+                traceparent = turn.traceparent()
+                if traceparent:
+                    metadata[trazas.CLAVE_METADATA] = traceparent
+                accepted = await self._enqueue(
+                    UserMessage(
+                        message.text,
+                        self.output_channel,
+                        message.sender_id,
+                        input_channel=self.name(),
+                        metadata=metadata
+                    ),
+                    turn,
+                )
+                if not accepted:
+                    WEBHOOK_MESSAGES.inc("rejected")
+                    turn.anotar("rejected", True)
+                    turn.terminar()
+                    # Meta redelivers on non-2xx responses
+                    if message.message_id:
+                        self.dedupe.forget(message.message_id)
+                    return response.text("Busy", status=503)
+                WEBHOOK_MESSAGES.inc("accepted")
 
             return response.text("EVENT_RECEIVED")
 
         return custom_webhook
 
+    def get_output_channel(self) -> Optional[OutputChannel]:
+        """Output channel used for proactive messages (e.g. trigger_intent)."""
+        return self.output_channel
+
 
 class WhatsAppOutput(OutputChannel):
     """Output channel for WhatsApp Cloud API."""
 
-    def __init__(self, page_access_token: Text, phone_number_id: Text) -> None:
+    @classmethod
+    def name(cls) -> Text:
+        return "whatsapp"
+
+    def __init__(
+        self,
+        page_access_token: Text,
+        phone_number_id: Text,
+        coalesce_messages: bool = True,
+        graph_api_url: Text = GRAPH_API_URL,
+    ) -> None:
         self.page_access_token = page_access_token
         self.phone_number_id = phone_number_id
-        self.api_url = f"https://graph.facebook.com/v17.0/{self.phone_number_id}/messages"
+        self.api_url = f"{graph_api_url.rstrip('/')}/{self.phone_number_id}/messages"
+        self.headers = {
+            "Authorization": f"Bearer {self.page_access_token}",
+            "Content-Type": "application/json",
+        }
+        self._session: Optional[aiohttp.ClientSession] = None
+        # Per-recipient ordering, text coalescing and rate limiting
+        self.scheduler = OutboundScheduler(self._post, coalesce_text=coalesce_messages)
+        REGISTRO.calculada(
+            "whatsapp_outbound_messages_total",
+            "Outbound scheduler results (sent, coalesced, rate_limited, failed)",
+            lambda: dict(self.scheduler.stats), etiqueta="result", tipo="counter",
+        )
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Lazily create the pooled keep-alive session on the server's event loop."""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=GRAPH_API_POOL_SIZE, keepalive_timeout=GRAPH_API_KEEPALIVE
+                ),
+                headers=self.headers,
+                timeout=GRAPH_API_TIMEOUT,
+            )
+        return self._session
+
+    async def close(self) -> None:
+        await self.scheduler.flush()
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def _post(self, data: Dict[Text, Any]) -> SendResult:
+        started = time.perf_counter()
+        span = trazas.iniciar("graph POST", type=data.get("type"))
+        try:
+            async with self._get_session().post(self.api_url, json=data) as resp:
+                SEND_RESULTS.inc(str(resp.status))
+                span.anotar("status", resp.status)
+                if resp.status >= 400:
+                    body = await resp.text()
+                    logger.error(f"Graph API error {resp.status}: {body}")
+                return resp.status, resp.headers
+        except Exception as e:
+            SEND_RESULTS.inc("error")
+            span.terminar(e)
+            raise
+        finally:
+            span.terminar()
+            SEND_DURATION.observar(time.perf_counter() - started)
 
     async def send_text_message(
         self, recipient_id: Text, text: Text, **kwargs: Any
     ) -> None:
         """Send a text message."""
-        headers = {
-            "Authorization": f"Bearer {self.page_access_token}",
-            "Content-Type": "application/json",
-        }
-        
         data = {
             "messaging_product": "whatsapp",
             "recipient_type": "individual",
@@ -138,27 +348,14 @@ class WhatsAppOutput(OutputChannel):
             "text": {"body": text}
         }
 
-        try:
-            response = requests.post(self.api_url, headers=headers, json=data)
-            response.raise_for_status()
-        except Exception as e:
-            logger.error(f"Failed to send message: {e}")
+        self.scheduler.submit(self.phone_number_id, recipient_id, data, text=text)
 
     async def send_custom_json(
         self, recipient_id: Text, json_message: Dict[Text, Any], **kwargs: Any
     ) -> None:
         """Send a custom JSON payload (for buttons, lists, etc)."""
-        headers = {
-            "Authorization": f"Bearer {self.page_access_token}",
-            "Content-Type": "application/json",
-        }
-        
         # Ensure mandatory fields
         json_message["messaging_product"] = "whatsapp"
         json_message["to"] = recipient_id
         
-        try:
-            response = requests.post(self.api_url, headers=headers, json=json_message)
-            response.raise_for_status()
-        except Exception as e:
-            logger.error(f"Failed to send custom json: {e}")
+        self.scheduler.submit(self.phone_number_id, recipient_id, json_message)
@@ -0,0 +1,186 @@
+"""Sustituto local de la API Flask de Render para pruebas de carga.
+
+Responde /login, /register, /predict, /enviar_historial (y el lote de
+API_PREDICT_BATCH_PATH) con el mismo formato que la API real, con una
+latencia log-normal y una tasa de errores configurables:
+
+    python -m pruebas_carga.backend_falso --puerto 5057 --latencia-ms 250 --errores 0.02
+    python -m pruebas_carga.backend_falso --latencia-ruta /predict=800 --colgadas 0.01
+
+El servidor de acciones se apunta a él con API_BASE_URL=http://localhost:5057.
+"""
+from typing import Any, Dict, List, Optional, Text, Tuple
+import argparse
+import asyncio
+import hashlib
+import math
+import random
+
+from aiohttp import web
+
+RESULTADOS = ("Leve", "Grave", "Fatal")
+MODELOS = ("RandomForest", "SVM", "KNN")
+CAMPOS_PREDICCION = (
+    "id_usuario", "Day_of_Week", "Junction_Control", "Junction_Detail", "Light_Conditions",
+    "Local_Authority_(District)", "Road_Surface_Conditions", "Road_Type", "Speed_limit",
+    "Urban_or_Rural_Area", "Weather_Conditions", "Vehicle_Type", "Number_of_Casualties",
+    "Number_of_Vehicles",
+)
+RUTA_LOTE = "/predict_lote"
+
+
+class Perfil:
+    """Latencia y fallos simulados de una ruta.
+
+    La latencia sigue una log-normal con la mediana dada: `dispersion` 0 la
+    hace constante y 0.5 deja el p95 en ~2.3 veces la mediana. Una fracción
+    `errores` responde 500 y una fracción `colgadas` no responde en
+    `colgada_s` segundos, para ejercitar timeouts y el circuito.
+    """
+
+    __slots__ = ("mediana", "dispersion", "errores", "colgadas", "colgada_s")
+
+    def __init__(
+        self,
+        mediana_ms: float = 250.0,
+        dispersion: float = 0.5,
+        errores: float = 0.0,
+        colgadas: float = 0.0,
+        colgada_s: float = 120.0,
+    ) -> None:
+        self.mediana = mediana_ms / 1000.0
+        self.dispersion = dispersion
+        self.errores = errores
+        self.colgadas = colgadas
+        self.colgada_s = colgada_s
+
+    def latencia(self) -> float:
+        return self.mediana * math.exp(self.dispersion * random.gauss(0.0, 1.0))
+
+    async def esperar(self) -> Optional[int]:
+        """Duerme lo que tocaría responder; devuelve 500 si la respuesta es un error"""
+        azar = random.random()
+        if azar < self.colgadas:
+            await asyncio.sleep(self.colgada_s)
+        await asyncio.sleep(self.latencia())
+        if azar < self.colgadas + self.errores:
+            return 500
+        return None
+
+
+class BackendFalso:
+    """Usuarios y predicciones en memoria, con el contrato de la API real"""
+
+    def __init__(self, perfil: Perfil, por_ruta: Optional[Dict[Text, Perfil]] = None) -> None:
+        self.perfil = perfil
+        self.por_ruta = por_ruta or {}
+        self.usuarios: Dict[Text, Tuple[int, Text]] = {}
+        self.predicciones: Dict[int, int] = {}
+        self.peticiones: Dict[Text, int] = {}
+
+    def aplicacion(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/", self.raiz)
+        app.router.add_post("/register", self._envolver(self.registrar))
+        app.router.add_post("/login", self._envolver(self.login))
+        app.router.add_post("/predict", self._envolver(self.predecir))
+        app.router.add_post(RUTA_LOTE, self._envolver(self.predecir_lote))
+        app.router.add_post("/enviar_historial", self._envolver(self.enviar_historial))
+        return app
+
+    def _envolver(self, manejador: Any) -> Any:
+        async def envoltura(request: web.Request) -> web.Response:
+            ruta = request.path
+            self.peticiones[ruta] = self.peticiones.get(ruta, 0) + 1
+            if await self.por_ruta.get(ruta, self.perfil).esperar() is not None:
+                return web.json_response({"error": "Error simulado"}, status=500)
+            try:
+                datos = await request.json()
+            except ValueError:
+                return web.json_response({"error": "JSON inválido"}, status=400)
+            status, cuerpo = manejador(datos)
+            return web.json_response(cuerpo, status=status)
+
+        return envoltura
+
+    async def raiz(self, request: web.Request) -> web.Response:
+        return web.json_response({"status": "ok", "peticiones": self.peticiones})
+
+    def registrar(self, datos: Dict[Text, Any]) -> Tuple[int, Dict[Text, Any]]:
+        usuario, contrasena = datos.get("usuario"), datos.get("contraseña")
+        if not usuario or not contrasena:
+            return 400, {"error": "Usuario y contraseña son obligatorios"}
+        if usuario in self.usuarios:
+            return 409, {"error": "El usuario ya existe"}
+        self.usuarios[usuario] = (len(self.usuarios) + 1, contrasena)
+        return 201, {"mensaje": "Usuario registrado"}
+
+    def login(self, datos: Dict[Text, Any]) -> Tuple[int, Dict[Text, Any]]:
+        registrado = self.usuarios.get(datos.get("usuario"))
+        if registrado is None or registrado[1] != datos.get("contraseña"):
+            return 401, {"error": "Credenciales inválidas"}
+        return 200, {"id_usuario": registrado[0], "mensaje": "Login exitoso"}
+
+    def _resultado(self, datos: Dict[Text, Any]) -> Dict[Text, Any]:
+        faltan = [campo for campo in CAMPOS_PREDICCION if campo not in datos]
+        if faltan:
+            return {"error": f"Faltan campos: {', '.join(faltan)}"}
+        # Determinista por escenario, como un modelo ya entrenado
+        semilla = hashlib.sha1(
+            repr([datos[c] for c in CAMPOS_PREDICCION[1:]]).encode()
+        ).digest()
+        resultado = {m: RESULTADOS[semilla[i] % len(RESULTADOS)] for i, m in enumerate(MODELOS)}
+        resultado["MejorModelo"] = MODELOS[semilla[3] % len(MODELOS)]
+        resultado["Guardado"] = "Predicción guardada en el historial"
+        id_usuario = datos["id_usuario"]
+        self.predicciones[id_usuario] = self.predicciones.get(id_usuario, 0) + 1
+        return resultado
+
+    def predecir(self, datos: Dict[Text, Any]) -> Tuple[int, Dict[Text, Any]]:
+        resultado = self._resultado(datos)
+        return (400 if "error" in resultado else 200), resultado
+
+    def predecir_lote(self, datos: Dict[Text, Any]) -> Tuple[int, Dict[Text, Any]]:
+        lote: List[Dict[Text, Any]] = datos.get("lote") or []
+        return 200, {"resultados": [self._resultado(d) for d in lote]}
+
+    def enviar_historial(self, datos: Dict[Text, Any]) -> Tuple[int, Dict[Text, Any]]:
+        total = self.predicciones.get(datos.get("id_usuario"), 0)
+        if not total:
+            return 404, {"error": "No hay predicciones para este usuario"}
+        return 200, {"mensaje": "Historial enviado", "total_predicciones": total}
+
+
+def leer_perfiles(valores: List[Text], base: Perfil) -> Dict[Text, Perfil]:
+    """"/predict=800" -> {"/predict": Perfil(800 ms, resto como `base`)}"""
+    perfiles = {}
+    for valor in valores:
+        ruta, _, ms = valor.partition("=")
+        perfiles[ruta] = Perfil(
+            float(ms), base.dispersion, base.errores, base.colgadas, base.colgada_s
+        )
+    return perfiles
+
+
+def main(argv: Optional[List[Text]] = None) -> None:
+    parser = argparse.ArgumentParser(description="API falsa para pruebas de carga")
+    parser.add_argument("--puerto", type=int, default=5057)
+    parser.add_argument("--latencia-ms", type=float, default=250.0, help="mediana de latencia")
+    parser.add_argument("--dispersion", type=float, default=0.5, help="sigma de la log-normal")
+    parser.add_argument("--errores", type=float, default=0.0, help="fracción de respuestas 500")
+    parser.add_argument("--colgadas", type=float, default=0.0, help="fracción que no responde")
+    parser.add_argument("--colgada-s", type=float, default=120.0)
+    parser.add_argument(
+        "--latencia-ruta", action="append", default=[], metavar="RUTA=MS",
+        help="mediana propia de una ruta (se puede repetir)",
+    )
+    args = parser.parse_args(argv)
+
+    perfil = Perfil(args.latencia_ms, args.dispersion, args.errores, args.colgadas, args.colgada_s)
+    backend = BackendFalso(perfil, leer_perfiles(args.latencia_ruta, perfil))
+    print(f"🧪 API falsa en http://localhost:{args.puerto} (lote en {RUTA_LOTE})")
+    web.run_app(backend.aplicacion(), port=args.puerto, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""Generador de carga: muchos remitentes de WhatsApp simulados contra el bot.
+
+Cada remitente recorre el guion (registro, login, predicción e historial)
+enviando payloads de webhook como los de Meta y esperando la respuesta
+del bot en el sumidero de Graph API, que corre en este mismo proceso. La
+latencia de un turno va desde el POST al webhook hasta la primera
+respuesta que llega al sumidero.
+
+Montaje (cuatro terminales):
+
+    python -m pruebas_carga.backend_falso --puerto 5057
+    API_BASE_URL=http://localhost:5057 rasa run actions   # acciones en 5055
+    rasa run --credentials credentials_carga.yml   # graph_api_url: http://localhost:5056/v17.0
+    python -m pruebas_carga.generador --concurrencia 1,10,50 --conversaciones 100 --app-secret <app_secret>
+
+Si credentials_carga.yml define app_secret, el webhook rechaza (403) los
+payloads sin firma: pasa el mismo valor en --app-secret o WHATSAPP_APP_SECRET.
+
+Para cada nivel de concurrencia informa turnos por segundo, p50/p95/p99
+de latencia, timeouts y rechazos (503), así se ve dónde deja de escalar.
+"""
+from typing import Any, Dict, List, Optional, Text
+import argparse
+import asyncio
+import hashlib
+import hmac
+import itertools
+import json
+import os
+import time
+import uuid
+
+import aiohttp
+
+from pruebas_carga.graph_falso import SumideroGraph, iniciar
+
+WEBHOOK_URL = "http://localhost:5005/webhooks/whatsapp/webhook"
+PHONE_NUMBER_ID = "123456789"
+
+# {usuario}, {contrasena} y {email} se rellenan por remitente
+GUION = [
+    "hola",
+    "quiero registrarme",
+    "usuario: {usuario}, contraseña: {contrasena}",
+    "quiero iniciar sesión",
+    "usuario: {usuario}, contraseña: {contrasena}",
+    "quiero hacer una predicción",
+    "lunes, semáforo, cruce múltiple, amanecer, 76, mojado, autopista, 100, urbano, lluvia intensa, moto",
+    "2",
+    "3",
+    "quiero ver mi historial",
+    "{email}",
+]
+
+
+def firma_webhook(cuerpo: bytes, secreto: Text) -> Text:
+    """Cabecera X-Hub-Signature-256 que Meta pone en cada POST al webhook"""
+    return "sha256=" + hmac.new(secreto.encode(), cuerpo, hashlib.sha256).hexdigest()
+
+
+def payload_webhook(remitente: Text, texto: Text) -> Dict[Text, Any]:
+    """Cuerpo de un mensaje de texto entrante, como lo envía Meta"""
+    return {
+        "object": "whatsapp_business_account",
+        "entry": [{
+            "id": "0",
+            "changes": [{
+                "field": "messages",
+                "value": {
+                    "messaging_product": "whatsapp",
+                    "metadata": {"phone_number_id": PHONE_NUMBER_ID},
+                    "contacts": [{"profile": {"name": f"Carga {remitente}"}, "wa_id": remitente}],
+                    "messages": [{
+                        "from": remitente,
+                        "id": f"wamid.{uuid.uuid4().hex}",
+                        "timestamp": str(int(time.time())),
+                        "type": "text",
+                        "text": {"body": texto},
+                    }],
+                },
+            }],
+        }],
+    }
+
+
+class Resultados:
+    """Latencias y fallos de un nivel de concurrencia"""
+
+    def __init__(self) -> None:
+        self.latencias: List[float] = []
+        self.timeouts = 0
+        self.rechazados = 0
+        self.errores = 0
+        self.conversaciones = 0
+
+    def percentil(self, p: float) -> float:
+        ordenadas = sorted(self.latencias)
+        if not ordenadas:
+            return float("nan")
+        return ordenadas[min(len(ordenadas) - 1, int(p * len(ordenadas)))]
+
+
+class Remitente:
+    """Un usuario simulado que recorre el guion turno a turno"""
+
+    def __init__(
+        self,
+        numero: Text,
+        sesion: aiohttp.ClientSession,
+        sumidero: SumideroGraph,
+        args: argparse.Namespace,
+    ) -> None:
+        self.numero = numero
+        self.sesion = sesion
+        self.respuestas = sumidero.cola(numero)
+        self.args = args
+        usuario = f"carga{numero}"
+        self.variables = {
+            "usuario": usuario, "contrasena": f"clave-{numero}", "email": f"{usuario}@example.com"
+        }
+
+    async def conversar(self, guion: List[Text], resultados: Resultados) -> None:
+        for plantilla in guion:
+            await self.turno(plantilla.format(**self.variables), resultados)
+            if self.args.pausa:
+                await asyncio.sleep(self.args.pausa)
+        resultados.conversaciones += 1
+
+    async def turno(self, texto: Text, resultados: Resultados) -> None:
+        # Respuestas tardías del turno anterior no cuentan para este
+        while not self.respuestas.empty():
+            self.respuestas.get_nowait()
+
+        cuerpo = json.dumps(payload_webhook(self.numero, texto)).encode()
+        cabeceras = {"Content-Type": "application/json"}
+        if self.args.app_secret:
+            cabeceras["X-Hub-Signature-256"] = firma_webhook(cuerpo, self.args.app_secret)
+
+        inicio = time.perf_counter()
+        try:
+            async with self.sesion.post(
+                self.args.webhook, data=cuerpo, headers=cabeceras
+            ) as response:
+                if response.status == 503:
+                    resultados.rechazados += 1
+                    return
+                if response.status >= 400:
+                    resultados.errores += 1
+                    return
+        except aiohttp.ClientError:
+            resultados.errores += 1
+            return
+
+        try:
+            llegada = await asyncio.wait_for(self.respuestas.get(), self.args.timeout)
+        except asyncio.TimeoutError:
+            resultados.timeouts += 1
+            return
+        resultados.latencias.append(llegada - inicio)
+
+        # El turno termina cuando el bot deja de escribir
+        while True:
+            try:
+                await asyncio.wait_for(self.respuestas.get(), self.args.silencio)
+            except asyncio.TimeoutError:
+                return
+
+
+async def ejecutar_nivel(
+    concurrencia: int,
+    args: argparse.Namespace,
+    sesion: aiohttp.ClientSession,
+    sumidero: SumideroGraph,
+    guion: List[Text],
+    numeros: "itertools.count[int]",
+) -> Dict[Text, Any]:
+    """`args.conversaciones` conversaciones, como mucho `concurrencia` a la vez"""
+    resultados = Resultados()
+    semaforo = asyncio.Semaphore(concurrencia)
+
+    async def conversacion() -> None:
+        async with semaforo:
+            # Número nuevo por conversación: sesión y límites de login limpios
+            numero = f"{args.prefijo}{next(numeros):06d}"
+            await Remitente(numero, sesion, sumidero, args).conversar(guion, resultados)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(conversacion() for _ in range(args.conversaciones)))
+    duracion = time.perf_counter() - inicio
+    return {
+        "concurrencia": concurrencia,
+        "turnos": len(resultados.latencias),
+        "turnos_por_segundo": len(resultados.latencias) / duracion,
+        "p50": resultados.percentil(0.50),
+        "p95": resultados.percentil(0.95),
+        "p99": resultados.percentil(0.99),
+        "timeouts": resultados.timeouts,
+        "rechazados": resultados.rechazados,
+        "errores": resultados.errores,
+        "duracion": duracion,
+    }
+
+
+async def ejecutar(args: argparse.Namespace) -> List[Dict[Text, Any]]:
+    guion = GUION
+    if args.guion:
+        with open(args.guion, encoding="utf-8") as archivo:
+            guion = json.load(archivo)
+
+    sumidero = SumideroGraph()
+    runner = await iniciar(sumidero, args.sumidero_puerto)
+    numeros = itertools.count(1)
+    filas = []
+    try:
+        conector = aiohttp.TCPConnector(limit=0)
+        async with aiohttp.ClientSession(connector=conector) as sesion:
+            for concurrencia in args.concurrencia:
+                fila = await ejecutar_nivel(concurrencia, args, sesion, sumidero, guion, numeros)
+                filas.append(fila)
+                print(
+                    f"{fila['concurrencia']:>6}{fila['turnos']:>8}{fila['turnos_por_segundo']:>10.1f}"
+                    f"{fila['p50'] * 1000:>10.0f}{fila['p95'] * 1000:>10.0f}{fila['p99'] * 1000:>10.0f}"
+                    f"{fila['timeouts']:>10}{fila['rechazados']:>8}{fila['errores']:>8}"
+                )
+    finally:
+        await runner.cleanup()
+    return filas
+
+
+def main(argv: Optional[List[Text]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Prueba de carga del bot de WhatsApp")
+    parser.add_argument("--webhook", default=WEBHOOK_URL)
+    parser.add_argument(
+        "--app-secret", default=os.environ.get("WHATSAPP_APP_SECRET", ""),
+        help="app_secret de credentials_carga.yml, para firmar los payloads",
+    )
+    parser.add_argument("--sumidero-puerto", type=int, default=5056)
+    parser.add_argument(
+        "--concurrencia", type=lambda v: [int(n) for n in v.split(",")], default=[1, 5, 10, 25],
+        help="niveles separados por comas (remitentes simultáneos)",
+    )
+    parser.add_argument("--conversaciones", type=int, default=50, help="por nivel")
+    parser.add_argument("--timeout", type=float, default=30.0, help="espera máxima por turno (s)")
+    parser.add_argument(
+        "--silencio", type=float, default=0.5,
+        help="segundos sin respuestas para dar el turno por terminado",
+    )
+    parser.add_argument("--pausa", type=float, default=0.0, help="tiempo de lectura entre turnos")
+    parser.add_argument("--guion", help="JSON con la lista de mensajes de cada conversación")
+    parser.add_argument(
+        "--prefijo", default=f"99{int(time.time()) % 10000:04d}",
+        help="prefijo de los números simulados (cambia en cada ejecución)",
+    )
+    parser.add_argument("--salida", help="guarda los resultados en JSON")
+    args = parser.parse_args(argv)
+
+    print("=" * 78)
+    print(f"🚦 PRUEBA DE CARGA contra {args.webhook}")
+    print("=" * 78)
+    print(f"{'conc':>6}{'turnos':>8}{'turnos/s':>10}{'p50 ms':>10}{'p95 ms':>10}"
+          f"{'p99 ms':>10}{'timeouts':>10}{'503':>8}{'error':>8}")
+    filas = asyncio.run(ejecutar(args))
+    print("=" * 78)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as archivo:
+            json.dump(filas, archivo, indent=2)
+        print(f"💾 Resultados en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Sumidero de la Graph API de WhatsApp para pruebas de carga.
+
+Acepta los POST /<versión>/<phone_number_id>/messages que hace
+channels/whatsapp.py y anota cuándo llega cada respuesta a cada
+destinatario. El generador de carga lo levanta en su propio proceso
+para medir la latencia de punta a punta; también corre solo:
+
+    python -m pruebas_carga.graph_falso --puerto 5056 --limitadas 0.01
+
+El canal se apunta a él con `graph_api_url: "http://localhost:5056/v17.0"`
+en las credenciales de WhatsApp.
+"""
+from typing import Dict, List, Optional, Text
+import argparse
+import asyncio
+import itertools
+import random
+import time
+
+from aiohttp import web
+
+from pruebas_carga.backend_falso import Perfil
+
+
+class SumideroGraph:
+    """Recibe los envíos del bot y los reparte por destinatario"""
+
+    def __init__(self, perfil: Optional[Perfil] = None, limitadas: float = 0.0) -> None:
+        # Por defecto responde al instante: solo se mide al bot
+        self.perfil = perfil or Perfil(0.0, 0.0)
+        self.limitadas = limitadas
+        self.recibidos = 0
+        self.limitados = 0
+        self._ids = itertools.count(1)
+        self._colas: Dict[Text, "asyncio.Queue[float]"] = {}
+
+    def aplicacion(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/{version}/{phone_number_id}/messages", self.mensaje)
+        app.router.add_get("/", self.estado)
+        return app
+
+    def cola(self, destinatario: Text) -> "asyncio.Queue[float]":
+        """Horas de llegada (time.perf_counter) de las respuestas a un destinatario"""
+        return self._colas.setdefault(destinatario, asyncio.Queue())
+
+    async def mensaje(self, request: web.Request) -> web.Response:
+        if await self.perfil.esperar() is not None:
+            return web.json_response({"error": {"message": "Simulated error"}}, status=500)
+        if random.random() < self.limitadas:
+            # Como la Graph API al superar el límite por número
+            self.limitados += 1
+            return web.json_response(
+                {"error": {"message": "Rate limit hit", "code": 130429}},
+                status=429, headers={"Retry-After": "1"},
+            )
+        datos = await request.json()
+        self.recibidos += 1
+        self.cola(datos.get("to", "")).put_nowait(time.perf_counter())
+        return web.json_response({
+            "messaging_product": "whatsapp",
+            "contacts": [{"input": datos.get("to"), "wa_id": datos.get("to")}],
+            "messages": [{"id": f"wamid.carga{next(self._ids)}"}],
+        })
+
+    async def estado(self, request: web.Request) -> web.Response:
+        return web.json_response({"recibidos": self.recibidos, "limitados": self.limitados})
+
+
+async def iniciar(sumidero: SumideroGraph, puerto: int) -> web.AppRunner:
+    """Levanta el sumidero dentro del event loop actual"""
+    runner = web.AppRunner(sumidero.aplicacion())
+    await runner.setup()
+    await web.TCPSite(runner, port=puerto).start()
+    return runner
+
+
+def main(argv: Optional[List[Text]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Graph API falsa para pruebas de carga")
+    parser.add_argument("--puerto", type=int, default=5056)
+    parser.add_argument("--latencia-ms", type=float, default=0.0)
+    parser.add_argument("--limitadas", type=float, default=0.0, help="fracción de respuestas 429")
+    args = parser.parse_args(argv)
+
+    sumidero = SumideroGraph(Perfil(args.latencia_ms), args.limitadas)
+    print(f"📥 Graph API falsa en http://localhost:{args.puerto}/v17.0")
+    web.run_app(sumidero.aplicacion(), port=args.puerto, print=None)
+
+
+if __name__ == "__main__":
+    main()